@@ -1,3 +1,5 @@
+import asyncio
+
 import typer
 from typing_extensions import Annotated
 
@@ -7,7 +9,110 @@ app = typer.Typer(name="yatry", help="Optimizing ride sharing for campus commute
 @app.command(name="random")
 def random(
     n_passengers: Annotated[
-        int, typer.Argument(default=10, help="Number of passengers to simulate")
-    ],
+        int, typer.Argument(help="Number of passengers to simulate")
+    ] = 10,
 ) -> None:
     print("Hello from yatry!")
+
+
+@app.command(name="serve")
+def serve(
+    http: Annotated[
+        bool, typer.Option(help="Serve over local HTTP instead of stdio")
+    ] = False,
+    host: Annotated[str, typer.Option(help="Host of the HTTP front end")] = "127.0.0.1",
+    port: Annotated[int, typer.Option(help="Port of the HTTP front end")] = 8000,
+    batch_interval: Annotated[
+        float, typer.Option(help="Seconds to accumulate requests into a batch")
+    ] = 1.0,
+    max_batch_size: Annotated[
+        int, typer.Option(help="Maximum number of requests in a batch")
+    ] = 64,
+) -> None:
+    """
+    Runs the micro-batching matching service.
+    """
+    from yatry.utils.service import (
+        MatchingService,
+        ServiceConfig,
+        serve_http,
+        serve_stdio,
+    )
+
+    service = MatchingService(
+        config=ServiceConfig(
+            batch_interval=batch_interval, max_batch_size=max_batch_size
+        )
+    )
+    if http:
+        asyncio.run(serve_http(service=service, host=host, port=port))
+    else:
+        asyncio.run(serve_stdio(service=service))
+
+
+@app.command(name="replay")
+def replay(
+    path: Annotated[str, typer.Argument(help="JSON lines log of timestamped requests")],
+    speed: Annotated[
+        float, typer.Option(help="Replay speed relative to the recorded arrivals")
+    ] = 100.0,
+    batch_interval: Annotated[
+        float, typer.Option(help="Seconds to accumulate requests into a batch")
+    ] = 1.0,
+    max_batch_size: Annotated[
+        int, typer.Option(help="Maximum number of requests in a batch")
+    ] = 64,
+) -> None:
+    """
+    Replays a request log against the matching service and reports decision
+    latency percentiles, batch sizes and throughput. Requests that cannot be
+    replayed are listed on stderr and counted as `n_rejected`.
+    """
+    import json
+    import sys
+
+    from yatry.utils.replay import load_request_log, replay as replay_log
+    from yatry.utils.service import MatchingService, ServiceConfig
+
+    service = MatchingService(
+        config=ServiceConfig(
+            batch_interval=batch_interval, max_batch_size=max_batch_size
+        )
+    )
+    requests, rejected = load_request_log(path)
+    for record, reason in rejected:
+        print(f"Rejected {record.get('name', 'request')}: {reason}", file=sys.stderr)
+    report = asyncio.run(replay_log(requests=requests, service=service, speed=speed))
+    print(json.dumps(report.summary() | {"n_rejected": len(rejected)}, indent=2))
+
+
+@app.command(name="perf")
+def perf(
+    baseline: Annotated[
+        str, typer.Option(help="JSON file of the baseline timings")
+    ] = ".perf_baseline.json",
+    update: Annotated[
+        bool, typer.Option(help="Store the timings of this run as the baseline")
+    ] = False,
+    threshold: Annotated[
+        float, typer.Option(help="Tolerated relative slowdown against the baseline")
+    ] = 0.25,
+    seed: Annotated[int, typer.Option(help="Seed of the inputs")] = 42,
+    repeat: Annotated[
+        int, typer.Option(help="Runs per implementation, of which the best is kept")
+    ] = 3,
+) -> None:
+    """
+    Checks the accelerated paths against their reference implementations and
+    flags timing regressions against the stored baseline.
+    """
+    from yatry.utils.perf import main as run_perf
+
+    if not run_perf(
+        baseline_path=baseline,
+        update=update,
+        threshold=threshold,
+        seed=seed,
+        repeat=repeat,
+    ):
+        raise typer.Exit(code=1)
@@ -0,0 +1,71 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from yatry.utils.data.io import create_random_passengers
+from yatry.utils.data.map import BHOPAL
+from yatry.utils.helpers.affinity import DEFAULT_CACHE_DIR, affinity_matrices
+from yatry.utils.optim.clustering import CLUSTERING_BACKENDS, cluster_labels
+from yatry.utils.optim.fare import passenger_solo_fares, settle_fares
+
+console = Console()
+
+
+def main():
+    SEED: int = 42
+    PASSENGER_COUNTS: list[int] = [100, 250, 500]
+    AUTO_CAPACITY: int | None = 5
+    AFFINITY_CACHE_DIR: str | None = DEFAULT_CACHE_DIR
+
+    table = Table(title="Clustering Backends")
+    table.add_column("Passengers", style="cyan")
+    table.add_column("Backend", style="cyan")
+    table.add_column("Runtime (s)", style="yellow")
+    table.add_column("Groups", style="green")
+    table.add_column("Mean / Max Size", style="green")
+    table.add_column("Total Savings", style="magenta")
+
+    for n_passengers in PASSENGER_COUNTS:
+        random.seed(SEED)
+        start = datetime(2025, 4, 23, 8)
+        passengers = create_random_passengers(
+            n_passengers=n_passengers,
+            time_range=(start, start + timedelta(hours=1)),
+        )
+        with console.status(f"Building affinity matrix for {n_passengers}..."):
+            _, _, affinity_matrix = affinity_matrices(
+                passengers=passengers, map_=BHOPAL, cache_dir=AFFINITY_CACHE_DIR
+            )
+        solo_fares = passenger_solo_fares(passengers=passengers, map_=BHOPAL)
+
+        for backend in CLUSTERING_BACKENDS:
+            with console.status(f"Clustering {n_passengers} with {backend}..."):
+                t_start = time.perf_counter()
+                labels = cluster_labels(
+                    affinity_matrix=affinity_matrix,
+                    backend=backend,
+                    capacity=AUTO_CAPACITY,
+                    random_state=SEED,
+                )
+                runtime = time.perf_counter() - t_start
+
+            sizes = np.bincount(np.unique(labels, return_inverse=True)[1])
+            settlement = settle_fares(labels=labels, solo_fares=solo_fares)
+            table.add_row(
+                str(n_passengers),
+                backend,
+                f"{runtime:.3f}",
+                str(len(sizes)),
+                f"{sizes.mean():.2f} / {sizes.max()}",
+                f"₹{settlement.total_saving:.2f}",
+            )
+
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
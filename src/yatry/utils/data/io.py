@@ -2,6 +2,8 @@ from yatry.utils.models import Passenger
 from datetime import datetime, timedelta
 import random
 from yatry.utils.data.locations import Location
+from yatry.utils.helpers.geo import LocationSnapper
+import numpy as np
 import randomname
 
 
@@ -48,6 +50,104 @@ def create_random_passengers(
     return passengers
 
 
+def passenger_to_dict(passenger: Passenger) -> dict:
+    """
+    Serializes a passenger into a JSON-compatible ride request.
+
+    Args:
+        passenger (Passenger): The passenger to serialize.
+
+    Returns:
+        dict: The request with the `name`, the `source` and `destination`
+            `Location` names and the ISO formatted `dep_time_start` and
+            `dep_time_end`.
+    """
+    t_start, t_end = passenger.dep_time_range
+    return {
+        "name": passenger.name,
+        "source": passenger.source.name,
+        "destination": passenger.destination.name,
+        "dep_time_start": t_start.isoformat(),
+        "dep_time_end": t_end.isoformat(),
+    }
+
+
+def passenger_from_dict(record: dict) -> Passenger:
+    """
+    Parses a ride request created by `passenger_to_dict`.
+
+    Args:
+        record (dict): The ride request.
+
+    Returns:
+        Passenger: The passenger making the request.
+
+    Raises:
+        ValueError: If the request starts where it ends, as such a ride has no
+            fare to share.
+    """
+    source, destination = Location[record["source"]], Location[record["destination"]]
+    if source == destination:
+        raise ValueError(f"The ride request starts and ends at {source.name}")
+    return Passenger(
+        name=record["name"],
+        source=source,
+        destination=destination,
+        dep_time_range=(
+            datetime.fromisoformat(record["dep_time_start"]),
+            datetime.fromisoformat(record["dep_time_end"]),
+        ),
+    )
+
+
+def snap_request_locations(
+    records: list[dict], snapper: LocationSnapper | None = None
+) -> tuple[list[dict], list[tuple[dict, str]]]:
+    """
+    Fills in the `source` and `destination` of ride requests that carry raw
+    coordinates instead, i.e. `source_lat`, `source_lon`, `destination_lat`
+    and `destination_lon`. All requests are snapped in one query per
+    endpoint.
+
+    Args:
+        records (list[dict]): The ride requests. Requests that already name
+            their locations are left as they are.
+        snapper (LocationSnapper | None): The snapper to use. Defaults to one
+            over every `Location` with its default cutoff.
+
+    Returns:
+        tuple[list[dict], list[tuple[dict, str]]]: The requests with both
+            locations, in order, and the rejected requests with the reason,
+            i.e. requests with a coordinate too far from every location, and
+            requests that start and end at the same location.
+    """
+    snapper = snapper or LocationSnapper()
+    snapped = [dict(record) for record in records]
+    for endpoint in ("source", "destination"):
+        pending = [r for r in snapped if endpoint not in r and f"{endpoint}_lat" in r]
+        if not pending:
+            continue
+        codes, _ = snapper.snap(
+            latitudes=np.array([r[f"{endpoint}_lat"] for r in pending], dtype=np.float64),
+            longitudes=np.array([r[f"{endpoint}_lon"] for r in pending], dtype=np.float64),
+        )
+        for record, location in zip(pending, snapper.to_locations(codes)):
+            if location is not None:
+                record[endpoint] = location.name
+
+    accepted, rejected = [], []
+    for original, record in zip(records, snapped):
+        missing = [e for e in ("source", "destination") if e not in record]
+        if missing:
+            reason = f"No location within the cutoff of the {missing[0]}"
+            rejected.append((original, reason))
+        elif record["source"] == record["destination"]:
+            rejected.append((original, f"Starts and ends at {record['source']}"))
+        else:
+            accepted.append(record)
+    return accepted, rejected
+
+
 def main():
     passengers = create_random_passengers(
         n_passengers=5,
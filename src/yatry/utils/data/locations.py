@@ -17,3 +17,30 @@ class Location(Enum):
     AASHIMA = "Aashima Mall"
     BHOPAL_JN = "Bhopal Junction"
     PPL_MALL = "People's Mall"
+
+    @property
+    def coordinates(self) -> tuple[float, float]:
+        """
+        The approximate `(latitude, longitude)` of the location in degrees.
+        """
+        return LOCATION_COORDINATES[self]
+
+
+# Approximate pickup points, good to a few hundred metres
+LOCATION_COORDINATES: dict[Location, tuple[float, float]] = {
+    Location.IISERB: (23.2863, 77.2756),
+    Location.GREEN_BAY: (23.2960, 77.3050),
+    Location.LAL_GHATI: (23.2780, 77.3640),
+    Location.AIRPORT: (23.2875, 77.3374),
+    Location.DMART: (23.2800, 77.3530),
+    Location.BAIRAGARH: (23.2680, 77.3360),
+    Location.SHIVHARE: (23.2780, 77.2950),
+    Location.CHIRAYU: (23.2730, 77.3150),
+    Location.UPPER_LAKE: (23.2520, 77.3580),
+    Location.MOTI_MASJID: (23.2610, 77.3980),
+    Location.RANI_DB: (23.2330, 77.4330),
+    Location.AIIMS: (23.2080, 77.4590),
+    Location.AASHIMA: (23.1920, 77.4670),
+    Location.BHOPAL_JN: (23.2680, 77.4130),
+    Location.PPL_MALL: (23.3000, 77.4280),
+}
@@ -1,3 +1,4 @@
+from yatry.utils.models.fare import FareTable
 from yatry.utils.models.map import Map
 from yatry.utils.data.locations import Location
 
@@ -24,3 +25,11 @@ BHOPAL.add_road(loc_from=Location.RANI_DB, loc_to=Location.AIIMS, fare=50)
 BHOPAL.add_road(loc_from=Location.AIIMS, loc_to=Location.AASHIMA, fare=50)
 BHOPAL.add_road(loc_from=Location.LAL_GHATI, loc_to=Location.BHOPAL_JN, fare=150)
 BHOPAL.add_road(loc_from=Location.BHOPAL_JN, loc_to=Location.PPL_MALL, fare=100)
+
+# Fares by time of day, with the usual night charge of half the fare again
+# from 11 PM to 5 AM, in the local time of every departure
+BHOPAL_FARES = FareTable(
+    map_=BHOPAL,
+    bucket_starts=[0, 5 * 3600, 23 * 3600],
+    multipliers=[1.5, 1.0, 1.5],
+)
@@ -0,0 +1,334 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import defaultdict
+from collections.abc import Iterator
+
+import numpy as np
+from numpy import typing as npt
+from scipy import sparse
+
+from yatry.utils.data.locations import Location
+from yatry.utils.helpers.time import time_affinity_scores
+from yatry.utils.models import Passenger
+from yatry.utils.models.map import Map
+
+# Where the scripts keep the matrices of their seeded passengers between runs,
+# see `affinity_matrices`
+DEFAULT_CACHE_DIR: str = ".affinity_cache"
+
+
+def passenger_routes(passengers: list[Passenger], map_: Map) -> list[list[Location]]:
+    """
+    Finds the route of every passenger, searching the map tree only once per
+    distinct `(source, destination)` pair.
+
+    Args:
+        passengers (list[Passenger]): The passengers.
+        map_ (Map): The map to find the routes on.
+
+    Returns:
+        list[list[Location]]: The route of every passenger.
+    """
+    routes: dict[tuple[Location, Location], list[Location]] = {}
+    for p in passengers:
+        if (p.source, p.destination) not in routes:
+            routes[p.source, p.destination] = map_._find_route(
+                loc_start=p.source, loc_end=p.destination
+            )
+    return [routes[p.source, p.destination] for p in passengers]
+
+
+def route_affinity_table(
+    routes: list[list[Location]], map_: Map
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+    """
+    Computes the route affinity between every pair of distinct routes.
+
+    Args:
+        routes (list[list[Location]]): The route of every passenger.
+        map_ (Map): The map the routes are on.
+
+    Returns:
+        tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]: Tuple of -
+            - The index of every passenger's route among the distinct routes.
+            - The `R x R` route affinity table of the distinct routes, so that
+              the route affinity of passengers i and j is
+              `table[route_ids[i], route_ids[j]]`.
+    """
+    distinct: dict[tuple[Location, ...], int] = {}
+    route_ids = np.array(
+        [distinct.setdefault(tuple(route), len(distinct)) for route in routes],
+        dtype=np.int64,
+    )
+    unique = [list(route) for route in distinct]
+    table = np.array(
+        [
+            [map_._get_route_affinity(route1=r1, route2=r2) for r2 in unique]
+            for r1 in unique
+        ],
+        dtype=np.float64,
+    ).reshape(len(unique), len(unique))
+    return route_ids, table
+
+
+def build_knn_affinity_graph(
+    passengers: list[Passenger],
+    map_: Map,
+    k: int = 10,
+    time_window: float = 1800.0,
+    max_candidates: int | None = None,
+    m_range: float = 0.8,
+) -> sparse.csr_matrix:
+    """
+    Builds a sparse affinity graph keeping only the `k` best partners of every
+    passenger.
+
+    Route affinity is zero unless two routes share their first hop, so
+    candidates are generated per bucket of passengers with the same first two
+    locations (the OD prefix). Inside a bucket the passengers are sorted by
+    their earliest departure time and only the `max_candidates` nearest
+    neighbours in that order, whose windows are less than `time_window`
+    seconds apart, are scored. This costs O(N log N + N * max_candidates)
+    instead of O(N^2).
+
+    Args:
+        passengers (list[Passenger]): The passengers.
+        map_ (Map): The map to compute route affinities on.
+        k (int): Number of partners to keep for every passenger.
+        time_window (float): Maximum gap in seconds between the departure
+            windows of two candidates.
+        max_candidates (int | None): Number of neighbours scanned on each side
+            in departure order. Defaults to `4 * k`.
+        m_range (float): The `m_range` of the time convenience functions.
+
+    Returns:
+        sparse.csr_matrix: The symmetric `N x N` graph, where the weight of an
+            edge is the mean of the affinities in both directions and an edge is
+            kept if either end has the other among its `k` best partners.
+    """
+    n_passengers = len(passengers)
+    max_candidates = max_candidates or 4 * k
+    routes = passenger_routes(passengers=passengers, map_=map_)
+    route_ids, route_table = route_affinity_table(routes=routes, map_=map_)
+    windows = np.array(
+        [p.get_dep_time_range_num() for p in passengers], dtype=np.float64
+    ).reshape(n_passengers, 2)
+
+    buckets: dict[tuple[Location, ...], list[int]] = defaultdict(list)
+    for i, route in enumerate(routes):
+        buckets[tuple(route[:2])].append(i)
+
+    rows, cols, weights = [], [], []
+    offsets = np.concatenate(
+        [np.arange(-max_candidates, 0), np.arange(1, max_candidates + 1)]
+    )
+    for members in buckets.values():
+        members = np.array(members, dtype=np.int64)
+        members = members[np.argsort(windows[members, 0], kind="stable")]
+        n = len(members)
+        if n < 2:
+            continue
+
+        # Neighbours of every member in departure order
+        positions = np.arange(n)[:, None] + offsets[None, :]
+        valid = (positions >= 0) & (positions < n)
+        i = np.broadcast_to(members[:, None], positions.shape)[valid]
+        j = members[positions[valid]]
+
+        t_min, t_max = windows[:, 0], windows[:, 1]
+        near = (t_min[j] <= t_max[i] + time_window) & (
+            t_min[i] <= t_max[j] + time_window
+        )
+        i, j = i[near], j[near]
+
+        a_ij = route_table[route_ids[i], route_ids[j]] * time_affinity_scores(
+            t1_min=t_min[i], t2_min=t_min[j], t1_max=t_max[i], t2_max=t_max[j],
+            m_range=m_range,
+        )
+        a_ji = route_table[route_ids[j], route_ids[i]] * time_affinity_scores(
+            t1_min=t_min[j], t2_min=t_min[i], t1_max=t_max[j], t2_max=t_max[i],
+            m_range=m_range,
+        )
+        w = (a_ij + a_ji) / 2
+
+        # Keep the `k` heaviest candidates of every passenger
+        order = np.lexsort((-w, i))
+        i, j, w = i[order], j[order], w[order]
+        starts = np.searchsorted(i, i, side="left")
+        keep = (np.arange(len(i)) - starts < k) & (w > 0)
+        rows.append(i[keep])
+        cols.append(j[keep])
+        weights.append(w[keep])
+
+    if not rows:
+        return sparse.csr_matrix((n_passengers, n_passengers), dtype=np.float64)
+
+    graph = sparse.coo_matrix(
+        (np.concatenate(weights), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(n_passengers, n_passengers),
+    ).tocsr()
+    # An edge survives if either end keeps it; both directions carry the
+    # same weight, so the maximum only fills in the missing direction
+    return graph.maximum(graph.T).tocsr()
+
+
+AFFINITY_MATRIX_NAMES = ("tau", "rho", "affinity")
+
+
+def affinity_cache_key(
+    passengers: list[Passenger], map_: Map, m_range: float = 0.8
+) -> str:
+    """
+    Computes a key of the affinity matrices of a batch of passengers, which
+    changes with the passengers, their order, the map or `m_range`.
+
+    Args:
+        passengers (list[Passenger]): The passengers.
+        map_ (Map): The map to compute route affinities on.
+        m_range (float): The `m_range` of the time convenience functions.
+
+    Returns:
+        str: The hex digest of the batch.
+    """
+    batch = {
+        "map": map_.version,
+        "m_range": m_range,
+        "passengers": [
+            [p.name, p.source.name, p.destination.name, *p.get_dep_time_range_num()]
+            for p in passengers
+        ],
+    }
+    return hashlib.sha256(json.dumps(batch).encode()).hexdigest()
+
+
+def _fill_affinity_matrices(
+    passengers: list[Passenger],
+    map_: Map,
+    tau: np.ndarray,
+    rho: np.ndarray,
+    affinity: np.ndarray,
+    m_range: float,
+    block_size: int,
+) -> None:
+    """
+    Fills the time, route and combined affinity matrices one block of rows at
+    a time, so that memory-mapped outputs are written without holding a whole
+    matrix in memory.
+    """
+    n_passengers = len(passengers)
+    routes = passenger_routes(passengers=passengers, map_=map_)
+    route_ids, route_table = route_affinity_table(routes=routes, map_=map_)
+    windows = np.array(
+        [p.get_dep_time_range_num() for p in passengers], dtype=np.float64
+    ).reshape(n_passengers, 2)
+    t_min, t_max = windows[:, 0], windows[:, 1]
+
+    for start in range(0, n_passengers, block_size):
+        rows = slice(start, start + block_size)
+        tau[rows] = time_affinity_scores(
+            t1_min=t_min[rows, None], t2_min=t_min[None, :],
+            t1_max=t_max[rows, None], t2_max=t_max[None, :],
+            m_range=m_range,
+        )
+        rho[rows] = route_table[route_ids[rows, None], route_ids[None, :]]
+        affinity[rows] = rho[rows] * tau[rows]
+
+
+def affinity_matrices(
+    passengers: list[Passenger],
+    map_: Map,
+    cache_dir: str | None = None,
+    m_range: float = 0.8,
+    block_size: int = 1024,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Computes the time affinity `tau`, the route affinity `rho` and the
+    combined affinity `rho * tau` of a batch of passengers.
+
+    With a `cache_dir`, the matrices are stored as `.npy` files in a
+    subdirectory named by `affinity_cache_key`, and are opened read-only with
+    `np.load(mmap_mode="r")`. A later run on the same passengers and map
+    reuses them without recomputing anything, and pages in only the rows it
+    reads, see `iter_row_blocks`.
+
+    Args:
+        passengers (list[Passenger]): The passengers.
+        map_ (Map): The map to compute route affinities on.
+        cache_dir (str | None): Directory of the cached matrices. The matrices
+            are computed in memory if not given.
+        m_range (float): The `m_range` of the time convenience functions.
+        block_size (int): Number of rows computed at a time.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: The `N x N` matrices `tau`,
+            `rho` and `rho * tau`; read-only memory maps if `cache_dir` is given.
+    """
+    n_passengers = len(passengers)
+    if cache_dir is None:
+        tau, rho, affinity = (
+            np.empty((n_passengers, n_passengers), dtype=np.float64)
+            for _ in AFFINITY_MATRIX_NAMES
+        )
+        _fill_affinity_matrices(
+            passengers=passengers, map_=map_, tau=tau, rho=rho, affinity=affinity,
+            m_range=m_range, block_size=block_size,
+        )
+        return tau, rho, affinity
+
+    key = affinity_cache_key(passengers=passengers, map_=map_, m_range=m_range)
+    entry = os.path.join(cache_dir, key)
+    if not os.path.isdir(entry):
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write into a scratch directory and rename it into place, so that a
+        # crashed or concurrent run never leaves a partial entry behind
+        scratch = tempfile.mkdtemp(dir=cache_dir, prefix=f".{key[:16]}-")
+        try:
+            tau, rho, affinity = (
+                np.lib.format.open_memmap(
+                    os.path.join(scratch, f"{name}.npy"),
+                    mode="w+",
+                    dtype=np.float64,
+                    shape=(n_passengers, n_passengers),
+                )
+                for name in AFFINITY_MATRIX_NAMES
+            )
+            _fill_affinity_matrices(
+                passengers=passengers, map_=map_, tau=tau, rho=rho,
+                affinity=affinity, m_range=m_range, block_size=block_size,
+            )
+            for matrix in (tau, rho, affinity):
+                matrix.flush()
+            del tau, rho, affinity
+            os.rename(scratch, entry)
+        except OSError:
+            # Another run stored the same entry first
+            if not os.path.isdir(entry):
+                raise
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    return tuple(
+        np.load(os.path.join(entry, f"{name}.npy"), mmap_mode="r")
+        for name in AFFINITY_MATRIX_NAMES
+    )
+
+
+def iter_row_blocks(
+    matrix: np.ndarray, block_size: int = 1024
+) -> Iterator[tuple[int, np.ndarray]]:
+    """
+    Iterates over a matrix in blocks of rows. For a memory-mapped matrix only
+    the rows of the current block are read from disk.
+
+    Args:
+        matrix (np.ndarray): The matrix, e.g. from `affinity_matrices`.
+        block_size (int): Number of rows per block.
+
+    Yields:
+        tuple[int, np.ndarray]: The index of the first row and the block.
+    """
+    for start in range(0, matrix.shape[0], block_size):
+        yield start, matrix[start : start + block_size]
@@ -0,0 +1,97 @@
+from collections.abc import Iterable
+
+import numpy as np
+from numpy import typing as npt
+from scipy.spatial import cKDTree
+
+from yatry.utils.data.locations import Location
+
+EARTH_RADIUS = 6_371_000.0
+
+
+def _to_cartesian(
+    latitudes: npt.ArrayLike, longitudes: npt.ArrayLike
+) -> npt.NDArray[np.float64]:
+    """
+    Converts coordinates in degrees to points on a sphere of the radius of the
+    earth, in metres, so that nearest neighbours by chord length are nearest
+    neighbours on the earth.
+    """
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    return EARTH_RADIUS * np.stack(
+        [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1
+    )
+
+
+def _chord_to_distance(chord: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    return 2 * EARTH_RADIUS * np.arcsin(
+        np.clip(np.asarray(chord) / (2 * EARTH_RADIUS), 0, 1)
+    )
+
+
+class LocationSnapper:
+    """
+    Snaps raw coordinates to the nearest map locations.
+
+    The locations are stored in a `cKDTree` over their positions on the sphere,
+    so a whole array of coordinates is snapped by one vectorized query.
+
+    Attributes:
+        locations (list[Location]): The locations to snap to; codes returned
+            by `snap` index into it.
+        max_distance (float): Coordinates farther than this many metres from
+            every location are not snapped.
+        _tree (cKDTree): The spatial index of the locations.
+    """
+
+    locations: list[Location]
+    max_distance: float
+    _tree: cKDTree
+
+    def __init__(
+        self, locations: Iterable[Location] = Location, max_distance: float = 1000.0
+    ) -> None:
+        self.locations = list(locations)
+        self.max_distance = max_distance
+        latitudes, longitudes = zip(*(loc.coordinates for loc in self.locations))
+        self._tree = cKDTree(_to_cartesian(latitudes, longitudes))
+
+    def snap(
+        self, latitudes: npt.ArrayLike, longitudes: npt.ArrayLike
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+        """
+        Finds the nearest location of every coordinate.
+
+        Args:
+            latitudes (npt.ArrayLike): The latitudes in degrees.
+            longitudes (npt.ArrayLike): The longitudes in degrees.
+
+        Returns:
+            tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]: Tuple of -
+                - The index in `locations` of the nearest location, or `-1` if
+                  it is farther than `max_distance`.
+                - The great-circle distance to that location in metres, or
+                  `inf` if it is not snapped.
+        """
+        # The chord is shorter than the arc, so the cutoff on the chord is
+        # computed from the arc length
+        chord_cutoff = 2 * EARTH_RADIUS * np.sin(
+            min(self.max_distance / (2 * EARTH_RADIUS), np.pi / 2)
+        )
+        chords, codes = self._tree.query(
+            _to_cartesian(latitudes, longitudes),
+            k=1,
+            distance_upper_bound=np.nextafter(chord_cutoff, np.inf),
+        )
+        missing = ~np.isfinite(chords)
+        codes = np.where(missing, -1, codes).astype(np.int64)
+        distances = np.where(missing, np.inf, _chord_to_distance(np.where(missing, 0, chords)))
+        return codes, distances
+
+    def to_locations(self, codes: npt.ArrayLike) -> list[Location | None]:
+        """
+        Converts codes returned by `snap` to locations, with `None` for the
+        coordinates that were not snapped.
+        """
+        return [self.locations[code] if code >= 0 else None for code in np.ravel(codes)]
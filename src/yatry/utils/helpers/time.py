@@ -100,3 +100,41 @@ def time_affinity_score(
         )
         / m_range,
     )
+
+
+def time_affinity_scores(
+    t1_min: np.ndarray | float,
+    t2_min: np.ndarray | float,
+    t1_max: np.ndarray | float,
+    t2_max: np.ndarray | float,
+    m_range: float = 0.8,
+) -> np.ndarray:
+    """
+    Vectorized version of `time_affinity_score`. The arguments are broadcast
+    against each other, so a whole row or column of the time affinity matrix
+    can be computed in one call.
+
+    Args:
+        t1_min (np.ndarray | float): Earliest preferred departure times of the
+            first passengers.
+        t2_min (np.ndarray | float): Earliest preferred departure times of the
+            second passengers.
+        t1_max (np.ndarray | float): Latest preferred departure times of the
+            first passengers.
+        t2_max (np.ndarray | float): Latest preferred departure times of the
+            second passengers.
+        m_range (float, optional): Proportion of total probability mass that should
+            lie within the preferred departure window. Defaults to 0.8.
+
+    Returns:
+        np.ndarray: The time affinities, each in [0, 1].
+    """
+    u1, std1 = calc_time_conv_params(
+        t_min=np.asarray(t1_min), t_max=np.asarray(t1_max), m_range=m_range
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = (
+            stats.norm.cdf(t2_max, u1, std1) - stats.norm.cdf(t2_min, u1, std1)
+        ) / m_range
+    # `fmin` maps NaNs from zero-width windows to 1 like the builtin `min`
+    return np.fmin(1, scores)
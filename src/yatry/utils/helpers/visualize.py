@@ -0,0 +1,108 @@
+import numpy as np
+from matplotlib import pyplot as plt
+from numpy import typing as npt
+from scipy import sparse
+
+from yatry.utils.helpers.affinity import iter_row_blocks
+
+# Whether the pipelines save the clustered affinity matrix with `plot_affinity`
+PLOT_AFFINITY: bool = False
+
+
+def _block_indicator(
+    n: int, labels: npt.ArrayLike | None, resolution: int
+) -> sparse.csr_matrix:
+    """
+    Creates the `n x B` indicator matrix putting every passenger into one of
+    `B = min(n, resolution)` consecutive blocks of the passengers sorted by
+    cluster label.
+    """
+    n_blocks = min(n, resolution)
+    order = (
+        np.argsort(np.asarray(labels), kind="stable")
+        if labels is not None
+        else np.arange(n)
+    )
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    blocks = rank * n_blocks // n
+    return sparse.csr_matrix(
+        (np.ones(n), (np.arange(n), blocks)), shape=(n, n_blocks)
+    )
+
+
+def block_affinity_image(
+    affinity: np.ndarray | sparse.spmatrix,
+    labels: npt.ArrayLike | None = None,
+    resolution: int = 512,
+) -> npt.NDArray[np.float64]:
+    """
+    Reorders passengers by cluster label and averages the affinity matrix over
+    blocks, giving an image of at most `resolution x resolution` pixels.
+
+    The blocks are aggregated with a sparse indicator matrix, so the reordered
+    matrix is never materialized and a sparse affinity graph is never
+    densified.
+
+    Args:
+        affinity (np.ndarray | sparse.spmatrix): The `n x n` affinity matrix.
+        labels (npt.ArrayLike | None): The cluster label of every passenger.
+            Passengers keep their order if not given.
+        resolution (int): The maximum number of blocks along each axis.
+
+    Returns:
+        npt.NDArray[np.float64]: The mean affinity of every block.
+    """
+    n = affinity.shape[0]
+    indicator = _block_indicator(n=n, labels=labels, resolution=resolution)
+    block_sizes = np.asarray(indicator.sum(axis=0)).ravel()
+
+    if sparse.issparse(affinity):
+        block_sums = (indicator.T @ sparse.csr_matrix(affinity) @ indicator).toarray()
+    else:
+        # Reads the matrix one block of rows at a time, which keeps memory-mapped
+        # matrices out of RAM
+        block_sums = np.zeros((indicator.shape[1], indicator.shape[1]))
+        for start, rows in iter_row_blocks(affinity):
+            block_sums += indicator[start : start + len(rows)].T @ (
+                np.asarray(rows) @ indicator
+            )
+    return block_sums / np.outer(block_sizes, block_sizes)
+
+
+def plot_affinity(
+    affinity: np.ndarray | sparse.spmatrix,
+    labels: npt.ArrayLike | None = None,
+    resolution: int = 512,
+    path: str = "fig.png",
+    title: str = "Combined Route-Time Affinity Matrix",
+) -> None:
+    """
+    Saves a raster image of the block-averaged affinity matrix, see
+    `block_affinity_image`.
+
+    Args:
+        affinity (np.ndarray | sparse.spmatrix): The `n x n` affinity matrix.
+        labels (npt.ArrayLike | None): The cluster label of every passenger.
+        resolution (int): The maximum number of blocks along each axis.
+        path (str): The raster image file to write.
+        title (str): The title of the plot.
+    """
+    image = block_affinity_image(affinity=affinity, labels=labels, resolution=resolution)
+    n = affinity.shape[0]
+
+    plt.figure(figsize=(10, 8))
+    plt.imshow(
+        image,
+        interpolation="nearest",
+        extent=(0, n, n, 0),
+        cmap="magma",
+    )
+    plt.colorbar(label="Affinity Score")
+    plt.title(title)
+    axis_label = "Passenger Index" + (" (by cluster)" if labels is not None else "")
+    plt.xlabel(axis_label)
+    plt.ylabel(axis_label)
+    plt.tight_layout()
+    plt.savefig(path, dpi=100)
+    plt.close()
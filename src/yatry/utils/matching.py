@@ -0,0 +1,122 @@
+import numpy as np
+from scipy import sparse
+
+from yatry.utils.data.map import BHOPAL
+from yatry.utils.helpers.affinity import build_knn_affinity_graph
+from yatry.utils.models import Passenger
+from yatry.utils.models.affinity import AffinityIndex
+from yatry.utils.models.map import Map
+from yatry.utils.optim.clustering import AffinityPropagationState, cluster_labels
+from yatry.utils.optim.compress import compressed_cluster_labels
+from yatry.utils.optim.group import GroupResult, process_group
+
+
+def cluster_passengers(
+    affinity_matrix: np.ndarray | sparse.spmatrix,
+    capacity: int = 5,
+    backend: str = "ap",
+    passenger_ids: list[str] | None = None,
+    ap_state: AffinityPropagationState | None = None,
+) -> list[list[int]]:
+    """
+    Groups passengers into autos from their affinity matrix.
+
+    Args:
+        affinity_matrix (np.ndarray | sparse.spmatrix): The `n x n` combined
+            affinity matrix, or a sparse affinity graph, see `cluster_labels`.
+        capacity (int): The capacity of an auto.
+        backend (str): The clustering backend, see `cluster_labels`.
+        passenger_ids (list[str] | None): The passenger of every row, needed
+            with `ap_state`.
+        ap_state (AffinityPropagationState | None): The AP messages of the
+            previous batch, updated in place, see `cluster_labels`.
+
+    Returns:
+        list[list[int]]: The passenger indices of every group.
+    """
+    n_passengers = affinity_matrix.shape[0]
+    if n_passengers <= 1:
+        return [list(range(n_passengers))] if n_passengers else []
+
+    labels = cluster_labels(
+        affinity_matrix=affinity_matrix,
+        backend=backend,
+        capacity=capacity,
+        passenger_ids=passenger_ids,
+        ap_state=ap_state,
+    )
+    return [
+        [int(i) for i in np.flatnonzero(labels == label)]
+        for label in np.unique(labels)
+    ]
+
+
+def match_passengers(
+    passengers: list[Passenger],
+    map_: Map = BHOPAL,
+    capacity: int = 5,
+    quantum: float | None = None,
+    knn: int | None = None,
+    ap_state: AffinityPropagationState | None = None,
+) -> list[GroupResult]:
+    """
+    Runs the matching stages on a batch of passengers: builds the affinity
+    matrix, clusters the passengers into autos and optimizes the departure
+    time and fares of every auto.
+
+    Args:
+        passengers (list[Passenger]): The passengers of the batch.
+        map_ (Map): The map to plan the trips on.
+        capacity (int): The capacity of an auto.
+        quantum (float | None): If given, passengers with the same route and
+            departure window up to `quantum` seconds are clustered as one
+            weighted entity, see `compressed_cluster_labels`. This keeps the
+            affinity matrix small for batches with many identical requests.
+        knn (int | None): If given, passengers are clustered with the Louvain
+            backend on the sparse graph of their `knn` best partners, see
+            `build_knn_affinity_graph`, instead of the dense affinity matrix.
+            It cannot be combined with `quantum`.
+        ap_state (AffinityPropagationState | None): If given, Affinity
+            Propagation resumes from the messages it holds for the passengers
+            of an earlier batch and they are updated in place, see
+            `affinity_propagation_ride_sharing`. Pass the same state for
+            consecutive overlapping batches. It needs the dense affinity
+            matrix, so it cannot be combined with `quantum` or `knn`.
+
+    Returns:
+        list[GroupResult]: The result of every auto in the batch.
+    """
+    if quantum is not None and knn is not None:
+        raise ValueError("Compressed demand and kNN graphs cannot be combined")
+    if ap_state is not None and (quantum is not None or knn is not None):
+        raise ValueError("Warm-started AP needs the dense affinity matrix")
+
+    if knn is not None:
+        graph = build_knn_affinity_graph(passengers=passengers, map_=map_, k=knn)
+        groups = cluster_passengers(
+            affinity_matrix=graph, capacity=capacity, backend="louvain"
+        )
+    elif quantum is None or len(passengers) <= 1:
+        index = AffinityIndex.from_passengers(passengers=passengers, map_=map_)
+        groups = cluster_passengers(
+            affinity_matrix=index.matrix,
+            capacity=capacity,
+            passenger_ids=[p.name for p in passengers],
+            ap_state=ap_state,
+        )
+    else:
+        labels = compressed_cluster_labels(
+            passengers=passengers, map_=map_, capacity=capacity, quantum=quantum
+        )
+        groups = [
+            [int(i) for i in np.flatnonzero(labels == label)]
+            for label in np.unique(labels)
+        ]
+    return [
+        process_group(
+            group_id=group_id,
+            passengers=[passengers[i] for i in idxs],
+            map_=map_,
+        )
+        for group_id, idxs in enumerate(groups)
+    ]
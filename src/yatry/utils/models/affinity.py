@@ -0,0 +1,232 @@
+from dataclasses import replace
+from datetime import datetime
+
+import numpy as np
+from numpy import typing as npt
+
+from yatry.utils.data.locations import Location
+from yatry.utils.helpers.time import time_affinity_scores
+from yatry.utils.models import Passenger
+from yatry.utils.models.map import Map
+
+
+class AffinityIndex:
+    """
+    Maintains the affinity matrix of a changing set of passengers.
+
+    The time affinity `tau`, the route affinity `rho` and their product are
+    stored in preallocated arrays with spare capacity. Adding, removing or
+    updating a passenger only recomputes or moves one row and one column, so
+    joins and cancellations in a live batch cost O(N) instead of a full
+    O(N^2) rebuild. Removed passengers are swapped with the last slot to keep
+    the matrix compact.
+
+    Passengers are identified by their `name`.
+
+    Attributes:
+        _map (Map): The map used to compute route affinities.
+        _m_range (float): The `m_range` of the time convenience functions.
+        _size (int): The number of passengers in the index.
+        _passengers (list[Passenger]): The passenger in every slot.
+        _routes (list[list[Location]]): The route of the passenger in every slot.
+        _windows (npt.NDArray[np.float64]): The `(t_min, t_max)` timestamps of
+            the passenger in every slot.
+        _slots (dict[str, int]): The slot of every passenger ID.
+        _tau (npt.NDArray[np.float64]): The time affinity matrix.
+        _rho (npt.NDArray[np.float64]): The route affinity matrix.
+        _affinity (npt.NDArray[np.float64]): The combined affinity `rho * tau`.
+    """
+
+    _map: Map
+    _m_range: float
+    _size: int
+    _passengers: list[Passenger]
+    _routes: list[list[Location]]
+    _windows: npt.NDArray[np.float64]
+    _slots: dict[str, int]
+    _tau: npt.NDArray[np.float64]
+    _rho: npt.NDArray[np.float64]
+    _affinity: npt.NDArray[np.float64]
+
+    def __init__(self, map_: Map, capacity: int = 64, m_range: float = 0.8) -> None:
+        """
+        Initializes an empty index.
+
+        Args:
+            map_ (Map): The map to compute route affinities on.
+            capacity (int): The number of passengers to allocate space for.
+                The arrays are doubled whenever they run out of space.
+            m_range (float): The `m_range` of the time convenience functions.
+        """
+        self._map = map_
+        self._m_range = m_range
+        self._size = 0
+        self._passengers = []
+        self._routes = []
+        self._slots = {}
+        self._windows = np.zeros((capacity, 2), dtype=np.float64)
+        self._tau = np.zeros((capacity, capacity), dtype=np.float64)
+        self._rho = np.zeros((capacity, capacity), dtype=np.float64)
+        self._affinity = np.zeros((capacity, capacity), dtype=np.float64)
+
+    @classmethod
+    def from_passengers(
+        cls, passengers: list[Passenger], map_: Map, m_range: float = 0.8
+    ) -> "AffinityIndex":
+        index = cls(map_=map_, capacity=max(len(passengers), 1), m_range=m_range)
+        for passenger in passengers:
+            index.add(passenger=passenger)
+        return index
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, passenger_id: str) -> bool:
+        return passenger_id in self._slots
+
+    @property
+    def capacity(self) -> int:
+        return self._tau.shape[0]
+
+    @property
+    def passengers(self) -> list[Passenger]:
+        return list(self._passengers)
+
+    @property
+    def ids(self) -> list[str]:
+        return [passenger.name for passenger in self._passengers]
+
+    @property
+    def tau(self) -> npt.NDArray[np.float64]:
+        return self._tau[: self._size, : self._size]
+
+    @property
+    def rho(self) -> npt.NDArray[np.float64]:
+        return self._rho[: self._size, : self._size]
+
+    @property
+    def matrix(self) -> npt.NDArray[np.float64]:
+        """
+        The combined affinity matrix of the passengers, in slot order. This is
+        a view into the index and changes with it.
+        """
+        return self._affinity[: self._size, : self._size]
+
+    def slot(self, passenger_id: str) -> int:
+        return self._slots[passenger_id]
+
+    def _grow(self) -> None:
+        n, capacity = self._size, 2 * self.capacity
+        windows = np.zeros((capacity, 2), dtype=np.float64)
+        windows[:n] = self._windows[:n]
+        self._windows = windows
+        for name in ("_tau", "_rho", "_affinity"):
+            grown = np.zeros((capacity, capacity), dtype=np.float64)
+            grown[:n, :n] = getattr(self, name)[:n, :n]
+            setattr(self, name, grown)
+
+    def _fill_tau(self, i: int) -> None:
+        n = self._size
+        t_min, t_max = self._windows[:n, 0], self._windows[:n, 1]
+        self._tau[i, :n] = time_affinity_scores(
+            t1_min=t_min[i], t2_min=t_min, t1_max=t_max[i], t2_max=t_max,
+            m_range=self._m_range,
+        )
+        self._tau[:n, i] = time_affinity_scores(
+            t1_min=t_min, t2_min=t_min[i], t1_max=t_max, t2_max=t_max[i],
+            m_range=self._m_range,
+        )
+
+    def _fill_rho(self, i: int) -> None:
+        route = self._routes[i]
+        for j, other in enumerate(self._routes):
+            self._rho[i, j] = self._map._get_route_affinity(route1=route, route2=other)
+            self._rho[j, i] = self._map._get_route_affinity(route1=other, route2=route)
+
+    def _fill_affinity(self, i: int) -> None:
+        n = self._size
+        self._affinity[i, :n] = self._rho[i, :n] * self._tau[i, :n]
+        self._affinity[:n, i] = self._rho[:n, i] * self._tau[:n, i]
+
+    def add(self, passenger: Passenger) -> int:
+        """
+        Adds a passenger and computes their row and column of the matrices.
+
+        Args:
+            passenger (Passenger): The passenger to add.
+
+        Returns:
+            int: The slot of the passenger.
+        """
+        if passenger.name in self._slots:
+            raise ValueError(f"Passenger {passenger.name!r} is already indexed")
+        if self._size == self.capacity:
+            self._grow()
+
+        i = self._size
+        self._size += 1
+        self._slots[passenger.name] = i
+        self._passengers.append(passenger)
+        self._routes.append(
+            self._map._find_route(
+                loc_start=passenger.source, loc_end=passenger.destination
+            )
+        )
+        self._windows[i] = passenger.get_dep_time_range_num()
+
+        self._fill_tau(i)
+        self._fill_rho(i)
+        self._fill_affinity(i)
+        return i
+
+    def remove(self, passenger_id: str) -> Passenger:
+        """
+        Removes a passenger, moving the passenger in the last slot into the
+        freed slot.
+
+        Args:
+            passenger_id (str): The name of the passenger to remove.
+
+        Returns:
+            Passenger: The removed passenger.
+        """
+        i = self._slots.pop(passenger_id)
+        last = self._size - 1
+        removed = self._passengers[i]
+
+        if i != last:
+            self._passengers[i] = self._passengers[last]
+            self._routes[i] = self._routes[last]
+            self._windows[i] = self._windows[last]
+            self._slots[self._passengers[i].name] = i
+            for matrix in (self._tau, self._rho, self._affinity):
+                matrix[i, : last + 1] = matrix[last, : last + 1]
+                matrix[: last + 1, i] = matrix[: last + 1, last]
+                matrix[i, i] = matrix[last, last]
+
+        self._passengers.pop()
+        self._routes.pop()
+        self._size = last
+        return removed
+
+    def update_window(
+        self, passenger_id: str, dep_time_range: tuple[datetime, datetime]
+    ) -> Passenger:
+        """
+        Changes the preferred departure window of a passenger. Only the time
+        affinities of the passenger are recomputed.
+
+        Args:
+            passenger_id (str): The name of the passenger to update.
+            dep_time_range (tuple[datetime, datetime]): The new window.
+
+        Returns:
+            Passenger: The updated passenger.
+        """
+        i = self._slots[passenger_id]
+        passenger = replace(self._passengers[i], dep_time_range=dep_time_range)
+        self._passengers[i] = passenger
+        self._windows[i] = passenger.get_dep_time_range_num()
+        self._fill_tau(i)
+        self._fill_affinity(i)
+        return passenger
@@ -0,0 +1,233 @@
+from collections.abc import Sequence
+from datetime import datetime
+
+import numpy as np
+from numpy import typing as npt
+
+from yatry.utils.data.locations import Location
+from yatry.utils.models import Passenger
+from yatry.utils.models.map import Map
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def _seconds_of_day(dep_time: datetime) -> float:
+    return (
+        dep_time.hour * 3600
+        + dep_time.minute * 60
+        + dep_time.second
+        + dep_time.microsecond / 1e6
+    )
+
+
+class FareTable:
+    """
+    Road fares by time of day, compiled for vectorized lookup.
+
+    The day is split into buckets, and the fares of all roads in every bucket
+    are stored as a `B x E` array. Every road of the map tree is identified by
+    the location at its far end from the root, and every location by the
+    roads leading to it from the root. As routes in a tree are unique, the
+    roads of the route between two locations are those leading to either one
+    but not both, so the fares of a whole array of routes are a single
+    product of the fare rows of their buckets with these road indicators.
+
+    Attributes:
+        map_ (Map): The map the fares are compiled from.
+        locations (list[Location]): The locations of the map, by code.
+        roads (list[tuple[Location, Location]]): The roads of the map, by edge
+            index, from the end closer to the root.
+        bucket_starts (npt.NDArray[np.float64]): The second of the day every
+            bucket starts at, in increasing order from 0.
+        fares (npt.NDArray[np.float64]): The `B x E` fare of every road in
+            every bucket.
+        utc_offset (float | None): Seconds to add to a timestamp to get local
+            time, or `None` to read every departure time in its own zone, see
+            `buckets`.
+        _codes (dict[Location, int]): The code of every location.
+        _paths (npt.NDArray[np.bool_]): The `L x E` roads leading to every
+            location from the root.
+    """
+
+    map_: Map
+    locations: list[Location]
+    roads: list[tuple[Location, Location]]
+    bucket_starts: npt.NDArray[np.float64]
+    fares: npt.NDArray[np.float64]
+    utc_offset: float | None
+    _codes: dict[Location, int]
+    _paths: npt.NDArray[np.bool_]
+
+    def __init__(
+        self,
+        map_: Map,
+        bucket_starts: Sequence[float] = (0.0,),
+        multipliers: npt.ArrayLike = (1.0,),
+        utc_offset: float | None = None,
+    ) -> None:
+        """
+        Compiles the fares of `map_`, scaled per bucket.
+
+        Args:
+            map_ (Map): The map with the base fares of its roads.
+            bucket_starts (Sequence[float]): The second of the day every bucket
+                starts at. The first must be 0.
+            multipliers (npt.ArrayLike): The factor applied to the base fares
+                in every bucket, either one per bucket or a `B x E` array with
+                one per bucket and road.
+            utc_offset (float | None): Seconds to add to a timestamp to get
+                local time, for fares in a fixed zone. By default every
+                departure time is bucketed in its own zone, see `buckets`.
+        """
+        self.bucket_starts = np.asarray(bucket_starts, dtype=np.float64)
+        if self.bucket_starts[0] != 0 or np.any(np.diff(self.bucket_starts) <= 0):
+            raise ValueError("Buckets must start at 0 and be in increasing order")
+
+        self.map_ = map_
+        self.locations = [map_.root.value]
+        self.roads = []
+        paths = [[]]
+        stack = [(map_.root, 0)]
+        while stack:
+            node, code = stack.pop()
+            for child in node.children:
+                self.roads.append((node.value, child.value))
+                self.locations.append(child.value)
+                paths.append(paths[code] + [len(self.roads) - 1])
+                stack.append((child, len(self.locations) - 1))
+
+        self._codes = {loc: code for code, loc in enumerate(self.locations)}
+        self._paths = np.zeros((len(self.locations), len(self.roads)), dtype=bool)
+        for code, path in enumerate(paths):
+            self._paths[code, path] = True
+
+        base = np.array([map_.get_road_fare(*road) for road in self.roads])
+        multipliers = np.asarray(multipliers, dtype=np.float64)
+        if multipliers.ndim == 1:
+            multipliers = multipliers[:, None]
+        self.fares = np.broadcast_to(
+            base[None, :] * multipliers, (len(self.bucket_starts), len(self.roads))
+        ).copy()
+        self.utc_offset = utc_offset
+
+    def road_index(self, loc_1: Location, loc_2: Location) -> int:
+        """
+        The edge index of the road between two adjacent locations, in either
+        order.
+        """
+        for k, road in enumerate(self.roads):
+            if set(road) == {loc_1, loc_2}:
+                return k
+        raise ValueError(f"No road between {loc_1.name} and {loc_2.name}")
+
+    def set_fare(
+        self, loc_1: Location, loc_2: Location, fare: float, bucket: int | None = None
+    ) -> None:
+        """
+        Overrides the fare of a road, in one bucket or in all of them.
+        """
+        road = self.road_index(loc_1=loc_1, loc_2=loc_2)
+        self.fares[slice(None) if bucket is None else bucket, road] = fare
+
+    def buckets(self, dep_times: npt.ArrayLike) -> npt.NDArray[np.int64]:
+        """
+        The bucket of every departure time, given as timestamps or `datetime`s.
+
+        Without a fixed `utc_offset`, a `datetime` is bucketed by its wall
+        time in its own zone, which is the local zone for naive ones, and a
+        timestamp by the wall time of the local zone at that instant, so that
+        daylight saving time is taken into account. With a `utc_offset`, all
+        of them are converted to timestamps and shifted by it.
+        """
+        dep_times = np.asarray(dep_times)
+        if dep_times.dtype == object:
+            if self.utc_offset is None:
+                seconds = np.vectorize(_seconds_of_day, otypes=[np.float64])(
+                    dep_times
+                )
+            else:
+                seconds = np.vectorize(datetime.timestamp, otypes=[np.float64])(
+                    dep_times
+                )
+                seconds += self.utc_offset
+        elif self.utc_offset is None:
+            # The local offset changes with daylight saving time, so it is
+            # looked up for every distinct timestamp
+            unique, inverse = np.unique(
+                dep_times.astype(np.float64), return_inverse=True
+            )
+            local = np.fromiter(
+                (_seconds_of_day(datetime.fromtimestamp(t)) for t in unique),
+                dtype=np.float64,
+                count=len(unique),
+            )
+            seconds = local[inverse].reshape(dep_times.shape)
+        else:
+            seconds = dep_times.astype(np.float64) + self.utc_offset
+        seconds %= SECONDS_PER_DAY
+        return np.searchsorted(self.bucket_starts, seconds, side="right") - 1
+
+    def codes(self, locations: Sequence[Location]) -> npt.NDArray[np.int64]:
+        """
+        The code of every location, indexing `locations`.
+        """
+        return np.fromiter(
+            (self._codes[loc] for loc in locations),
+            dtype=np.int64,
+            count=len(locations),
+        )
+
+    def route_fares(
+        self,
+        sources: Sequence[Location] | npt.NDArray[np.int64],
+        destinations: Sequence[Location] | npt.NDArray[np.int64],
+        dep_times: npt.ArrayLike,
+    ) -> npt.NDArray[np.float64]:
+        """
+        Evaluates the fares of many routes at once.
+
+        Args:
+            sources (Sequence[Location] | npt.NDArray[np.int64]): The start of
+                every route, as locations or their codes.
+            destinations (Sequence[Location] | npt.NDArray[np.int64]): The end
+                of every route, as locations or their codes.
+            dep_times (npt.ArrayLike): The departure time of every route as a
+                timestamp or `datetime`, or a single one for all of them, see
+                `buckets`.
+
+        Returns:
+            npt.NDArray[np.float64]: The fare of every route at its departure
+                time.
+        """
+        if not isinstance(sources, np.ndarray):
+            sources = self.codes(sources)
+        if not isinstance(destinations, np.ndarray):
+            destinations = self.codes(destinations)
+
+        roads = self._paths[sources] != self._paths[destinations]
+        buckets = np.broadcast_to(self.buckets(dep_times), sources.shape)
+        return np.einsum("ne,ne->n", self.fares[buckets], roads)
+
+    def passenger_fares(
+        self, passengers: list[Passenger], dep_times: npt.ArrayLike | None = None
+    ) -> npt.NDArray[np.float64]:
+        """
+        The solo fare of every passenger at their departure time.
+
+        Args:
+            passengers (list[Passenger]): The passengers.
+            dep_times (npt.ArrayLike | None): The departure time of every
+                passenger as a timestamp or `datetime`, see `buckets`.
+                Defaults to the start of their departure windows, in the zone
+                they are given in.
+
+        Returns:
+            npt.NDArray[np.float64]: The fare of every passenger.
+        """
+        if dep_times is None:
+            dep_times = [p.dep_time_range[0] for p in passengers]
+        return self.route_fares(
+            sources=[p.source for p in passengers],
+            destinations=[p.destination for p in passengers],
+            dep_times=dep_times,
+        )
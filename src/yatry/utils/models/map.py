@@ -1,3 +1,5 @@
+import hashlib
+
 from yatry.utils.models.tree import Tree
 from yatry.utils.models import Passenger
 from yatry.utils.data.locations import Location
@@ -64,6 +66,24 @@ class Map:
     def root(self) -> Tree[Location]:
         return self._root
 
+    @property
+    def version(self) -> str:
+        """
+        A digest of the roads and their fares, which changes whenever the map
+        does. Used to key data derived from the map, like cached affinities.
+        """
+        roads = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            for child in node.children:
+                fare = self._roads[node.value, child.value]
+                roads.append(f"{node.value.name}>{child.value.name}:{fare!r}")
+                stack.append(child)
+        return hashlib.sha256(
+            "\n".join([self._root.value.name, *sorted(roads)]).encode()
+        ).hexdigest()
+
     def add_road(self, loc_from: Location, loc_to: Location, fare: float) -> None:
         """
         Adds a road between two locations in the map.
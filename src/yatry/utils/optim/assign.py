@@ -1,4 +1,119 @@
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass
+
+import numpy as np
 import pulp
+from scipy import sparse
+from scipy.optimize import Bounds, LinearConstraint, milp
+
+
+@dataclass
+class SolverConfig:
+    """
+    Configuration of the MILP solver used by `VehicleAssignmentModel.solve`.
+
+    Attributes:
+        solver (str): `"CBC"` or `"HiGHS"`.
+        time_limit (float | None): Time limit of the solve in seconds.
+        mip_gap (float | None): Relative MIP gap at which to stop.
+        threads (int | None): Number of solver threads.
+        msg (bool): Whether to print the solver log.
+        fallback (bool): Whether to fall back to a greedy heuristic assignment
+            if the solver stops without an incumbent.
+        bound_shortcut (bool): Whether to first try to assign the trips
+            without the solver, which succeeds when an assignment attains a
+            lower bound of the optimum, see
+            `VehicleAssignmentModel._solve_at_bound`. This covers most small
+            groups. The solver runs on every other instance.
+    """
+
+    solver: str = "CBC"
+    time_limit: float | None = None
+    mip_gap: float | None = None
+    threads: int | None = None
+    msg: bool = False
+    fallback: bool = True
+    bound_shortcut: bool = True
+
+    def make_solver(self, log_path: str | None = None) -> pulp.LpSolver:
+        """
+        Creates the `pulp` solver for this configuration.
+
+        Args:
+            log_path (str | None): File to write the CBC log to.
+
+        Returns:
+            pulp.LpSolver: The configured solver.
+        """
+        if self.solver.upper() == "CBC":
+            return pulp.PULP_CBC_CMD(
+                msg=self.msg,
+                timeLimit=self.time_limit,
+                gapRel=self.mip_gap,
+                threads=self.threads,
+                logPath=log_path,
+            )
+        if self.solver.upper() == "HIGHS":
+            solver_cls = pulp.HiGHS if pulp.HiGHS().available() else pulp.HiGHS_CMD
+            return solver_cls(
+                msg=self.msg,
+                timeLimit=self.time_limit,
+                gapRel=self.mip_gap,
+                threads=self.threads,
+            )
+        raise ValueError(f"Unknown solver {self.solver!r}, expected 'CBC' or 'HiGHS'")
+
+
+@dataclass
+class SolveReport:
+    """
+    Statistics of a single `VehicleAssignmentModel.solve` call.
+
+    Attributes:
+        status (str): The `pulp` status of the solve, `"Integer Feasible"` if
+            the solver stopped at a limit with an incumbent, or `"Heuristic"`
+            if the heuristic fallback produced the assignment.
+        solver (str): The solver that was used.
+        build_time (float): Seconds spent building the model.
+        solve_time (float): Seconds spent in the solver.
+        objective (float | None): The maximum per-passenger fare `Z`.
+        gap (float | None): The relative MIP gap reported by the solver.
+        nodes (int | None): The number of branch-and-bound nodes.
+        fallback (bool): Whether the heuristic fallback was used.
+    """
+
+    status: str
+    solver: str
+    build_time: float
+    solve_time: float
+    objective: float | None = None
+    gap: float | None = None
+    nodes: int | None = None
+    fallback: bool = False
+
+
+def _parse_cbc_log(log: str) -> tuple[float | None, int | None]:
+    """
+    Extracts the relative gap and the number of enumerated nodes from a CBC log.
+    """
+    nodes_match = re.search(r"Enumerated nodes:\s+(\d+)", log)
+    nodes = int(nodes_match.group(1)) if nodes_match else None
+
+    gap_match = re.search(r"^Gap:\s+([-\d.e+]+)", log, flags=re.MULTILINE)
+    if gap_match:
+        return float(gap_match.group(1)), nodes
+
+    obj_match = re.search(r"^Objective value:\s+([-\d.e+]+)", log, flags=re.MULTILINE)
+    bound_match = re.search(r"^Lower bound:\s+([-\d.e+]+)", log, flags=re.MULTILINE)
+    if obj_match and bound_match:
+        obj, bound = float(obj_match.group(1)), float(bound_match.group(1))
+        return abs(obj - bound) / max(abs(obj), 1e-10), nodes
+    if obj_match and "Optimal solution found" in log:
+        return 0.0, nodes
+    return None, nodes
 
 
 class VehicleAssignmentModel:
@@ -43,6 +158,7 @@ class VehicleAssignmentModel:
                     self.T_seg[s].append(t)
 
     def build_model(self):
+        build_start = time.perf_counter()
         self.model = pulp.LpProblem("VehicleAssignment", pulp.LpMinimize)
         # Decision vars
         x = {
@@ -118,18 +234,253 @@ class VehicleAssignmentModel:
 
         # store for external use
         self.x, self.y, self.occ, self.gamma, self.F, self.Z = x, y, occ, gamma, F, Z
+        self.build_time = time.perf_counter() - build_start
         return self.model
 
-    def solve(self, **kwargs):
-        self.model.solve(**kwargs)
+    def solve(self, config=None, **kwargs):
+        """
+        Solves the model and stores the assignment for `get_results`.
+
+        Args:
+            config (SolverConfig | None): Solver, time limit, MIP gap and thread
+                count to use. If not given, `kwargs` are forwarded to
+                `LpProblem.solve` as before.
+
+        Returns:
+            str: The `pulp` status of the solve, `"Integer Feasible"` if the
+                solver stopped at a limit with an incumbent, or `"Heuristic"`
+                if it stopped without one and `config.fallback` is set.
+                Without a `config` the `pulp` status is returned as before,
+                and there is no fallback. Timing and solver statistics are
+                stored in `self.report`.
+
+        Raises:
+            RuntimeError: If the solver stops without an incumbent and
+                `config.fallback` is not set, as in
+                `SparseVehicleAssignmentModel.solve`.
+        """
+        if config is not None and config.bound_shortcut and self._solve_at_bound():
+            return self.report.status
+        if not hasattr(self, "model"):
+            self.build_model()
+
+        if config is None:
+            solve_start = time.perf_counter()
+            self.model.solve(**kwargs)
+            self.report = SolveReport(
+                status=pulp.LpStatus[self.model.status],
+                solver=kwargs["solver"].name if "solver" in kwargs else "default",
+                build_time=self.build_time,
+                solve_time=time.perf_counter() - solve_start,
+            )
+        else:
+            self.report = self._solve_with_config(config=config)
+
+        has_incumbent = self.model.sol_status in (
+            pulp.LpSolutionOptimal,
+            pulp.LpSolutionIntegerFeasible,
+        )
+        if config is None:
+            # Legacy calls keep the `pulp` status and any missing values
+            self._extract_solution()
+            self.report.objective = self.Z_val
+            return self.report.status
+
+        if not has_incumbent and not config.fallback:
+            raise RuntimeError(
+                f"{config.solver} found no solution: {self.report.status}"
+            )
+        if self.model.sol_status == pulp.LpSolutionIntegerFeasible:
+            self.report.status = "Integer Feasible"
+        if not has_incumbent:
+            self._solve_heuristic()
+            self.report.status = "Heuristic"
+            self.report.fallback = True
+        else:
+            self._extract_solution()
+
+        self.report.objective = self.Z_val
+        return self.report.status
+
+    def _solve_with_config(self, config):
+        solver_name = config.solver.upper()
+        log_fd, log_path = tempfile.mkstemp(suffix=".log")
+        os.close(log_fd)
+        try:
+            solver = config.make_solver(
+                log_path=log_path if solver_name == "CBC" else None
+            )
+            solve_start = time.perf_counter()
+            self.model.solve(solver)
+            solve_time = time.perf_counter() - solve_start
+
+            gap, nodes = None, None
+            if solver_name == "CBC":
+                with open(log_path) as f:
+                    gap, nodes = _parse_cbc_log(f.read())
+            elif getattr(self.model, "solverModel", None) is not None:
+                info = self.model.solverModel.getInfo()
+                gap, nodes = info.mip_gap, info.mip_node_count
+        finally:
+            os.remove(log_path)
+
+        return SolveReport(
+            status=pulp.LpStatus[self.model.status],
+            solver=config.solver,
+            build_time=self.build_time,
+            solve_time=solve_time,
+            gap=gap,
+            nodes=nodes,
+        )
+
+    def _extract_solution(self):
         # Extract assignments
         self.assignments = {
             v: [t for t in self.T if pulp.value(self.x[(t, v)]) > 0.5]  # type: ignore
             for v in self.V
             if any(pulp.value(self.x[(t, v)]) > 0.5 for t in self.T)  # type: ignore
         }
+        self.fares = {t: pulp.value(self.F[t]) for t in self.T}
+        self.occupancy = {
+            v: {
+                s: pulp.value(self.occ[(v, s)])
+                for s in self.segments
+                if pulp.value(self.y[(v, s)]) > 0.5  # type: ignore
+            }
+            for v in self.assignments
+        }
         self.Z_val = pulp.value(self.Z)
-        return pulp.LpStatus[self.model.status]
+
+    def _solve_heuristic(self):
+        """
+        Assigns trips to vehicles greedily when the solver has no incumbent.
+
+        Trips are taken longest first and put in the open vehicle with the most
+        occupied segments in common that still has room for them on every
+        segment they travel; otherwise a new vehicle is opened.
+        """
+        load = {v: {s: 0 for s in self.segments} for v in self.V}
+        self.assignments = {}
+        order = sorted(
+            self.T,
+            key=lambda t: (
+                self.trips[t]["pickup"] - self.trips[t]["drop"],
+                self.trips[t]["pickup"],
+            ),
+        )
+        for t in order:
+            S_t = self._trip_segments(t)
+            count = self.trips[t]["count"]
+            best_v, best_shared = None, -1
+            for v in self.assignments:
+                if all(load[v][s] + count <= self.CAPACITY for s in S_t):
+                    shared = sum(load[v][s] > 0 for s in S_t)
+                    if shared > best_shared:
+                        best_v, best_shared = v, shared
+            if best_v is None:
+                best_v = len(self.assignments)
+                self.assignments[best_v] = []
+            self.assignments[best_v].append(t)
+            for s in S_t:
+                load[best_v][s] += count
+
+        self.occupancy = {
+            v: {s: float(occ) for s, occ in load[v].items() if occ > 0}
+            for v in self.assignments
+        }
+        self.fares = {}
+        for v, trips in self.assignments.items():
+            for t in trips:
+                self.fares[t] = sum(
+                    self.segment_costs[s - 1] / self.occupancy[v][s]
+                    for s in self._trip_segments(t)
+                )
+        self.Z_val = max(self.fares.values())
+
+    def _solve_at_bound(self):
+        """
+        Assigns the trips without the MILP when an assignment provably attains
+        the optimum. It is a shortcut for the instances where this is easy to
+        see, not an algorithm for the assignment in general, which is left to
+        the MILP otherwise.
+
+        No vehicle can carry more than `min(CAPACITY, load)` passengers on a
+        segment, where `load` is the number of passengers of all trips on it,
+        so every trip pays at least its fare at these occupancies, and `Z` is
+        at least the largest of these fares. Trips overlapping each other,
+        directly or through other trips, form a component of the line. If no
+        segment of a component carries more than `CAPACITY` passengers, one
+        vehicle per component attains this bound for every trip at once.
+        Otherwise the greedy assignment of `_solve_heuristic` is kept if its
+        `Z` attains the bound.
+
+        Returns:
+            bool: Whether an assignment attaining the bound was found and
+                stored, along with `self.report`.
+        """
+        start = time.perf_counter()
+        load = {s: 0 for s in self.segments}
+        for t in self.T:
+            for s in self._trip_segments(t):
+                load[s] += self.trips[t]["count"]
+
+        components = []
+        reach = 0
+        for t in sorted(self.T, key=lambda t: self.trips[t]["pickup"]):
+            if not components or self.trips[t]["pickup"] >= reach:
+                components.append([])
+            components[-1].append(t)
+            reach = max(reach, self.trips[t]["drop"])
+
+        if all(
+            load[s] <= self.CAPACITY
+            for component in components
+            for t in component
+            for s in self._trip_segments(t)
+        ):
+            self.assignments = dict(enumerate(components))
+            self.occupancy = {
+                v: {
+                    s: float(load[s])
+                    for t in trips
+                    for s in self._trip_segments(t)
+                }
+                for v, trips in self.assignments.items()
+            }
+            self.fares = {
+                t: sum(self.segment_costs[s - 1] / load[s] for s in self._trip_segments(t))
+                for t in self.T
+            }
+            self.Z_val = max(self.fares.values())
+        else:
+            bound = max(
+                sum(
+                    self.segment_costs[s - 1] / min(self.CAPACITY, load[s])
+                    for s in self._trip_segments(t)
+                )
+                for t in self.T
+            )
+            self._solve_heuristic()
+            if self.Z_val > bound * (1 + 1e-9):
+                return False
+
+        self.report = SolveReport(
+            status="Optimal",
+            solver="Bound",
+            build_time=0.0,
+            solve_time=time.perf_counter() - start,
+            objective=self.Z_val,
+            gap=0.0,
+            nodes=0,
+        )
+        return True
+
+    def _trip_segments(self, t):
+        return [
+            s
+            for s in self.segments
+            if self.trips[t]["pickup"] <= s < self.trips[t]["drop"]
+        ]
 
     def get_results(self):
         used_vs = sorted(self.assignments.keys())  # e.g. [3,7]
@@ -147,12 +498,276 @@ class VehicleAssignmentModel:
                         "pickup": self.trips[t]["pickup"],
                         "drop": self.trips[t]["drop"],
                         "count": self.trips[t]["count"],
-                        "fare": pulp.value(self.F[t]),
-                        "occ": {
-                            s: pulp.value(self.occ[(v, s)])
-                            for s in self.segments
-                            if pulp.value(self.y[(v, s)]) > 0.5  # type: ignore
-                        },
+                        "fare": self.fares[t],
+                        "occ": self.occupancy[v],
                     }
                 )
-        return {"Z": pulp.value(self.Z), "details": details}
+        return {"Z": self.Z_val, "details": details}
+
+
+# `pulp` status names of the `scipy.optimize.milp` statuses
+_MILP_STATUS = {
+    0: "Optimal",
+    1: "Not Solved",
+    2: "Infeasible",
+    3: "Unbounded",
+    4: "Undefined",
+}
+
+
+class SparseVehicleAssignmentModel(VehicleAssignmentModel):
+    """
+    The formulation of `VehicleAssignmentModel`, assembled directly as a
+    sparse constraint matrix and solved with `scipy.optimize.milp` (HiGHS).
+
+    Every block of constraints is generated with array operations from the
+    `trips x segments` membership matrix, so building the model costs time
+    proportional to its nonzeros instead of thousands of `pulp` expressions.
+    The results come back in the shape of `get_results` as before.
+
+    The variables are laid out in one vector as `x[t, v]`, `y[v, s]`,
+    `occ[v, s]`, `gamma[v, s, k]`, `F[t]` and `Z`, in row-major order.
+    """
+
+    def _variable_indices(self):
+        n_t, n_v, n_s, n_k = len(self.T), len(self.V), len(self.segments), self.CAPACITY
+        sizes = {
+            "x": (n_t, n_v),
+            "y": (n_v, n_s),
+            "occ": (n_v, n_s),
+            "gamma": (n_v, n_s, n_k),
+            "F": (n_t,),
+            "Z": (),
+        }
+        indices, offset = {}, 0
+        for name, shape in sizes.items():
+            size = int(np.prod(shape))
+            indices[name] = np.arange(offset, offset + size).reshape(shape)
+            offset += size
+        return indices, offset
+
+    def build_model(self):
+        build_start = time.perf_counter()
+        idx, n_vars = self._variable_indices()
+        x, y, occ, gamma, F, Z = (idx[name] for name in ("x", "y", "occ", "gamma", "F", "Z"))
+        n_t, n_v, n_s, n_k = len(self.T), len(self.V), len(self.segments), self.CAPACITY
+
+        counts = np.array([trip["count"] for trip in self.trips], dtype=np.float64)
+        pickups = np.array([trip["pickup"] for trip in self.trips])
+        drops = np.array([trip["drop"] for trip in self.trips])
+        segments = np.array(self.segments)
+        member = (pickups[:, None] <= segments[None, :]) & (
+            segments[None, :] < drops[:, None]
+        )
+        # Every (trip, segment) pair with the trip on the segment
+        mt, ms = np.nonzero(member)
+        costs = np.asarray(self.segment_costs, dtype=np.float64)[segments - 1]
+        ks = np.arange(1, n_k + 1)
+        vs = np.arange(n_v)
+
+        rows, cols, vals, lbs, ubs = [], [], [], [], []
+        n_rows = 0
+
+        def add_block(block_rows, block_cols, block_vals, n_block, lb, ub):
+            nonlocal n_rows
+            rows.append(np.ravel(block_rows) + n_rows)
+            cols.append(np.ravel(block_cols))
+            vals.append(np.ravel(np.broadcast_to(block_vals, np.shape(block_rows))))
+            lbs.append(np.full(n_block, lb, dtype=np.float64))
+            ubs.append(np.full(n_block, ub, dtype=np.float64))
+            n_rows += n_block
+
+        # Load of every vehicle on every segment, as a row `v * n_s + s`
+        load_rows = vs[:, None] * n_s + ms[None, :]
+        load_cols = x[mt].T
+        load_vals = counts[mt][None, :]
+        vs_seg = (vs[:, None] * n_s + np.arange(n_s)[None, :]).ravel()
+
+        # sum_t count_t x[t, v] <= CAPACITY * y[v, s]
+        add_block(
+            np.concatenate([load_rows.ravel(), vs_seg]),
+            np.concatenate([load_cols.ravel(), y.ravel()]),
+            np.concatenate(
+                [np.broadcast_to(load_vals, load_rows.shape).ravel(),
+                 np.full(n_v * n_s, -float(self.CAPACITY))]
+            ),
+            n_v * n_s, -np.inf, 0,
+        )
+
+        # sum_t x[t, v] <= |T_s| * y[v, s], only for segments with trips
+        n_trips = member.sum(axis=0)
+        used = np.flatnonzero(n_trips)
+        compact = np.full(n_s, -1)
+        compact[used] = np.arange(len(used))
+        add_block(
+            np.concatenate(
+                [(vs[:, None] * len(used) + compact[ms][None, :]).ravel(),
+                 (vs[:, None] * len(used) + np.arange(len(used))[None, :]).ravel()]
+            ),
+            np.concatenate([load_cols.ravel(), y[:, used].ravel()]),
+            np.concatenate(
+                [np.ones(n_v * len(mt)),
+                 np.broadcast_to(-n_trips[used].astype(np.float64), (n_v, len(used))).ravel()]
+            ),
+            n_v * len(used), -np.inf, 0,
+        )
+
+        # occ[v, s] - sum_t count_t x[t, v] == 0
+        add_block(
+            np.concatenate([vs_seg, load_rows.ravel()]),
+            np.concatenate([occ.ravel(), load_cols.ravel()]),
+            np.concatenate(
+                [np.ones(n_v * n_s),
+                 -np.broadcast_to(load_vals, load_rows.shape).ravel()]
+            ),
+            n_v * n_s, 0, 0,
+        )
+
+        # sum_k gamma[v, s, k] - y[v, s] == 0
+        add_block(
+            np.concatenate([np.repeat(vs_seg, n_k), vs_seg]),
+            np.concatenate([gamma.ravel(), y.ravel()]),
+            np.concatenate([np.ones(n_v * n_s * n_k), -np.ones(n_v * n_s)]),
+            n_v * n_s, 0, 0,
+        )
+
+        # occ[v, s] - sum_k k * gamma[v, s, k] == 0
+        add_block(
+            np.concatenate([vs_seg, np.repeat(vs_seg, n_k)]),
+            np.concatenate([occ.ravel(), gamma.ravel()]),
+            np.concatenate(
+                [np.ones(n_v * n_s), -np.tile(ks.astype(np.float64), n_v * n_s)]
+            ),
+            n_v * n_s, 0, 0,
+        )
+
+        # sum_v x[t, v] == 1
+        add_block(
+            np.repeat(np.arange(n_t), n_v), x.ravel(), 1.0, n_t, 1, 1,
+        )
+
+        # F[t] - f_vt -/+ M * x[t, v] >=/<= -/+M, one row per (t, v), where
+        # f_vt = sum_{s in S_t} cost_s * sum_k gamma[v, s, k] / k
+        tv_rows = np.arange(n_t * n_v)
+        fare_rows = np.broadcast_to(
+            mt[:, None, None] * n_v + vs[None, :, None], (len(mt), n_v, n_k)
+        )
+        fare_cols = gamma[:, ms, :].transpose(1, 0, 2)
+        fare_vals = -(costs[ms][:, None, None] / ks[None, None, :])
+        fare_vals = np.broadcast_to(fare_vals, fare_rows.shape)
+        for sign, lb, ub in ((-1.0, -self.M_val, np.inf), (1.0, -np.inf, self.M_val)):
+            add_block(
+                np.concatenate([tv_rows, fare_rows.ravel(), tv_rows]),
+                np.concatenate([np.repeat(F, n_v), fare_cols.ravel(), x.ravel()]),
+                np.concatenate(
+                    [np.ones(n_t * n_v), fare_vals.ravel(),
+                     np.full(n_t * n_v, sign * self.M_val)]
+                ),
+                n_t * n_v, lb, ub,
+            )
+
+        # F[t] - Z <= 0
+        add_block(
+            np.concatenate([np.arange(n_t), np.arange(n_t)]),
+            np.concatenate([F, np.full(n_t, Z)]),
+            np.concatenate([np.ones(n_t), -np.ones(n_t)]),
+            n_t, -np.inf, 0,
+        )
+
+        A = sparse.csr_matrix(
+            (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(n_rows, n_vars),
+        )
+        objective = np.zeros(n_vars)
+        objective[Z] = 1
+
+        integrality = np.zeros(n_vars)
+        upper = np.full(n_vars, np.inf)
+        for name in ("x", "y", "gamma"):
+            integrality[idx[name].ravel()] = 1
+            upper[idx[name].ravel()] = 1
+        integrality[occ.ravel()] = 1
+
+        self.model = {
+            "c": objective,
+            "constraints": LinearConstraint(A, np.concatenate(lbs), np.concatenate(ubs)),
+            "integrality": integrality,
+            "bounds": Bounds(np.zeros(n_vars), upper),
+        }
+        self.indices = idx
+        self.build_time = time.perf_counter() - build_start
+        return self.model
+
+    def solve(self, config=None):
+        """
+        Solves the model with `scipy.optimize.milp` and stores the assignment
+        for `get_results`.
+
+        Args:
+            config (SolverConfig | None): The time limit, MIP gap, log output,
+                fallback and bound shortcut to use. The solver name and thread
+                count are ignored, as `milp` always runs HiGHS.
+
+        Returns:
+            str: The `pulp` name of the solve status, `"Integer Feasible"` if
+                the solver stopped at a limit with an incumbent, which is then
+                used, or `"Heuristic"` if it stopped without one and the
+                fallback was used. Timing and solver statistics are stored in
+                `self.report`.
+
+        Raises:
+            RuntimeError: If the solver stops without an incumbent and
+                `config.fallback` is not set.
+        """
+        config = config or SolverConfig()
+        if config.bound_shortcut and self._solve_at_bound():
+            return self.report.status
+        if not hasattr(self, "model"):
+            self.build_model()
+
+        options = {"disp": config.msg}
+        if config.time_limit is not None:
+            options["time_limit"] = config.time_limit
+        if config.mip_gap is not None:
+            options["mip_rel_gap"] = config.mip_gap
+
+        solve_start = time.perf_counter()
+        result = milp(**self.model, options=options)
+        status = _MILP_STATUS.get(result.status, "Undefined")
+        if result.status == 1 and result.x is not None:
+            # Stopped at the time or node limit with an incumbent
+            status = "Integer Feasible"
+        self.report = SolveReport(
+            status=status,
+            solver="HiGHS (scipy)",
+            build_time=self.build_time,
+            solve_time=time.perf_counter() - solve_start,
+            gap=getattr(result, "mip_gap", None),
+            nodes=getattr(result, "mip_node_count", None),
+        )
+
+        if result.x is None:
+            if not config.fallback:
+                raise RuntimeError(f"milp found no solution: {result.message}")
+            self._solve_heuristic()
+            self.report.status = "Heuristic"
+            self.report.fallback = True
+        else:
+            self._extract_solution(solution=result.x)
+
+        self.report.objective = self.Z_val
+        return self.report.status
+
+    def _extract_solution(self, solution):
+        x = solution[self.indices["x"]] > 0.5
+        y = solution[self.indices["y"]] > 0.5
+        occ = np.rint(solution[self.indices["occ"]])
+        self.assignments = {
+            v: [t for t in self.T if x[t, v]] for v in self.V if x[:, v].any()
+        }
+        self.fares = {t: float(solution[self.indices["F"][t]]) for t in self.T}
+        self.occupancy = {
+            v: {s: float(occ[v, i]) for i, s in enumerate(self.segments) if y[v, i]}
+            for v in self.assignments
+        }
+        self.Z_val = float(solution[self.indices["Z"]])
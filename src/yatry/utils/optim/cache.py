@@ -0,0 +1,202 @@
+import copy
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+from yatry.utils.optim.assign import SolverConfig, VehicleAssignmentModel
+
+
+def canonical_signature(
+    groups: list[dict], segment_costs: list[float], capacity: int = 5
+) -> tuple[str, list[int]]:
+    """
+    Computes a signature of a vehicle assignment instance that does not depend
+    on the group IDs or on the order of the groups.
+
+    Args:
+        groups (list[dict]): The groups with `id`, `pickup`, `drop` and `count`.
+        segment_costs (list[float]): The cost of every segment.
+        capacity (int): The vehicle capacity.
+
+    Returns:
+        tuple[str, list[int]]: Tuple of -
+            - The hex digest of the canonical instance.
+            - The canonical order of the groups, i.e. `order[k]` is the index
+              in `groups` of the `k`-th canonical group.
+    """
+    order = sorted(
+        range(len(groups)),
+        key=lambda i: (groups[i]["pickup"], groups[i]["drop"], groups[i]["count"]),
+    )
+    canonical = {
+        "groups": [
+            [groups[i]["pickup"], groups[i]["drop"], groups[i]["count"]] for i in order
+        ],
+        "segment_costs": [float(cost) for cost in segment_costs],
+        "capacity": capacity,
+    }
+    digest = hashlib.sha256(json.dumps(canonical).encode()).hexdigest()
+    return digest, order
+
+
+class AssignmentCache:
+    """
+    A cache of solved vehicle assignment instances.
+
+    Instances are keyed by their `canonical_signature`, so two instances with
+    the same multiset of `(pickup, drop, count)` groups, segment costs and
+    capacity share an entry; the group IDs are remapped on every hit. Entries
+    are kept in an in-memory LRU and, if `cache_dir` is given, as JSON files
+    that persist across runs. As the key does not include the solver
+    configuration, `solve` stores only proven optima.
+
+    Attributes:
+        maxsize (int): Maximum number of in-memory entries.
+        cache_dir (str | None): Directory of the on-disk store.
+        hits (int): Number of lookups answered from the cache.
+        misses (int): Number of lookups that required a solve.
+    """
+
+    maxsize: int
+    cache_dir: str | None
+    hits: int
+    misses: int
+    _entries: OrderedDict[str, dict]
+
+    def __init__(self, maxsize: int = 1024, cache_dir: str | None = None) -> None:
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}.json")  # type: ignore
+
+    def _remember(self, digest: str, entry: dict) -> None:
+        self._entries[digest] = entry
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _lookup(self, digest: str) -> dict | None:
+        if digest in self._entries:
+            self._entries.move_to_end(digest)
+            return self._entries[digest]
+        if self.cache_dir is not None and os.path.exists(self._path(digest)):
+            with open(self._path(digest)) as f:
+                entry = json.load(f)
+            for detail in entry["details"]:
+                detail["occ"] = {int(s): occ for s, occ in detail["occ"]}
+            self._remember(digest, entry)
+            return entry
+        return None
+
+    def get(
+        self, groups: list[dict], segment_costs: list[float], capacity: int = 5
+    ) -> dict | None:
+        """
+        Looks up the solution of an instance.
+
+        Returns:
+            dict | None: The results in the shape of
+                `VehicleAssignmentModel.get_results`, with the group IDs of
+                `groups`, or `None` if the instance is not cached.
+        """
+        digest, order = canonical_signature(groups, segment_costs, capacity)
+        entry = self._lookup(digest)
+        if entry is None:
+            return None
+
+        results = copy.deepcopy(entry)
+        for detail in results["details"]:
+            detail["group"] = groups[order[detail["group"]]]["id"]
+        return results
+
+    def put(
+        self,
+        groups: list[dict],
+        segment_costs: list[float],
+        results: dict,
+        capacity: int = 5,
+    ) -> None:
+        """
+        Stores the solution of an instance.
+
+        Args:
+            groups (list[dict]): The groups the instance was solved for. Their
+                IDs must be unique.
+            segment_costs (list[float]): The cost of every segment.
+            results (dict): The output of `VehicleAssignmentModel.get_results`.
+            capacity (int): The vehicle capacity.
+        """
+        digest, order = canonical_signature(groups, segment_costs, capacity)
+        position = {groups[i]["id"]: k for k, i in enumerate(order)}
+
+        entry = copy.deepcopy(results)
+        for detail in entry["details"]:
+            detail["group"] = position[detail["group"]]
+        self._remember(digest, entry)
+
+        if self.cache_dir is not None:
+            stored = copy.deepcopy(entry)
+            for detail in stored["details"]:
+                detail["occ"] = list(detail["occ"].items())
+            with open(self._path(digest), "w") as f:
+                json.dump(stored, f)
+
+    def solve(
+        self,
+        groups: list[dict],
+        segment_costs: list[float],
+        capacity: int = 5,
+        config: SolverConfig | None = None,
+    ) -> dict:
+        """
+        Returns the cached solution of an instance, building and solving a
+        `VehicleAssignmentModel` only on a miss.
+
+        Args:
+            groups (list[dict]): The groups with `id`, `pickup`, `drop` and `count`.
+            segment_costs (list[float]): The cost of every segment.
+            capacity (int): The vehicle capacity.
+            config (SolverConfig | None): The solver configuration used on a miss.
+            The solution is stored only if the solve proved it optimal, i.e.
+            it was not stopped at a MIP gap or time limit.
+
+        Returns:
+            dict: The results in the shape of `VehicleAssignmentModel.get_results`.
+        """
+        results = self.get(groups, segment_costs, capacity)
+        if results is not None:
+            self.hits += 1
+            return results
+
+        self.misses += 1
+        model = VehicleAssignmentModel(
+            groups=groups, segment_costs=segment_costs, capacity=capacity
+        )
+        config = config or SolverConfig()
+        model.solve(config=config)
+        results = model.get_results()
+        # CBC reports a solve stopped at the MIP gap as optimal, and one
+        # stopped at the time limit may be reported so as well
+        proven = model.report.status == "Optimal" and (
+            model.report.solver == "Bound"
+            or (
+                not config.mip_gap
+                and (
+                    config.time_limit is None
+                    or model.report.solve_time < config.time_limit
+                )
+            )
+        )
+        if proven:
+            self.put(groups, segment_costs, results, capacity)
+        return results
@@ -1,4 +1,56 @@
+import heapq
+from dataclasses import dataclass, field
+
+import community
+import networkx as nx
 import numpy as np
+from scipy import sparse
+from sklearn.cluster import AffinityPropagation
+
+
+@dataclass
+class AffinityPropagationState:
+    """
+    The messages of Affinity Propagation at the end of a run, keyed by
+    passenger so that the next batch can resume from them.
+
+    Attributes:
+        passenger_ids (list[str]): The passenger of every row and column.
+        responsibility (np.ndarray): The responsibility matrix R.
+        availability (np.ndarray): The availability matrix A.
+        n_iter (int): Number of iterations the last run took.
+    """
+
+    passenger_ids: list[str] = field(default_factory=list)
+    responsibility: np.ndarray = field(default_factory=lambda: np.zeros((0, 0)))
+    availability: np.ndarray = field(default_factory=lambda: np.zeros((0, 0)))
+    n_iter: int = 0
+
+    def restrict(self, passenger_ids: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Lays the messages out for another batch. The messages between
+        passengers of both batches are carried over and the rows and columns
+        of the new passengers start from zero.
+
+        Args:
+            passenger_ids (list[str]): The passengers of the new batch.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: R and A of the new batch.
+        """
+        n_passengers = len(passenger_ids)
+        R = np.zeros((n_passengers, n_passengers))
+        A = np.zeros((n_passengers, n_passengers))
+
+        old_index = {pid: i for i, pid in enumerate(self.passenger_ids)}
+        surviving = [
+            (i, old_index[pid]) for i, pid in enumerate(passenger_ids) if pid in old_index
+        ]
+        if surviving:
+            new_pos, old_pos = (np.array(idxs) for idxs in zip(*surviving))
+            R[np.ix_(new_pos, new_pos)] = self.responsibility[np.ix_(old_pos, old_pos)]
+            A[np.ix_(new_pos, new_pos)] = self.availability[np.ix_(old_pos, old_pos)]
+        return R, A
 
 
 def affinity_propagation_ride_sharing(
@@ -6,6 +58,9 @@ def affinity_propagation_ride_sharing(
     max_iterations: int = 200,
     damping_factor: float = 0.9,
     convergence_threshold: float = 1e-6,
+    passenger_ids: list[str] | None = None,
+    state: AffinityPropagationState | None = None,
+    convergence_iter: int | None = None,
 ) -> tuple[dict[int, list[int]], list[int]]:
     """
     Implements Affinity Propagation algorithm for ride-sharing passenger grouping.
@@ -14,6 +69,11 @@ def affinity_propagation_ride_sharing(
     much passenger i would like to be grouped with passenger j, and
     returns clusters of passengers with designated cluster representatives.
 
+    When consecutive batches overlap, pass the same `state` for every batch.
+    The passengers that stay keep their responsibilities and availabilities
+    towards each other, so the messages start close to their fixed point and
+    far fewer iterations are needed than from zero.
+
     Args:
         affinity_matrix: An `n x n` numpy array where entry (i,j) is the
             affinity score for passenger i towards passenger j.
@@ -22,6 +82,15 @@ def affinity_propagation_ride_sharing(
             avoid numerical oscillations.
         convergence_threshold: Minimum change in responsibility and
             availability matrices to declare convergence.
+        passenger_ids: The passenger of every row of `affinity_matrix`. It is
+            required with `state`.
+        state: If given, the run resumes from the messages it holds for the
+            passengers in `passenger_ids`, and it is updated in place with the
+            messages of this run.
+        convergence_iter: If given, convergence is also declared once the
+            exemplars have not changed for this many iterations, as in
+            scikit-learn. The messages keep shrinking long after the clusters
+            are settled, and a warm start mostly saves these iterations.
 
     Returns:
         A tuple containing:
@@ -30,115 +99,494 @@ def affinity_propagation_ride_sharing(
     """
     # Get the number of passengers
     n_passengers = affinity_matrix.shape[0]
+    if state is not None and passenger_ids is None:
+        raise ValueError("Resuming from a state needs the passenger IDs")
 
-    # Initialize the responsibility and availability matrices with zeros
     # Responsibility R(i,k): How suitable would passenger k be as a representative for passenger i
-    R = np.zeros((n_passengers, n_passengers))
-
     # Availability A(i,k): How appropriate is it for passenger i to select passenger k as their representative
-    A = np.zeros((n_passengers, n_passengers))
+    if state is None:
+        R = np.zeros((n_passengers, n_passengers))
+        A = np.zeros((n_passengers, n_passengers))
+    else:
+        R, A = state.restrict(passenger_ids=passenger_ids)
 
     # Use the affinity matrix as our similarity matrix
-    S = affinity_matrix.copy()
-
-    # Main loop - iteratively update responsibilities and availabilities
-    for iteration in range(max_iterations):
-        # Store old values to check for convergence
-        old_R = R.copy()
-        old_A = A.copy()
-
-        # Step 1: Update responsibilities
-        # R(i,k) = S(i,k) - max_{k' != k} {A(i,k') + S(i,k')}
-        # This means: "How suitable is k as a representative for i compared to all other potential representatives?"
-        for i in range(n_passengers):
-            for k in range(n_passengers):
-                # Find the maximum value excluding k
-                AS = A[i, :] + S[i, :]  # Add availability and similarity for all k'
-                AS[k] = -np.inf  # Exclude k itself
-                max_val = np.max(AS)
-
-                # Calculate new responsibility value
-                r_new = S[i, k] - max_val
-
-                # Apply damping to avoid oscillations
-                # new_value = (1-damping) * new_calculation + damping * old_value
-                R[i, k] = (1 - damping_factor) * r_new + damping_factor * R[i, k]
-
-        # Step 2: Update availabilities
-        # For i != k: A(i,k) = min(0, R(k,k) + sum_{i' != i,k} max(0, R(i',k)))
-        # For i == k: A(k,k) = sum_{i' != k} max(0, R(i',k))
-        # This means: "Given how other passengers view k as a representative,
-        # how appropriate is it for i to choose k as their group representative?"
-        for i in range(n_passengers):
-            for k in range(n_passengers):
-                if i != k:
-                    # Calculate sum of positive responsibilities to k from others (except i)
-                    positive_r = np.maximum(
-                        0, R[:, k]
-                    )  # Get all positive responsibilities to k
-                    positive_r[i] = 0  # Exclude i
-                    positive_r[k] = 0  # Exclude k itself
-                    sum_pos_r = np.sum(positive_r)
-
-                    # Calculate new availability (capped at 0 for i!=k)
-                    a_new = min(0, R[k, k] + sum_pos_r)
-                else:
-                    # Self-availability calculation
-                    positive_r = np.maximum(
-                        0, R[:, k]
-                    )  # Get all positive responsibilities to k
-                    positive_r[k] = 0  # Exclude k itself
-                    sum_pos_r = np.sum(positive_r)
-
-                    # Self-availability is not capped at 0
-                    a_new = sum_pos_r
-
-                # Apply damping
-                A[i, k] = (1 - damping_factor) * a_new + damping_factor * A[i, k]
+    S = np.asarray(affinity_matrix, dtype=np.float64)
+    rows = np.arange(n_passengers)
+    exemplars = None
+    n_stable = 0
+    n_iter = 0
+    for n_iter in range(1, max_iterations + 1):
+        old_R = R
+        old_A = A
+
+        # R(i,k) = S(i,k) - max_{k' != k} {A(i,k') + S(i,k')}: the max
+        # excluding k is the row max, or the runner-up in the column of the max
+        AS = A + S
+        best = np.argmax(AS, axis=1)
+        first = AS[rows, best]
+        AS[rows, best] = -np.inf
+        second = np.max(AS, axis=1)
+        max_excluding = np.repeat(first[:, None], n_passengers, axis=1)
+        max_excluding[rows, best] = second
+        R = (1 - damping_factor) * (S - max_excluding) + damping_factor * R
+
+        # A(i,k) = min(0, R(k,k) + sum_{i' != i,k} max(0, R(i',k))) and
+        # A(k,k) = sum_{i' != k} max(0, R(i',k))
+        positive_R = np.maximum(0, R)
+        positive_R[rows, rows] = 0
+        column_sums = positive_R.sum(axis=0)
+        A_new = np.minimum(0, np.diag(R) + column_sums - positive_R)
+        A_new[rows, rows] = column_sums
+        A = (1 - damping_factor) * A_new + damping_factor * A
 
         # Check for convergence - if changes are small enough, we can stop
-        if (
-            np.sum(np.abs(R - old_R)) + np.sum(np.abs(A - old_A))
-        ) < convergence_threshold:
-            print(f"Converged after {iteration + 1} iterations")
+        if (np.sum(np.abs(R - old_R)) + np.sum(np.abs(A - old_A))) < convergence_threshold:
             break
+        if convergence_iter is not None:
+            new_exemplars = np.diag(A) + np.diag(R) > 0
+            if exemplars is not None and np.array_equal(new_exemplars, exemplars):
+                n_stable += 1
+            else:
+                n_stable = 0
+            exemplars = new_exemplars
+            if n_stable >= convergence_iter and exemplars.any():
+                break
 
-    # Step 3: Identify exemplars (cluster representatives)
-    # A passenger becomes a representative if (A(i,i) + R(i,i)) > 0
-    # This means the passenger "agrees" to be a representative based on gathered evidence
+    if state is not None:
+        state.passenger_ids = list(passenger_ids)
+        state.responsibility = R
+        state.availability = A
+        state.n_iter = n_iter
+
+    # A passenger becomes a representative if (A(i,i) + R(i,i)) > 0, or the
+    # one with the highest self-decision value if there is none
     decision_matrix = A + R
-    # Convert NumPy array to explicit Python list of integers
     representative_indices = [
         int(idx) for idx in np.where(np.diag(decision_matrix) > 0)[0]
     ]
-
-    # If no representatives found (can happen in edge cases), choose the passenger with max self-decision value
     if not representative_indices:
-        print(
-            "No cluster representatives identified naturally, selecting based on highest decision value"
-        )
         representative_indices = [int(np.argmax(np.diag(decision_matrix)))]
 
-    # Step 4: Assign passengers to their representatives (forming groups)
+    # Every passenger joins the representative maximizing A + R, and every
+    # representative its own group
+    best_rep = np.array(representative_indices)[
+        np.argmax(decision_matrix[:, representative_indices], axis=1)
+    ]
+    best_rep[representative_indices] = representative_indices
     passenger_groups: dict[int, list[int]] = {rep: [] for rep in representative_indices}
+    for passenger, rep in enumerate(best_rep.tolist()):
+        passenger_groups[rep].append(passenger)
+
+    return passenger_groups, representative_indices
+
+
+def affinity_propagation_labels(
+    affinity_matrix: np.ndarray,
+    damping: float = 0.7,
+    preference_percentile: float = 50,
+    max_iter: int = 500,
+    passenger_ids: list[str] | None = None,
+    state: AffinityPropagationState | None = None,
+) -> np.ndarray:
+    """
+    Clusters passengers with scikit-learn's `AffinityPropagation` the way the
+    pipelines do: the preference is taken as a percentile of the raw affinities
+    and the model is fit on the min-max scaled affinity matrix.
+
+    With a `state`, the same similarities are clustered with
+    `affinity_propagation_ride_sharing` instead, resuming from the messages of
+    the previous batch.
 
-    for passenger in range(n_passengers):
-        # A passenger joins the group of the representative that maximizes A(passenger,rep) + R(passenger,rep)
-        if passenger in representative_indices:
-            # Representatives are already assigned to their own group
-            passenger_groups[passenger].append(passenger)
+    Args:
+        affinity_matrix (np.ndarray): An `n x n` array where entry (i, j) is the
+            affinity of passenger i towards passenger j.
+        damping (float): Damping factor of the message updates.
+        preference_percentile (float): Percentile of the affinities used as the
+            preference of every passenger to be an exemplar.
+        max_iter (int): Maximum number of AP iterations.
+        passenger_ids (list[str] | None): The passenger of every row. It is
+            required with `state`.
+        state (AffinityPropagationState | None): The messages of the previous
+            batch, updated in place, see `affinity_propagation_ride_sharing`.
+
+    Returns:
+        np.ndarray: The cluster label of every passenger.
+    """
+    preference_val = np.percentile(affinity_matrix, preference_percentile)
+    min_val = np.min(affinity_matrix)
+    max_val = np.max(affinity_matrix)
+    scaled_affinity = (affinity_matrix - min_val) / (max_val - min_val + 1e-10)
+
+    if state is not None:
+        similarity = scaled_affinity.copy()
+        np.fill_diagonal(similarity, preference_val)
+        groups, _ = affinity_propagation_ride_sharing(
+            affinity_matrix=similarity,
+            max_iterations=max_iter,
+            damping_factor=damping,
+            passenger_ids=passenger_ids,
+            state=state,
+            convergence_iter=15,
+        )
+        labels = np.empty(len(affinity_matrix), dtype=np.int64)
+        for label, members in enumerate(groups.values()):
+            labels[members] = label
+        return labels
+
+    ap = AffinityPropagation(
+        affinity="precomputed",
+        damping=damping,
+        max_iter=max_iter,
+        preference=preference_val,
+    )
+    return ap.fit_predict(X=scaled_affinity)
+
+
+def _split_cluster(
+    members: list[int],
+    sym_affinity: np.ndarray,
+    capacity: int,
+    rows: np.ndarray | None = None,
+) -> list[list[int]]:
+    """
+    Splits an oversized cluster into chunks of at most `capacity` members.
+
+    Each chunk is seeded with the remaining member that has the largest total
+    affinity to the rest (the local exemplar), and then grown greedily with the
+    member that has the largest mean affinity towards the chunk. `rows` maps
+    members to rows of `sym_affinity` when several members share a row.
+    """
+    remaining = list(members)
+    chunks: list[list[int]] = []
+    while len(remaining) > capacity:
+        remaining_rows = remaining if rows is None else rows[remaining]
+        if sparse.issparse(sym_affinity):
+            sub = sym_affinity[remaining_rows][:, remaining_rows].toarray()
         else:
-            # Find the best representative for this passenger
-            best_rep_idx = -1
-            best_score = -np.inf
+            sub = sym_affinity[np.ix_(remaining_rows, remaining_rows)]
+        seed = int(np.argmax(sub.sum(axis=1)))
+        chunk = [seed]
+        # Sum of affinities of every remaining member towards the chunk
+        to_chunk = sub[seed].copy()
+        to_chunk[seed] = -np.inf
+        while len(chunk) < capacity:
+            best = int(np.argmax(to_chunk))
+            chunk.append(best)
+            to_chunk += sub[best]
+            to_chunk[chunk] = -np.inf
+        chunks.append([remaining[i] for i in chunk])
+        remaining = [m for i, m in enumerate(remaining) if i not in chunk]
+    chunks.append(remaining)
+    return chunks
 
-            for rep in representative_indices:
-                score = decision_matrix[passenger, rep]
-                if score > best_score:
-                    best_score = score
-                    best_rep_idx = rep
 
-            # Assign passenger to the best representative's group
-            passenger_groups[best_rep_idx].append(passenger)
+def _merge_clusters_sparse(
+    clusters: list[list[int]],
+    sym_affinity: sparse.csr_matrix,
+    capacity: int,
+    merge_threshold: float,
+) -> list[list[int]]:
+    """
+    Merges undersized clusters like `_merge_clusters`, for a sparse affinity
+    graph. Only clusters joined by an edge are merged, and the total affinity
+    between clusters is kept per pair of neighbours instead of in a dense
+    matrix, with the candidate merges in a heap by mean affinity.
+    """
+    clusters = [list(c) for c in clusters]
+    small = [i for i, c in enumerate(clusters) if len(c) < capacity]
+    if len(small) < 2:
+        return clusters
 
-    return passenger_groups, representative_indices
+    label = np.full(sym_affinity.shape[0], -1, dtype=np.int64)
+    for col, i in enumerate(small):
+        label[clusters[i]] = col
+    graph = sym_affinity.tocoo()
+    inside = (label[graph.row] >= 0) & (label[graph.col] >= 0)
+    a, b = label[graph.row[inside]], label[graph.col[inside]]
+    totals = sparse.coo_matrix(
+        (graph.data[inside], (a, b)), shape=(len(small), len(small))
+    ).tocsr()
+    neighbours = [
+        dict(zip(totals.indices[start:end], totals.data[start:end]))
+        for start, end in zip(totals.indptr[:-1], totals.indptr[1:])
+    ]
+    for col, totals_of in enumerate(neighbours):
+        totals_of.pop(col, None)
+    sizes = [len(clusters[i]) for i in small]
+
+    def push(heap, a, b):
+        if sizes[a] + sizes[b] <= capacity:
+            mean_aff = neighbours[a][b] / (sizes[a] * sizes[b])
+            heapq.heappush(heap, (-mean_aff, a, b, sizes[a], sizes[b]))
+
+    heap: list[tuple[float, int, int, int, int]] = []
+    for a, totals_of in enumerate(neighbours):
+        for b in totals_of:
+            if a < b:
+                push(heap, a, b)
+
+    while heap:
+        neg_mean, a, b, size_a, size_b = heapq.heappop(heap)
+        if (size_a, size_b) != (sizes[a], sizes[b]) or b not in neighbours[a]:
+            continue  # Stale, one of the clusters changed since
+        if -neg_mean < merge_threshold:
+            break
+
+        # Merge cluster `b` into cluster `a`
+        clusters[small[a]].extend(clusters[small[b]])
+        clusters[small[b]] = []
+        sizes[a] += sizes[b]
+        sizes[b] = capacity + 1  # never fits again
+        for c, total in neighbours[b].items():
+            del neighbours[c][b]
+            if c != a:
+                neighbours[a][c] = neighbours[c][a] = neighbours[a].get(c, 0) + total
+        neighbours[b] = {}
+        for c in neighbours[a]:
+            push(heap, min(a, c), max(a, c))
+
+    return [c for c in clusters if c]
+
+
+def _merge_clusters(
+    clusters: list[list[int]],
+    sym_affinity: np.ndarray,
+    capacity: int,
+    merge_threshold: float,
+    rows: np.ndarray | None = None,
+) -> list[list[int]]:
+    """
+    Greedily merges undersized clusters whose mean pairwise affinity is at least
+    `merge_threshold`, as long as the merged cluster fits in one vehicle.
+    `rows` maps members to rows of `sym_affinity` when several members share a
+    row.
+    """
+    clusters = [list(c) for c in clusters]
+    small = [i for i, c in enumerate(clusters) if len(c) < capacity]
+    if len(small) < 2:
+        return clusters
+
+    # Mean affinity between every pair of undersized clusters
+    indicator = np.zeros((sym_affinity.shape[0], len(small)))
+    for col, i in enumerate(small):
+        members = clusters[i] if rows is None else rows[clusters[i]]
+        np.add.at(indicator, (members, col), 1)
+    sizes = indicator.sum(axis=0)
+    totals = indicator.T @ sym_affinity @ indicator
+    np.fill_diagonal(totals, -np.inf)
+
+    while True:
+        mean_aff = totals / np.outer(sizes, sizes)
+        fits = (sizes[:, None] + sizes[None, :]) <= capacity
+        mean_aff[~fits] = -np.inf
+        a, b = np.unravel_index(np.argmax(mean_aff), mean_aff.shape)
+        if mean_aff[a, b] < merge_threshold:
+            break
+
+        # Merge cluster `b` into cluster `a`
+        clusters[small[a]].extend(clusters[small[b]])
+        clusters[small[b]] = []
+        totals[a, :] += totals[b, :]
+        totals[:, a] += totals[:, b]
+        totals[a, a] = -np.inf
+        totals[b, :] = totals[:, b] = -np.inf
+        sizes[a] += sizes[b]
+        sizes[b] = capacity + 1  # never fits again
+
+    return [c for c in clusters if c]
+
+
+def capacity_aware_clustering(
+    affinity_matrix: np.ndarray | sparse.spmatrix,
+    capacity: int = 5,
+    damping: float = 0.7,
+    preference_percentile: float = 50,
+    max_iter: int = 500,
+    merge_threshold: float | None = None,
+    labels: np.ndarray | None = None,
+    rows: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Clusters passengers into groups that fit in a single vehicle.
+
+    Affinity Propagation is run first; every cluster bigger than `capacity` is
+    then split around its local exemplars, and undersized clusters are merged
+    by mean affinity as long as the merged group still fits in one vehicle.
+    A sparse affinity graph, e.g. from `build_knn_affinity_graph`, is never
+    densified; `labels` must then be given, and only clusters joined by an
+    edge are merged.
+
+    Args:
+        affinity_matrix (np.ndarray | sparse.spmatrix): An `n x n` array or
+            graph where entry (i, j) is the affinity of passenger i towards
+            passenger j.
+        capacity (int): Maximum number of passengers in a group.
+        damping (float): Damping factor of Affinity Propagation.
+        preference_percentile (float): Percentile of the affinities used as the
+            AP preference.
+        max_iter (int): Maximum number of AP iterations.
+        merge_threshold (float | None): Minimum mean affinity for two groups to
+            be merged. Defaults to the `preference_percentile` of the nonzero
+            affinities, or no merging if there are none.
+        labels (np.ndarray | None): Precomputed cluster labels to start from
+            instead of running Affinity Propagation.
+        rows (np.ndarray | None): The row of `affinity_matrix` of every
+            passenger, when passengers share rows as in compressed demand.
+            `labels` must then be given, with one label per passenger.
+
+    Returns:
+        np.ndarray: Cluster labels `0..G-1`, where every cluster has at most
+            `capacity` members.
+    """
+    is_sparse = sparse.issparse(affinity_matrix)
+    if labels is None:
+        if is_sparse:
+            raise ValueError("Sparse affinity graphs need precomputed labels")
+        labels = affinity_propagation_labels(
+            affinity_matrix=affinity_matrix,
+            damping=damping,
+            preference_percentile=preference_percentile,
+            max_iter=max_iter,
+        )
+    if merge_threshold is None:
+        # Most pairs of routes share no road, so a percentile over all pairs
+        # is often zero and would merge unrelated groups
+        affinities = (
+            affinity_matrix.data if is_sparse else np.asarray(affinity_matrix)
+        )
+        nonzero = affinities[affinities > 0]
+        merge_threshold = (
+            float(np.percentile(nonzero, preference_percentile))
+            if nonzero.size
+            else np.inf
+        )
+
+    sym_affinity = (affinity_matrix + affinity_matrix.T) / 2
+    if is_sparse:
+        sym_affinity = sparse.csr_matrix(sym_affinity)
+
+    clusters: list[list[int]] = []
+    for label in np.unique(labels):
+        members = [int(i) for i in np.flatnonzero(labels == label)]
+        if len(members) > capacity:
+            clusters.extend(_split_cluster(members, sym_affinity, capacity, rows))
+        else:
+            clusters.append(members)
+
+    if is_sparse:
+        clusters = _merge_clusters_sparse(
+            clusters=clusters,
+            sym_affinity=sym_affinity,
+            capacity=capacity,
+            merge_threshold=merge_threshold,
+        )
+    else:
+        clusters = _merge_clusters(
+            clusters=clusters,
+            sym_affinity=sym_affinity,
+            capacity=capacity,
+            merge_threshold=merge_threshold,
+            rows=rows,
+        )
+
+    capped_labels = np.empty(len(labels), dtype=np.int64)
+    for label, members in enumerate(sorted(clusters, key=min)):
+        capped_labels[members] = label
+    return capped_labels
+
+
+def louvain_clustering(
+    affinity: np.ndarray | sparse.spmatrix,
+    threshold: float | None = None,
+    resolution: float = 1.0,
+    random_state: int | None = None,
+) -> np.ndarray:
+    """
+    Clusters passengers by Louvain modularity optimization on the affinity
+    graph.
+
+    The graph is undirected, with the mean of the affinities in both directions
+    as edge weights. Sparse inputs, e.g. from `build_knn_affinity_graph`, are
+    used as they are, so the cost scales with the number of edges instead of
+    `n^2`.
+
+    Args:
+        affinity (np.ndarray | sparse.spmatrix): The `n x n` affinity matrix or
+            graph.
+        threshold (float | None): Edges lighter than this are dropped.
+        resolution (float): Louvain resolution; larger values give smaller
+            communities.
+        random_state (int | None): Seed of the node order of the Louvain passes.
+
+    Returns:
+        np.ndarray: The community label of every passenger.
+    """
+    weights = sparse.csr_matrix(affinity, dtype=np.float64)
+    weights = ((weights + weights.T) / 2).tocsr()
+    weights.setdiag(0)
+    if threshold is not None:
+        weights.data[weights.data < threshold] = 0
+    weights.eliminate_zeros()
+
+    graph = nx.from_scipy_sparse_array(weights, edge_attribute="weight")
+    partition = community.best_partition(
+        graph, weight="weight", resolution=resolution, random_state=random_state
+    )
+    return np.array([partition[i] for i in range(weights.shape[0])], dtype=np.int64)
+
+
+CLUSTERING_BACKENDS = ("ap", "louvain")
+
+
+def cluster_labels(
+    affinity_matrix: np.ndarray | sparse.spmatrix,
+    backend: str = "ap",
+    capacity: int | None = None,
+    random_state: int | None = None,
+    passenger_ids: list[str] | None = None,
+    ap_state: AffinityPropagationState | None = None,
+) -> np.ndarray:
+    """
+    Clusters passengers with the selected backend.
+
+    Args:
+        affinity_matrix (np.ndarray | sparse.spmatrix): The `n x n` combined
+            affinity matrix, or a sparse affinity graph such as the one of
+            `build_knn_affinity_graph`, which only the Louvain backend takes.
+        backend (str): `"ap"` for Affinity Propagation or `"louvain"` for
+            Louvain community detection.
+        capacity (int | None): If given, clusters are split and merged with
+            `capacity_aware_clustering` to fit in one vehicle.
+        random_state (int | None): Seed of the Louvain backend.
+        passenger_ids (list[str] | None): The passenger of every row, needed
+            with `ap_state`.
+        ap_state (AffinityPropagationState | None): If given, the AP backend
+            resumes from the messages of the previous batch and updates them
+            in place, see `affinity_propagation_labels`.
+
+    Returns:
+        np.ndarray: The cluster label of every passenger.
+    """
+    if backend == "ap":
+        if sparse.issparse(affinity_matrix):
+            raise ValueError("Affinity Propagation needs a dense affinity matrix")
+        labels = affinity_propagation_labels(
+            affinity_matrix=affinity_matrix,
+            passenger_ids=passenger_ids,
+            state=ap_state,
+        )
+    elif backend == "louvain":
+        labels = louvain_clustering(
+            affinity=affinity_matrix, random_state=random_state
+        )
+    else:
+        raise ValueError(
+            f"Unknown clustering backend {backend!r}, expected one of {CLUSTERING_BACKENDS}"
+        )
+
+    if capacity is not None:
+        labels = capacity_aware_clustering(
+            affinity_matrix=affinity_matrix, capacity=capacity, labels=labels
+        )
+    return labels
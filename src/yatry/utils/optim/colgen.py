@@ -0,0 +1,440 @@
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from numpy import typing as npt
+from scipy import sparse
+from scipy.optimize import Bounds, LinearConstraint, linprog, milp
+
+from yatry.utils.optim.assign import SolveReport, VehicleAssignmentModel
+
+
+@dataclass
+class ColumnGenerationConfig:
+    """
+    Configuration of `ColumnGenerationAssignmentModel.solve`.
+
+    Attributes:
+        mip_gap (float): Relative gap between the best assignment and the
+            lower bound at which to stop.
+        max_iterations (int): Maximum number of pricing rounds.
+        time_limit (float | None): Seconds after which no new pricing round
+            is started.
+        columns_per_iteration (int): Maximum number of columns added per
+            pricing round.
+        master_time_limit (float | None): Time limit of every integer solve of
+            the restricted master.
+        exact_pricing_trips (int): Largest number of trips for which every
+            column is enumerated once the greedy pricing finds none, to prove
+            the bound of the relaxation.
+    """
+
+    mip_gap: float = 0.01
+    max_iterations: int = 50
+    time_limit: float | None = None
+    columns_per_iteration: int = 20
+    master_time_limit: float | None = 10.0
+    exact_pricing_trips: int = 12
+
+
+class ColumnGenerationAssignmentModel(VehicleAssignmentModel):
+    """
+    Solves the vehicle assignment of `VehicleAssignmentModel` by column
+    generation, for instances too large for the compact MILP.
+
+    A column is a vehicle load, i.e. a set of trips that fits in one vehicle on
+    every segment. Every trip in a column pays its share of the segments it
+    travels, split by the occupancy of the column. The restricted master
+    chooses columns `lambda_c` so that
+
+        min Z
+        s.t. sum_{c ∋ t} lambda_c = 1                (pi_t)
+             Z >= sum_{c ∋ t} f_{t, c} lambda_c      (mu_t >= 0)
+
+    for every trip `t`. With the duals of its relaxation, the reduced cost of a
+    column is `sum_{t in c} (mu_t * f_{t, c} - pi_t)`. The pricing step grows
+    columns greedily from every trip by the trip that decreases the reduced
+    cost the most while the column stays within capacity, and adds the columns
+    with a negative reduced cost. The trips a new column leaves out are packed
+    into vehicles greedily, by best fit and by the lowest highest fare, and
+    added as columns as well, so that the integer master can always combine
+    the new column into an assignment. The columns used by the relaxation,
+    and columns grown around the trips paying the highest fares in the best
+    assignment, are completed the same way.
+
+    After every round the master is also solved with integer `lambda_c` for
+    the best assignment so far. The gap is measured against the segment bound:
+    no trip pays less than its segments shared by a full vehicle, or by all
+    trips on the segment if they fit. Once the greedy pricing finds no
+    improving column, the relaxation of the restricted master is used as an
+    estimate of the bound. On instances of up to `exact_pricing_trips` trips,
+    every column is then enumerated, and if none has a negative reduced cost
+    the relaxation is a proven bound. The solve stops once the assignment is
+    within `mip_gap` of the estimate, when pricing finds no improving column,
+    or at the iteration or time limit.
+    """
+
+    def _prepare_arrays(self):
+        self._counts = np.array([trip["count"] for trip in self.trips], dtype=np.float64)
+        pickups = np.array([trip["pickup"] for trip in self.trips])
+        drops = np.array([trip["drop"] for trip in self.trips])
+        segments = np.array(self.segments)
+        self._member = (
+            (pickups[:, None] <= segments[None, :]) & (segments[None, :] < drops[:, None])
+        ).astype(np.float64)
+        self._costs = np.asarray(self.segment_costs, dtype=np.float64)[segments - 1]
+
+    def _load(self, column: tuple[int, ...]) -> npt.NDArray[np.float64]:
+        return self._counts[list(column)] @ self._member[list(column)]
+
+    def _column_fares(self, column: tuple[int, ...]) -> npt.NDArray[np.float64]:
+        """
+        The fare of every trip of a column, in the order of the column.
+        """
+        load = self._load(column)
+        share = np.divide(self._costs, load, out=np.zeros_like(load), where=load > 0)
+        return self._member[list(column)] @ share
+
+    def _segment_bound(self) -> float:
+        load = np.minimum(self._counts @ self._member, self.CAPACITY)
+        share = np.divide(self._costs, load, out=np.zeros_like(load), where=load > 0)
+        return float((self._member @ share).max())
+
+    def _initial_columns(self) -> list[tuple[int, ...]]:
+        # Every trip alone, plus the vehicles of the greedy heuristic
+        self._solve_heuristic()
+        columns = {(t,) for t in self.T}
+        columns.update(tuple(sorted(trips)) for trips in self.assignments.values())
+        return sorted(columns)
+
+    def _pack(self, trips: list[int]) -> list[tuple[int, ...]]:
+        """
+        Packs trips into vehicles with the best-fit rule of `_solve_heuristic`:
+        longest trips first, each into the vehicle with room on all its
+        segments that shares the most occupied segments with it.
+        """
+        loads: list[npt.NDArray[np.float64]] = []
+        vehicles: list[list[int]] = []
+        lengths = self._member.sum(axis=1)
+        for t in sorted(trips, key=lambda t: -lengths[t]):
+            demand = self._counts[t] * self._member[t]
+            best, best_shared = None, -1
+            for v, load in enumerate(loads):
+                if (load + demand <= self.CAPACITY).all():
+                    shared = int(((load > 0) & (self._member[t] > 0)).sum())
+                    if shared > best_shared:
+                        best, best_shared = v, shared
+            if best is None:
+                loads.append(demand.copy())
+                vehicles.append([t])
+            else:
+                loads[best] += demand
+                vehicles[best].append(t)
+        return [tuple(sorted(vehicle)) for vehicle in vehicles]
+
+    def _pack_min_max(
+        self, trips: list[int], fixed_max: float = 0.0
+    ) -> list[tuple[int, ...]]:
+        """
+        Packs trips into vehicles, longest first, each into the vehicle (or a
+        new one) that keeps the highest fare of all vehicles the lowest.
+
+        Args:
+            trips (list[int]): The trips to pack.
+            fixed_max (float): The highest fare of the vehicles outside the
+                packing.
+        """
+        vehicles: list[list[int]] = []
+        highest: list[float] = []
+        lengths = self._member.sum(axis=1)
+        for t in sorted(trips, key=lambda t: -lengths[t]):
+            options = [([t], float(self._column_fares((t,))[0]), len(vehicles))]
+            for v, vehicle in enumerate(vehicles):
+                column = tuple(vehicle + [t])
+                if (self._load(column) <= self.CAPACITY).all():
+                    options.append((list(column), float(self._column_fares(column).max()), v))
+
+            def overall(option):
+                column, column_max, v = option
+                others = [h for u, h in enumerate(highest) if u != v]
+                return max([fixed_max, column_max, *others]), column_max
+
+            column, column_max, v = min(options, key=overall)
+            if v == len(vehicles):
+                vehicles.append(column)
+                highest.append(column_max)
+            else:
+                vehicles[v], highest[v] = column, column_max
+        return [tuple(sorted(vehicle)) for vehicle in vehicles]
+
+    def _bottleneck_columns(self, chosen, n_trips: int = 3) -> list[tuple[int, ...]]:
+        """
+        Grows columns around the `n_trips` trips paying the highest fares in an
+        assignment, each time adding the trip that lowers the highest fare of
+        the column the most, and returns every intermediate column.
+        """
+        fares = {
+            t: fare
+            for column in chosen
+            for t, fare in zip(column, self._column_fares(column))
+        }
+        grown = []
+        for seed in sorted(fares, key=fares.get, reverse=True)[:n_trips]:
+            column = [seed]
+            while True:
+                options = [
+                    tuple(column + [u])
+                    for u in self.T
+                    if u not in column
+                    and (self._load(tuple(column + [u])) <= self.CAPACITY).all()
+                ]
+                if not options:
+                    break
+                column = list(
+                    min(options, key=lambda option: self._column_fares(option).max())
+                )
+                grown.append(tuple(sorted(column)))
+        return list(dict.fromkeys(grown))
+
+    def _complete(self, columns, known):
+        """
+        Completes every column to a full assignment by packing the trips it
+        leaves out, so that the integer master can combine new columns.
+        """
+        completions = []
+        for column in columns:
+            rest = [t for t in self.T if t not in column]
+            fixed_max = float(self._column_fares(column).max())
+            for completion in self._pack(rest) + self._pack_min_max(rest, fixed_max):
+                if completion not in known:
+                    known.add(completion)
+                    completions.append(completion)
+        return completions
+
+    def _master_arrays(self, columns: list[tuple[int, ...]]):
+        """
+        The constraint matrices of the restricted master over `[lambda, Z]`.
+        """
+        n_t, n_c = len(self.T), len(columns)
+        rows, cols, fares = [], [], []
+        for c, column in enumerate(columns):
+            rows.extend(column)
+            cols.extend([c] * len(column))
+            fares.extend(self._column_fares(column))
+        membership = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(n_t, n_c)
+        )
+        fare_matrix = sparse.csr_matrix((fares, (rows, cols)), shape=(n_t, n_c))
+        A_eq = sparse.hstack([membership, sparse.csr_matrix((n_t, 1))]).tocsr()
+        A_ub = sparse.hstack([fare_matrix, -np.ones((n_t, 1))]).tocsr()
+        objective = np.zeros(n_c + 1)
+        objective[-1] = 1
+        return objective, A_eq, A_ub
+
+    def _solve_relaxation(self, columns):
+        objective, A_eq, A_ub = self._master_arrays(columns)
+        result = linprog(
+            objective,
+            A_ub=A_ub,
+            b_ub=np.zeros(len(self.T)),
+            A_eq=A_eq,
+            b_eq=np.ones(len(self.T)),
+            bounds=(0, None),
+            method="highs",
+        )
+        if result.status != 0:
+            raise RuntimeError(f"Restricted master relaxation failed: {result.message}")
+        pi = result.eqlin.marginals
+        mu = np.maximum(-result.ineqlin.marginals, 0)
+        support = [columns[c] for c in np.flatnonzero(result.x[:-1] > 1e-6)]
+        return float(result.fun), pi, mu, support
+
+    def _solve_integer(self, columns, time_limit):
+        objective, A_eq, A_ub = self._master_arrays(columns)
+        n_c = len(columns)
+        integrality = np.ones(n_c + 1)
+        integrality[-1] = 0
+        upper = np.ones(n_c + 1)
+        upper[-1] = np.inf
+        options = {} if time_limit is None else {"time_limit": time_limit}
+        result = milp(
+            objective,
+            constraints=[
+                LinearConstraint(A_eq, 1, 1),
+                LinearConstraint(A_ub, -np.inf, 0),
+            ],
+            integrality=integrality,
+            bounds=Bounds(np.zeros(n_c + 1), upper),
+            options=options,
+        )
+        if result.x is None:
+            return None, None
+        chosen = [columns[c] for c in np.flatnonzero(result.x[:n_c] > 0.5)]
+        return float(result.x[-1]), chosen
+
+    def _price(self, pi, mu, known, limit):
+        """
+        Grows a column from every trip, in order of decreasing dual value, and
+        returns up to `limit` new columns with a negative reduced cost.
+        """
+        new_columns = []
+        for seed in np.argsort(-pi, kind="stable"):
+            column = [int(seed)]
+            load = self._counts[seed] * self._member[seed]
+            reduced_cost = mu[seed] * self._column_fares((seed,))[0] - pi[seed]
+            while True:
+                candidates = np.setdiff1d(self.T, column)
+                if not len(candidates):
+                    break
+                new_load = load[None, :] + (
+                    self._counts[candidates, None] * self._member[candidates]
+                )
+                fits = (new_load <= self.CAPACITY).all(axis=1)
+                candidates, new_load = candidates[fits], new_load[fits]
+                if not len(candidates):
+                    break
+
+                share = np.divide(
+                    self._costs[None, :],
+                    new_load,
+                    out=np.zeros_like(new_load),
+                    where=new_load > 0,
+                )
+                member_fares = share @ self._member[column].T
+                candidate_fares = (share * self._member[candidates]).sum(axis=1)
+                costs = (
+                    member_fares @ mu[column]
+                    + mu[candidates] * candidate_fares
+                    - pi[column].sum()
+                    - pi[candidates]
+                )
+                best = int(np.argmin(costs))
+                if costs[best] >= reduced_cost - 1e-9:
+                    break
+                column.append(int(candidates[best]))
+                load = new_load[best]
+                reduced_cost = costs[best]
+
+            column = tuple(sorted(column))
+            if reduced_cost < -1e-9 and column not in known:
+                known.add(column)
+                new_columns.append(column)
+                if len(new_columns) >= limit:
+                    break
+        return new_columns
+
+    def _price_exact(self, pi, mu, known):
+        """
+        Enumerates the columns that fit in a vehicle, depth first, and returns
+        the first new one with a negative reduced cost, or `None` if there is
+        none, which proves the relaxation of the restricted master optimal.
+        """
+        n_t = len(self.T)
+
+        def extend(column, load):
+            if column and tuple(column) not in known:
+                fares = self._column_fares(tuple(column))
+                if mu[column] @ fares - pi[column].sum() < -1e-9:
+                    return tuple(column)
+            for t in range(column[-1] + 1 if column else 0, n_t):
+                new_load = load + self._counts[t] * self._member[t]
+                if (new_load <= self.CAPACITY).all():
+                    found = extend(column + [t], new_load)
+                    if found is not None:
+                        return found
+            return None
+
+        return extend([], np.zeros(len(self.segments)))
+
+    def solve(self, config=None):
+        """
+        Solves the assignment by column generation and stores it for
+        `get_results`.
+
+        Args:
+            config (ColumnGenerationConfig | None): The stopping criteria.
+
+        Returns:
+            str: `"Optimal"` if the assignment is within the gap of a proven
+                bound, otherwise `"Feasible"`, with the gap to the estimated
+                bound in `self.report.gap`. Timing and statistics are stored
+                in `self.report`, and the columns in `self.columns`.
+        """
+        config = config or ColumnGenerationConfig()
+        start = time.perf_counter()
+        self._prepare_arrays()
+        columns = self._initial_columns()
+        known = set(columns)
+        self.build_time = time.perf_counter() - start
+
+        best_z, chosen = self.Z_val, [tuple(sorted(v)) for v in self.assignments.values()]
+        # The proven bound, and the estimate including unproven relaxations
+        bound = estimate = self._segment_bound()
+        gap = max(best_z - estimate, 0) / max(best_z, 1e-10)
+        self.iterations = 0
+        while gap > config.mip_gap and self.iterations < config.max_iterations:
+            if config.time_limit is not None and (
+                time.perf_counter() - start >= config.time_limit
+            ):
+                break
+            self.iterations += 1
+            relaxation, pi, mu, support = self._solve_relaxation(columns=columns)
+            new_columns = self._price(
+                pi=pi, mu=mu, known=known, limit=config.columns_per_iteration
+            )
+            proven = False
+            if not new_columns and len(self.T) <= config.exact_pricing_trips:
+                column = self._price_exact(pi=pi, mu=mu, known=known)
+                if column is None:
+                    proven = True
+                else:
+                    known.add(column)
+                    new_columns.append(column)
+            columns.extend(new_columns)
+            repairs = [c for c in self._bottleneck_columns(chosen) if c not in known]
+            known.update(repairs)
+            columns.extend(repairs)
+            columns.extend(
+                self._complete(columns=new_columns + support + repairs, known=known)
+            )
+            if not new_columns:
+                estimate = max(estimate, relaxation)
+            if proven:
+                bound = max(bound, relaxation)
+
+            z, solution = self._solve_integer(
+                columns=columns, time_limit=config.master_time_limit
+            )
+            if solution is not None and z < best_z:
+                best_z, chosen = z, solution
+            gap = max(best_z - estimate, 0) / max(best_z, 1e-10)
+            if not new_columns and not repairs:
+                break
+
+        self.columns = columns
+        self._store_columns(chosen)
+        self.report = SolveReport(
+            status=(
+                "Optimal"
+                if max(self.Z_val - bound, 0) <= config.mip_gap * self.Z_val
+                else "Feasible"
+            ),
+            solver="ColGen",
+            build_time=self.build_time,
+            solve_time=time.perf_counter() - start - self.build_time,
+            objective=self.Z_val,
+            gap=gap,
+        )
+        return self.report.status
+
+    def _store_columns(self, chosen):
+        self.assignments = {v: list(column) for v, column in enumerate(chosen)}
+        self.fares, self.occupancy = {}, {}
+        for v, column in self.assignments.items():
+            load = self._load(tuple(column))
+            self.occupancy[v] = {
+                s: float(occ) for s, occ in zip(self.segments, load) if occ > 0
+            }
+            for t, fare in zip(column, self._column_fares(tuple(column))):
+                self.fares[t] = float(fare)
+        self.Z_val = max(self.fares.values())
@@ -0,0 +1,225 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+from numpy import typing as npt
+from sklearn.cluster import AffinityPropagation
+
+from yatry.utils.data.map import BHOPAL
+from yatry.utils.helpers.affinity import affinity_matrices
+from yatry.utils.models import Passenger
+from yatry.utils.models.map import Map
+from yatry.utils.optim.clustering import capacity_aware_clustering
+
+
+@dataclass
+class CompressedDemand:
+    """
+    Passengers collapsed into weighted entities.
+
+    Passengers with the same source and destination whose departure windows
+    start and end in the same quantum of time are represented by a single
+    entity, which carries their number as its `count`, like the groups of
+    `VehicleAssignmentModel`.
+
+    Attributes:
+        entities (list[Passenger]): A representative passenger per entity,
+            with the mean departure window of its members.
+        counts (npt.NDArray[np.int64]): The number of passengers per entity.
+        inverse (npt.NDArray[np.int64]): The entity of every passenger.
+    """
+
+    entities: list[Passenger]
+    counts: npt.NDArray[np.int64]
+    inverse: npt.NDArray[np.int64]
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def expand(self, entity_labels: npt.ArrayLike) -> npt.NDArray[np.int64]:
+        """
+        Maps one label per entity back to one label per passenger.
+        """
+        return np.asarray(entity_labels, dtype=np.int64)[self.inverse]
+
+
+def compress_passengers(
+    passengers: list[Passenger], quantum: float = 300.0
+) -> CompressedDemand:
+    """
+    Buckets passengers by source, destination and their departure window
+    rounded to `quantum` seconds.
+
+    Args:
+        passengers (list[Passenger]): The passengers.
+        quantum (float): The resolution of the departure windows in seconds.
+
+    Returns:
+        CompressedDemand: The entities and the entity of every passenger.
+    """
+    buckets: dict[tuple, list[int]] = defaultdict(list)
+    for i, p in enumerate(passengers):
+        t_start, t_end = p.get_dep_time_range_num()
+        key = (p.source, p.destination, round(t_start / quantum), round(t_end / quantum))
+        buckets[key].append(i)
+
+    entities = []
+    inverse = np.empty(len(passengers), dtype=np.int64)
+    for k, ((source, destination, _, _), members) in enumerate(buckets.items()):
+        windows = np.array([passengers[i].get_dep_time_range_num() for i in members])
+        t_start, t_end = windows.mean(axis=0)
+        tz = passengers[members[0]].dep_time_range[0].tzinfo
+        entities.append(
+            Passenger(
+                name=f"Entity #{k}",
+                source=source,
+                destination=destination,
+                dep_time_range=(
+                    datetime.fromtimestamp(t_start, tz=tz),
+                    datetime.fromtimestamp(t_end, tz=tz),
+                ),
+            )
+        )
+        inverse[members] = k
+
+    return CompressedDemand(
+        entities=entities,
+        counts=np.bincount(inverse, minlength=len(entities)).astype(np.int64),
+        inverse=inverse,
+    )
+
+
+def weighted_percentile(
+    affinity_matrix: np.ndarray,
+    counts: npt.ArrayLike,
+    percentile: float,
+    nonzero: bool = False,
+) -> float:
+    """
+    The percentile of the affinities of the individual passengers, computed
+    from the entity affinity matrix with every pair weighted by the product
+    of the entity counts. With `nonzero`, only the nonzero affinities are
+    taken, as for the merge threshold of `capacity_aware_clustering`, and
+    `np.inf` is returned if there are none, so that nothing is merged.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    affinities, weights = affinity_matrix, np.outer(counts, counts)
+    if nonzero:
+        mask = affinity_matrix > 0
+        if not mask.any():
+            return np.inf
+        affinities, weights = affinity_matrix[mask], weights[mask]
+    return float(
+        np.percentile(
+            affinities, percentile, weights=weights, method="inverted_cdf"
+        )
+    )
+
+
+def weighted_affinity_propagation_labels(
+    affinity_matrix: np.ndarray,
+    counts: npt.ArrayLike,
+    damping: float = 0.7,
+    preference_percentile: float = 50,
+    max_iter: int = 500,
+) -> np.ndarray:
+    """
+    Clusters weighted entities with Affinity Propagation as if every entity
+    were `count` identical passengers, following weighted AP (Zhang et al.).
+
+    As in `affinity_propagation_labels`, the model is fit on the min-max
+    scaled affinities. The similarity of entity `i` towards `k` is scaled by
+    the count of `i`, as all of its passengers would choose the same
+    exemplar. The preference of every entity is the preference of a single
+    passenger, taken over the individual affinities, plus the affinity of its
+    other `count - 1` passengers to the one that would be the exemplar.
+
+    Args:
+        affinity_matrix (np.ndarray): The `E x E` affinity matrix of the
+            entities.
+        counts (npt.ArrayLike): The number of passengers per entity.
+        damping (float): Damping factor of the message updates.
+        preference_percentile (float): Percentile of the individual affinities
+            used as the preference of a single passenger.
+        max_iter (int): Maximum number of AP iterations.
+
+    Returns:
+        np.ndarray: The cluster label of every entity.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    min_val, max_val = np.min(affinity_matrix), np.max(affinity_matrix)
+    scaled_affinity = (affinity_matrix - min_val) / (max_val - min_val + 1e-10)
+
+    preference_val = weighted_percentile(
+        affinity_matrix=affinity_matrix, counts=counts, percentile=preference_percentile
+    )
+    preference = preference_val + (counts - 1) * np.diag(scaled_affinity)
+    ap = AffinityPropagation(
+        affinity="precomputed",
+        damping=damping,
+        max_iter=max_iter,
+        preference=preference,
+    )
+    return ap.fit_predict(X=counts[:, None] * scaled_affinity)
+
+
+def compressed_cluster_labels(
+    passengers: list[Passenger],
+    map_: Map = BHOPAL,
+    capacity: int | None = 5,
+    quantum: float = 300.0,
+    damping: float = 0.7,
+    preference_percentile: float = 50,
+    max_iter: int = 500,
+) -> np.ndarray:
+    """
+    Clusters passengers on their compressed demand: builds the affinity
+    matrix of the entities only, clusters them with weighted Affinity
+    Propagation and expands the labels back to the passengers. Clusters are
+    then split and merged to fit `capacity` on the entity matrix.
+
+    Args:
+        passengers (list[Passenger]): The passengers.
+        map_ (Map): The map to compute route affinities on.
+        capacity (int | None): If given, the capacity of a group.
+        quantum (float): The resolution of the departure windows in seconds,
+            see `compress_passengers`.
+        damping (float): Damping factor of Affinity Propagation.
+        preference_percentile (float): Percentile of the affinities used as the
+            AP preference.
+        max_iter (int): Maximum number of AP iterations.
+
+    Returns:
+        np.ndarray: The cluster label of every passenger.
+    """
+    demand = compress_passengers(passengers=passengers, quantum=quantum)
+    if len(demand) == 1:
+        labels = np.zeros(len(passengers), dtype=np.int64)
+        return labels if capacity is None else np.arange(len(passengers)) // capacity
+
+    _, _, affinity_matrix = affinity_matrices(passengers=demand.entities, map_=map_)
+    labels = demand.expand(
+        weighted_affinity_propagation_labels(
+            affinity_matrix=affinity_matrix,
+            counts=demand.counts,
+            damping=damping,
+            preference_percentile=preference_percentile,
+            max_iter=max_iter,
+        )
+    )
+    if capacity is None:
+        return labels
+
+    return capacity_aware_clustering(
+        affinity_matrix=affinity_matrix,
+        capacity=capacity,
+        merge_threshold=weighted_percentile(
+            affinity_matrix=affinity_matrix,
+            counts=demand.counts,
+            percentile=preference_percentile,
+            nonzero=True,
+        ),
+        labels=labels,
+        rows=demand.inverse,
+    )
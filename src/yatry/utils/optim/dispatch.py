@@ -0,0 +1,302 @@
+from dataclasses import dataclass, field
+
+from yatry.utils.data.locations import Location
+from yatry.utils.data.map import BHOPAL
+from yatry.utils.models import Passenger
+from yatry.utils.models.map import Map
+from yatry.utils.optim.group import GroupResult
+
+# Rough travel time per rupee of auto fare, ~22 ₹/km at ~25 km/h in Bhopal
+SECONDS_PER_RUPEE: float = 6.0
+
+
+def round_trip_duration(
+    passengers: list[Passenger],
+    map_: Map = BHOPAL,
+    seconds_per_rupee: float = SECONDS_PER_RUPEE,
+) -> float:
+    """
+    Estimates how long an auto is away from the root of the map to serve a
+    group, from the fares of the roads it travels.
+
+    As the map is a tree, the shortest tour from the root through every
+    source and destination of the group travels each road leading to them
+    exactly twice, once away from the root and once back.
+
+    Args:
+        passengers (list[Passenger]): The passengers of the group.
+        map_ (Map): The map the group travels on.
+        seconds_per_rupee (float): The travel time per rupee of fare.
+
+    Returns:
+        float: The duration of the round trip in seconds.
+    """
+    root = map_.root.value
+    roads: set[frozenset[Location]] = set()
+    for loc in {loc for p in passengers for loc in (p.source, p.destination)}:
+        route = map_._find_route(loc_start=root, loc_end=loc)
+        roads.update(frozenset(road) for road in zip(route[:-1], route[1:]))
+    fare = sum(map_.get_road_fare(*road) for road in roads)
+    return 2 * fare * seconds_per_rupee
+
+
+@dataclass
+class Dispatch:
+    """
+    A group assigned to a vehicle of the fleet.
+
+    Attributes:
+        group_id (int): The id of the group.
+        vehicle (int): The index of the vehicle in the fleet.
+        dep_time (float): The departure time as a timestamp.
+        return_time (float): When the vehicle is back at the root of the map.
+    """
+
+    group_id: int
+    vehicle: int
+    dep_time: float
+    return_time: float
+
+    @property
+    def vehicle_name(self) -> str:
+        return f"Auto #{self.vehicle + 1}"
+
+    @property
+    def duration(self) -> float:
+        return self.return_time - self.dep_time
+
+
+@dataclass
+class DispatchResult:
+    """
+    The schedule of a fleet.
+
+    Attributes:
+        n_vehicles (int): The size of the fleet.
+        dispatches (list[Dispatch]): The served groups by departure time.
+        unserved (list[int]): The ids of the groups no vehicle was left for.
+    """
+
+    n_vehicles: int
+    dispatches: list[Dispatch] = field(default_factory=list)
+    unserved: list[int] = field(default_factory=list)
+
+    @property
+    def busy_time(self) -> list[float]:
+        """
+        The time every vehicle spends on trips, in seconds.
+        """
+        busy = [0.0] * self.n_vehicles
+        for dispatch in self.dispatches:
+            busy[dispatch.vehicle] += dispatch.duration
+        return busy
+
+    @property
+    def span(self) -> float:
+        """
+        The time from the first departure to the last return, in seconds.
+        """
+        if not self.dispatches:
+            return 0.0
+        return max(d.return_time for d in self.dispatches) - min(
+            d.dep_time for d in self.dispatches
+        )
+
+    @property
+    def utilization(self) -> float:
+        """
+        The fraction of the fleet's time over the span spent on trips.
+        """
+        if not self.span:
+            return 0.0
+        return sum(self.busy_time) / (self.n_vehicles * self.span)
+
+
+class _IndexedHeap:
+    """
+    A binary min-heap of vehicles by key that tracks the position of every
+    vehicle, so that a vehicle holds at most one entry and its key can be
+    changed or removed in O(log F) for F vehicles in the heap.
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, int]] = []  # (key, vehicle)
+        self._pos: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def peek(self) -> tuple[float, int]:
+        return self._heap[0]
+
+    def push(self, vehicle: int, key: float) -> None:
+        self._heap.append((key, vehicle))
+        self._pos[vehicle] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def update(self, vehicle: int, key: float) -> None:
+        i = self._pos[vehicle]
+        old_key, _ = self._heap[i]
+        self._heap[i] = (key, vehicle)
+        if key < old_key:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+    def remove(self, vehicle: int) -> None:
+        i = self._pos.pop(vehicle)
+        last = self._heap.pop()
+        if i < len(self._heap):
+            self._heap[i] = last
+            self._pos[last[1]] = i
+            self._sift_up(i)
+            self._sift_down(self._pos[last[1]])
+
+    def pop(self) -> tuple[float, int]:
+        key, vehicle = self._heap[0]
+        self.remove(vehicle)
+        return key, vehicle
+
+    def _swap(self, i: int, j: int) -> None:
+        self._heap[i], self._heap[j] = self._heap[j], self._heap[i]
+        self._pos[self._heap[i][1]] = i
+        self._pos[self._heap[j][1]] = j
+
+    def _sift_up(self, i: int) -> None:
+        while i > 0:
+            parent = (i - 1) // 2
+            if self._heap[i] >= self._heap[parent]:
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i: int) -> None:
+        n = len(self._heap)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < n and self._heap[child] < self._heap[smallest]:
+                    smallest = child
+            if smallest == i:
+                return
+            self._swap(i, smallest)
+            i = smallest
+
+
+def dispatch_fleet(
+    dep_times: list[float], durations: list[float], n_vehicles: int
+) -> DispatchResult:
+    """
+    Assigns trips with fixed departure times to a fleet of identical
+    vehicles, serving as many trips as possible.
+
+    Trips are taken by departure time. A trip gets a vehicle that is back by
+    then if there is one. Otherwise, if the vehicle busy the longest would
+    return after the trip does, it drops its trip for this one, which frees
+    it earlier for the trips that follow (Faigle and Nawijn). The busy
+    vehicles are kept in two indexed heaps by earliest and latest return,
+    with one entry per vehicle that is updated in place when the vehicle
+    swaps its trip, so every trip costs O(log F) for F vehicles, and the
+    whole schedule O(G log G + G log F) for G trips with the sort by
+    departure time.
+
+    Args:
+        dep_times (list[float]): The departure time of every trip.
+        durations (list[float]): How long every trip keeps its vehicle, in
+            seconds.
+        n_vehicles (int): The size of the fleet.
+
+    Returns:
+        DispatchResult: The trips of every vehicle, with trips identified by
+            their index, and the trips left unserved.
+    """
+    if n_vehicles < 1:
+        raise ValueError("The fleet needs at least one vehicle")
+
+    # The trip of every busy vehicle, which is in both heaps
+    current: list[int | None] = [None] * n_vehicles
+    earliest = _IndexedHeap()  # return time
+    latest = _IndexedHeap()  # -return time
+    idle = list(range(n_vehicles - 1, -1, -1))
+    served: dict[int, int] = {}
+    unserved = []
+
+    order = sorted(range(len(dep_times)), key=lambda i: (dep_times[i], durations[i]))
+    for trip in order:
+        dep_time = dep_times[trip]
+        return_time = dep_time + durations[trip]
+
+        while earliest and earliest.peek()[0] <= dep_time:
+            _, vehicle = earliest.pop()
+            latest.remove(vehicle)
+            current[vehicle] = None
+            idle.append(vehicle)
+        if idle:
+            vehicle = idle.pop()
+            earliest.push(vehicle=vehicle, key=return_time)
+            latest.push(vehicle=vehicle, key=-return_time)
+        else:
+            latest_return, vehicle = latest.peek()
+            if -latest_return <= return_time:
+                unserved.append(trip)
+                continue
+            dropped = current[vehicle]
+            del served[dropped]
+            unserved.append(dropped)
+            earliest.update(vehicle=vehicle, key=return_time)
+            latest.update(vehicle=vehicle, key=-return_time)
+        current[vehicle] = trip
+        served[trip] = vehicle
+
+    dispatches = [
+        Dispatch(
+            group_id=trip,
+            vehicle=vehicle,
+            dep_time=dep_times[trip],
+            return_time=dep_times[trip] + durations[trip],
+        )
+        for trip, vehicle in served.items()
+    ]
+    dispatches.sort(key=lambda d: (d.dep_time, d.vehicle))
+    return DispatchResult(
+        n_vehicles=n_vehicles, dispatches=dispatches, unserved=sorted(unserved)
+    )
+
+
+def dispatch_groups(
+    groups: list[GroupResult],
+    n_vehicles: int,
+    map_: Map = BHOPAL,
+    seconds_per_rupee: float = SECONDS_PER_RUPEE,
+) -> DispatchResult:
+    """
+    Schedules processed groups on a fleet of autos based at the root of the
+    map, see `dispatch_fleet`.
+
+    Args:
+        groups (list[GroupResult]): The groups with their optimized
+            departure times.
+        n_vehicles (int): The number of autos.
+        map_ (Map): The map the groups travel on.
+        seconds_per_rupee (float): The travel time per rupee of fare, see
+            `round_trip_duration`.
+
+    Returns:
+        DispatchResult: The schedule, with groups identified by `group_id`.
+    """
+    result = dispatch_fleet(
+        dep_times=[group.dep_time for group in groups],
+        durations=[
+            round_trip_duration(
+                passengers=group.passengers,
+                map_=map_,
+                seconds_per_rupee=seconds_per_rupee,
+            )
+            for group in groups
+        ],
+        n_vehicles=n_vehicles,
+    )
+    for dispatch in result.dispatches:
+        dispatch.group_id = groups[dispatch.group_id].group_id
+    result.unserved = [groups[i].group_id for i in result.unserved]
+    return result
@@ -0,0 +1,160 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from numpy import typing as npt
+
+from yatry.utils.helpers.affinity import passenger_routes
+from yatry.utils.models import Passenger
+from yatry.utils.models.fare import FareTable
+from yatry.utils.models.map import Map
+
+
+def passenger_solo_fares(
+    passengers: list[Passenger],
+    map_: Map,
+    fare_table: FareTable | None = None,
+    dep_times: npt.ArrayLike | None = None,
+) -> npt.NDArray[np.float64]:
+    """
+    Computes the fare every passenger would pay riding alone.
+
+    Args:
+        passengers (list[Passenger]): The passengers.
+        map_ (Map): The map to plan the trips on.
+        fare_table (FareTable | None): If given, the fares are looked up at
+            the departure times instead of the static fares of `map_`.
+        dep_times (npt.ArrayLike | None): The departure time of every
+            passenger for `fare_table`, see `FareTable.passenger_fares`.
+
+    Returns:
+        npt.NDArray[np.float64]: The solo fare of every passenger.
+    """
+    if fare_table is not None:
+        return fare_table.passenger_fares(passengers=passengers, dep_times=dep_times)
+
+    route_fares: dict[tuple, float] = {}
+    fares = np.empty(len(passengers), dtype=np.float64)
+    for i, route in enumerate(passenger_routes(passengers=passengers, map_=map_)):
+        key = tuple(route)
+        if key not in route_fares:
+            route_fares[key] = map_.get_fare_on_route(route=route)
+        fares[i] = route_fares[key]
+    return fares
+
+
+@dataclass
+class FareSettlement:
+    """
+    The settled fares of all groups, in columnar form.
+
+    Every group pays the fare of its longest trip, split among its passengers
+    in proportion to their solo fares.
+
+    Attributes:
+        labels (npt.NDArray[np.int64]): The group label of every passenger.
+        solo_fares (npt.NDArray[np.float64]): The solo fare of every passenger.
+        new_fares (npt.NDArray[np.float64]): The settled fare of every passenger.
+        group_labels (npt.NDArray[np.int64]): The distinct group labels, sorted.
+        group_sizes (npt.NDArray[np.int64]): The number of passengers per group.
+        group_max_fares (npt.NDArray[np.float64]): The fare paid by every group.
+        group_sum_fares (npt.NDArray[np.float64]): The sum of the solo fares of
+            every group.
+    """
+
+    labels: npt.NDArray[np.int64]
+    solo_fares: npt.NDArray[np.float64]
+    new_fares: npt.NDArray[np.float64]
+    group_labels: npt.NDArray[np.int64]
+    group_sizes: npt.NDArray[np.int64]
+    group_max_fares: npt.NDArray[np.float64]
+    group_sum_fares: npt.NDArray[np.float64]
+
+    @property
+    def savings(self) -> npt.NDArray[np.float64]:
+        return self.solo_fares - self.new_fares
+
+    @property
+    def group_savings(self) -> npt.NDArray[np.float64]:
+        return self.group_sum_fares - self.group_max_fares
+
+    @property
+    def total_saving(self) -> float:
+        return float(self.group_savings.sum())
+
+    def group_index(self, label: int) -> int:
+        """
+        The row of a group label in the per-group arrays.
+        """
+        row = int(np.searchsorted(self.group_labels, label))
+        if row == len(self.group_labels) or self.group_labels[row] != label:
+            raise KeyError(f"No group with label {label}")
+        return row
+
+    def passenger_table(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "group": self.labels,
+                "original_fare": self.solo_fares,
+                "new_fare": self.new_fares,
+                "saving": self.savings,
+            }
+        )
+
+    def group_table(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "group": self.group_labels,
+                "passengers": self.group_sizes,
+                "total_fare": self.group_max_fares,
+                "sum_fare": self.group_sum_fares,
+                "saving": self.group_savings,
+            }
+        )
+
+
+def settle_fares(
+    labels: npt.ArrayLike, solo_fares: npt.ArrayLike
+) -> FareSettlement:
+    """
+    Settles the fares of all groups at once.
+
+    The passengers are sorted by group once, after which the fare of every
+    group is a single `np.maximum.reduceat` and the sum of its solo fares a
+    single `np.bincount`.
+
+    Args:
+        labels (npt.ArrayLike): The group label of every passenger.
+        solo_fares (npt.ArrayLike): The solo fare of every passenger.
+
+    Returns:
+        FareSettlement: The per-passenger and per-group fares.
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    solo_fares = np.asarray(solo_fares, dtype=np.float64)
+
+    group_labels, inverse, group_sizes = np.unique(
+        labels, return_inverse=True, return_counts=True
+    )
+    order = np.argsort(inverse, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(group_sizes)[:-1]]).astype(np.int64)
+
+    group_max_fares = (
+        np.maximum.reduceat(solo_fares[order], starts)
+        if len(labels)
+        else np.zeros(0, dtype=np.float64)
+    )
+    group_sum_fares = np.bincount(
+        inverse, weights=solo_fares, minlength=len(group_labels)
+    )
+    new_fares = solo_fares * group_max_fares[inverse] / group_sum_fares[inverse]
+
+    return FareSettlement(
+        labels=labels,
+        solo_fares=solo_fares,
+        new_fares=new_fares,
+        group_labels=group_labels,
+        group_sizes=group_sizes,
+        group_max_fares=group_max_fares,
+        group_sum_fares=group_sum_fares,
+    )
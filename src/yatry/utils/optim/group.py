@@ -0,0 +1,391 @@
+import multiprocessing
+import os
+import signal
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from yatry.utils.data.map import BHOPAL
+from yatry.utils.models import Passenger
+from yatry.utils.models.map import Map
+from yatry.utils.optim.assign import SolverConfig
+from yatry.utils.optim.cache import AssignmentCache
+from yatry.utils.optim.fare import passenger_solo_fares, settle_fares
+from yatry.utils.optim.segments import assignment_inputs
+from yatry.utils.optim.time import optimize_passengers_dep_time
+
+
+# Solved assignment instances, shared by the groups of every batch this
+# process handles
+ASSIGNMENT_CACHE = AssignmentCache()
+
+
+@dataclass
+class PassengerFare:
+    """
+    The fare settled for a single passenger of a group.
+    """
+
+    passenger: Passenger
+    original_fare: float
+    new_fare: float
+
+    @property
+    def saving(self) -> float:
+        return self.original_fare - self.new_fare
+
+
+@dataclass
+class GroupResult:
+    """
+    The post-processed result of a single group of passengers.
+
+    Attributes:
+        group_id (int): The index of the group in the clustering output.
+        passengers (list[Passenger]): The passengers in the group.
+        dep_time (float): The optimized departure time as a timestamp.
+        total_fare (float | None): The fare of the whole auto, or `None` if
+            the fares were not settled per group.
+        fares (list[PassengerFare]): The settled fare of each passenger, empty
+            if the fares were not settled per group.
+        assignments (list[dict]): The vehicle assignment of every line of the
+            group in the shape of `VehicleAssignmentModel.get_results`, see
+            `assign_vehicles`. Empty if the group was not assigned.
+        status (str): `"ok"`, or `"fallback"` / `"timeout"` / `"error"` if the
+            departure time could not be optimized.
+        error (str | None): The error message for a non-`"ok"` status.
+        elapsed (float): Wall time spent on the group, in seconds.
+    """
+
+    group_id: int
+    passengers: list[Passenger]
+    dep_time: float
+    total_fare: float | None
+    fares: list[PassengerFare] = field(default_factory=list)
+    assignments: list[dict] = field(default_factory=list)
+    status: str = "ok"
+    error: str | None = None
+    elapsed: float = 0.0
+
+    @property
+    def total_saving(self) -> float:
+        return sum(fare.saving for fare in self.fares)
+
+
+def _fallback_dep_time(passengers: list[Passenger]) -> float:
+    # Average of the earliest departure times, as used by the pipelines
+    return float(np.mean([p.get_dep_time_range_num()[0] for p in passengers]))
+
+
+def _settle_group_fares(
+    passengers: list[Passenger], map_: Map
+) -> tuple[float, list[PassengerFare]]:
+    """
+    Settles the fares of a single group with `settle_fares`: the group pays
+    the fare of its longest trip, split in proportion to the solo fares.
+    """
+    settlement = settle_fares(
+        labels=np.zeros(len(passengers), dtype=np.int64),
+        solo_fares=passenger_solo_fares(passengers=passengers, map_=map_),
+    )
+    fares = [
+        PassengerFare(
+            passenger=passenger,
+            original_fare=float(original_fare),
+            new_fare=float(new_fare),
+        )
+        for passenger, original_fare, new_fare in zip(
+            passengers, settlement.solo_fares, settlement.new_fares
+        )
+    ]
+    return float(settlement.group_max_fares[0]), fares
+
+
+def assign_vehicles(
+    passengers: list[Passenger],
+    map_: Map = BHOPAL,
+    capacity: int = 5,
+    config: SolverConfig | None = None,
+    cache: AssignmentCache | None = ASSIGNMENT_CACHE,
+) -> list[dict]:
+    """
+    Assigns the passengers of a group to vehicles, solving one
+    `VehicleAssignmentModel` per line of the map the group travels on, see
+    `assignment_inputs`. Lines of the same shape as one solved before are
+    answered from `cache` without building or solving a model.
+
+    Args:
+        passengers (list[Passenger]): The passengers in the group.
+        map_ (Map): The map the group travels on.
+        capacity (int): The vehicle capacity.
+        config (SolverConfig | None): The solver configuration.
+        cache (AssignmentCache | None): The cache of solved instances, or
+            `None` to solve every line.
+
+    Returns:
+        list[dict]: The results of `VehicleAssignmentModel.get_results` of
+            every line.
+    """
+    assignments = []
+    for assignment_input in assignment_inputs(passengers=passengers, map_=map_):
+        if cache is not None:
+            assignments.append(
+                cache.solve(
+                    groups=assignment_input.groups,
+                    segment_costs=assignment_input.segment_costs,
+                    capacity=capacity,
+                    config=config,
+                )
+            )
+            continue
+        model = assignment_input.to_model(capacity=capacity)
+        model.solve(config=config or SolverConfig())
+        assignments.append(model.get_results())
+    return assignments
+
+
+def process_group(
+    group_id: int,
+    passengers: list[Passenger],
+    map_: Map = BHOPAL,
+    settle: bool = True,
+    assign: bool = True,
+) -> GroupResult:
+    """
+    Optimizes the departure time of a group, assigns it to vehicles and
+    settles its fares.
+
+    Args:
+        group_id (int): The index of the group.
+        passengers (list[Passenger]): The passengers in the group.
+        map_ (Map): The map to compute routes and fares on.
+        settle (bool): Whether to settle the fares of the group. Callers that
+            settle the fares of all groups at once with `settle_fares` can
+            skip it.
+        assign (bool): Whether to assign the group to vehicles with
+            `assign_vehicles`.
+
+    Returns:
+        GroupResult: The result for the group. If the departure time cannot be
+            optimized, the average earliest departure time is used, and if
+            the group cannot be assigned it is left without assignments; the
+            status is then set to `"fallback"`.
+    """
+    start = time.perf_counter()
+    total_fare, fares = (
+        _settle_group_fares(passengers=passengers, map_=map_) if settle else (None, [])
+    )
+    status, error = "ok", None
+    try:
+        dep_time = optimize_passengers_dep_time(passengers=passengers)
+    except Exception as e:
+        status, error = "fallback", str(e)
+        dep_time = _fallback_dep_time(passengers=passengers)
+    assignments = []
+    if assign:
+        try:
+            assignments = assign_vehicles(passengers=passengers, map_=map_)
+        except Exception as e:
+            status, error = "fallback", error or str(e)
+
+    return GroupResult(
+        group_id=group_id,
+        passengers=passengers,
+        dep_time=dep_time,
+        total_fare=total_fare,
+        fares=fares,
+        assignments=assignments,
+        status=status,
+        error=error,
+        elapsed=time.perf_counter() - start,
+    )
+
+
+def _report_pid(pids: multiprocessing.SimpleQueue) -> None:
+    # Initializer of the pool workers, so that the executor can kill them
+    pids.put(os.getpid())
+
+
+class GroupExecutor:
+    """
+    Fans groups of passengers out to a process pool and collects their results
+    in the order of the groups.
+
+    At most `max_workers` groups are in flight at a time, and every group gets
+    its own deadline of `timeout` seconds from when it is handed to the pool.
+    A running task cannot be cancelled, so when groups time out the workers of
+    the pool are terminated and a fresh pool takes over; the groups that were
+    still running on it are submitted again with a new deadline. If a worker
+    dies, the groups that were running get a fallback result with the status
+    `"error"` and a fresh pool takes over as well.
+
+    Attributes:
+        max_workers (int): Number of worker processes. With a single worker the
+            groups are processed serially in the current process, without a
+            timeout.
+        timeout (float | None): Seconds each group may take once submitted. A
+            group that times out gets a fallback result with the status
+            `"timeout"`.
+        map_ (Map): The map to compute routes and fares on.
+        settle (bool): Whether to settle the fares of every group, see
+            `process_group`.
+    """
+
+    max_workers: int
+    timeout: float | None
+    map_: Map
+    settle: bool
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        timeout: float | None = None,
+        map_: Map = BHOPAL,
+        settle: bool = True,
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.map_ = map_
+        self.settle = settle
+
+    def _fallback(
+        self, group_id: int, passengers: list[Passenger], status: str, error: str
+    ) -> GroupResult:
+        total_fare, fares = (
+            _settle_group_fares(passengers=passengers, map_=self.map_)
+            if self.settle
+            else (None, [])
+        )
+        return GroupResult(
+            group_id=group_id,
+            passengers=passengers,
+            dep_time=_fallback_dep_time(passengers=passengers),
+            total_fare=total_fare,
+            fares=fares,
+            status=status,
+            error=error,
+        )
+
+    @staticmethod
+    def _new_pool(
+        n_workers: int,
+    ) -> tuple[ProcessPoolExecutor, multiprocessing.SimpleQueue]:
+        pids = multiprocessing.SimpleQueue()
+        pool = ProcessPoolExecutor(
+            max_workers=n_workers, initializer=_report_pid, initargs=(pids,)
+        )
+        return pool, pids
+
+    @staticmethod
+    def _terminate(
+        pool: ProcessPoolExecutor, pids: multiprocessing.SimpleQueue
+    ) -> None:
+        # The pool reaps its workers once they are gone
+        pool.shutdown(wait=False, cancel_futures=True)
+        while not pids.empty():
+            try:
+                os.kill(pids.get(), signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        pids.close()
+
+    def _submit(
+        self, pool: ProcessPoolExecutor, i: int, passengers: list[Passenger]
+    ) -> Future:
+        return pool.submit(
+            process_group,
+            group_id=i,
+            passengers=passengers,
+            map_=self.map_,
+            settle=self.settle,
+        )
+
+    def run(self, groups: list[list[Passenger]]) -> list[GroupResult]:
+        """
+        Processes every group with `process_group`.
+
+        Args:
+            groups (list[list[Passenger]]): The groups of passengers.
+
+        Returns:
+            list[GroupResult]: One result per group, in the same order.
+        """
+        if self.max_workers == 1 or len(groups) <= 1:
+            return [
+                process_group(
+                    group_id=i, passengers=group, map_=self.map_, settle=self.settle
+                )
+                for i, group in enumerate(groups)
+            ]
+
+        n_workers = min(self.max_workers, len(groups))
+        results: list[GroupResult | None] = [None] * len(groups)
+        pending = deque(range(len(groups)))
+        running: dict[Future, tuple[int, float]] = {}
+        pool, pids = self._new_pool(n_workers=n_workers)
+        try:
+            while pending or running:
+                while pending and len(running) < n_workers:
+                    i = pending.popleft()
+                    try:
+                        future = self._submit(pool=pool, i=i, passengers=groups[i])
+                    except BrokenProcessPool:
+                        # A worker died, so the groups still running on the
+                        # old pool fail and fall back on their own
+                        self._terminate(pool=pool, pids=pids)
+                        pool, pids = self._new_pool(n_workers=n_workers)
+                        future = self._submit(pool=pool, i=i, passengers=groups[i])
+                    deadline = np.inf
+                    if self.timeout is not None:
+                        deadline = time.monotonic() + self.timeout
+                    running[future] = (i, deadline)
+
+                next_deadline = min(deadline for _, deadline in running.values())
+                done, _ = wait(
+                    running,
+                    timeout=(
+                        None
+                        if next_deadline == np.inf
+                        else max(next_deadline - time.monotonic(), 0)
+                    ),
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    i, _ = running.pop(future)
+                    try:
+                        results[i] = future.result()
+                    except Exception as e:
+                        results[i] = self._fallback(
+                            group_id=i,
+                            passengers=groups[i],
+                            status="error",
+                            error=str(e) or type(e).__name__,
+                        )
+
+                now = time.monotonic()
+                expired = [f for f, (_, deadline) in running.items() if deadline <= now]
+                if not expired:
+                    continue
+                for future in expired:
+                    i, _ = running.pop(future)
+                    results[i] = self._fallback(
+                        group_id=i,
+                        passengers=groups[i],
+                        status="timeout",
+                        error=f"No result after {self.timeout}s",
+                    )
+                # Kill the hung workers and resubmit the groups they shared the
+                # pool with
+                self._terminate(pool=pool, pids=pids)
+                pool, pids = self._new_pool(n_workers=n_workers)
+                resubmit = sorted(i for i, _ in running.values())
+                pending.extendleft(reversed(resubmit))
+                running.clear()
+        finally:
+            self._terminate(pool=pool, pids=pids)
+
+        return results
@@ -0,0 +1,235 @@
+import heapq
+import itertools
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from yatry.utils.data.map import BHOPAL
+from yatry.utils.matching import cluster_passengers
+from yatry.utils.models import Passenger
+from yatry.utils.models.affinity import AffinityIndex
+from yatry.utils.models.map import Map
+from yatry.utils.optim.clustering import AffinityPropagationState
+from yatry.utils.optim.group import GroupResult, process_group
+
+
+@dataclass
+class HorizonStep:
+    """
+    The outcome of one step of the rolling-horizon scheduler.
+
+    Attributes:
+        cursor (datetime): The time the step was planned at.
+        committed (list[GroupResult]): The groups committed in this step.
+        n_active (int): Number of passengers planned in this step.
+        n_waiting (int): Number of passengers whose windows start beyond the
+            lookahead after the step.
+        elapsed (float): Wall time spent on the step, in seconds.
+    """
+
+    cursor: datetime
+    committed: list[GroupResult] = field(default_factory=list)
+    n_active: int = 0
+    n_waiting: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def n_committed(self) -> int:
+        return sum(len(group.passengers) for group in self.committed)
+
+
+class RollingHorizonScheduler:
+    """
+    Plans a continuous stream of passengers by advancing a time cursor.
+
+    At every step only the passengers whose departure windows intersect
+    `[cursor, cursor + horizon + lookahead]` are clustered. The groups whose
+    optimized departure time falls within `cursor + freeze`, or that contain a
+    passenger whose window closes by then, are committed and their passengers
+    evicted. The rest are planned again at the next step, possibly with
+    passengers that arrived in the meantime.
+
+    The active passengers are kept in an `AffinityIndex`, so admitting and
+    evicting a passenger costs O(N) in the number of active passengers.
+    Memory and per-step compute therefore depend on the demand within the
+    horizon and not on how long the scheduler runs.
+
+    Attributes:
+        map_ (Map): The map to plan the trips on.
+        horizon (timedelta): How far the cursor advances per step in `run`.
+        lookahead (timedelta): How far beyond the horizon windows are planned.
+        freeze (timedelta): Groups departing within this interval of the
+            cursor are committed.
+        capacity (int): The capacity of an auto.
+        backend (str): The clustering backend, see `cluster_labels`.
+        cursor (datetime | None): The time of the last step.
+        _index (AffinityIndex): The active passengers.
+        _waiting (list[tuple[float, int, Passenger]]): Heap of the passengers
+            whose windows start beyond the lookahead, by window start.
+        _waiting_ids (set[str]): The names of the waiting passengers.
+        _ap_state (AffinityPropagationState): The AP messages of the last
+            step, which the next step resumes from for the passengers still
+            active.
+    """
+
+    map_: Map
+    horizon: timedelta
+    lookahead: timedelta
+    freeze: timedelta
+    capacity: int
+    backend: str
+    cursor: datetime | None
+    _index: AffinityIndex
+    _waiting: list[tuple[float, int, Passenger]]
+    _waiting_ids: set[str]
+    _ap_state: AffinityPropagationState
+
+    def __init__(
+        self,
+        map_: Map = BHOPAL,
+        horizon: timedelta = timedelta(minutes=15),
+        lookahead: timedelta = timedelta(minutes=45),
+        freeze: timedelta = timedelta(minutes=15),
+        capacity: int = 5,
+        backend: str = "ap",
+    ) -> None:
+        if freeze < horizon:
+            # Otherwise a group could depart before the next step commits it
+            raise ValueError("freeze must be at least as long as the horizon")
+
+        self.map_ = map_
+        self.horizon = horizon
+        self.lookahead = lookahead
+        self.freeze = freeze
+        self.capacity = capacity
+        self.backend = backend
+        self.cursor = None
+        self._index = AffinityIndex(map_=map_)
+        self._waiting = []
+        self._waiting_ids = set()
+        self._sequence = itertools.count()
+        self._ap_state = AffinityPropagationState()
+
+    def __len__(self) -> int:
+        return len(self._index) + len(self._waiting)
+
+    @property
+    def n_active(self) -> int:
+        return len(self._index)
+
+    @property
+    def n_waiting(self) -> int:
+        return len(self._waiting)
+
+    def _plan_until(self) -> float:
+        return (self.cursor + self.horizon + self.lookahead).timestamp()
+
+    def submit(self, passenger: Passenger) -> None:
+        """
+        Adds a passenger to be planned from the first step whose lookahead
+        reaches their departure window.
+
+        Args:
+            passenger (Passenger): The passenger to add.
+        """
+        if passenger.name in self._index or passenger.name in self._waiting_ids:
+            raise ValueError(f"Passenger {passenger.name!r} is already scheduled")
+
+        t_start, _ = passenger.get_dep_time_range_num()
+        if self.cursor is not None and t_start <= self._plan_until():
+            self._index.add(passenger=passenger)
+        else:
+            heapq.heappush(self._waiting, (t_start, next(self._sequence), passenger))
+            self._waiting_ids.add(passenger.name)
+
+    def _admit(self) -> None:
+        plan_until = self._plan_until()
+        while self._waiting and self._waiting[0][0] <= plan_until:
+            _, _, passenger = heapq.heappop(self._waiting)
+            self._waiting_ids.discard(passenger.name)
+            self._index.add(passenger=passenger)
+
+    def step(self, cursor: datetime) -> HorizonStep:
+        """
+        Moves the cursor, replans the active passengers and commits the groups
+        departing within the freeze interval.
+
+        Args:
+            cursor (datetime): The current time. It must not move backwards.
+
+        Returns:
+            HorizonStep: The committed groups and the size of the step.
+        """
+        if self.cursor is not None and cursor < self.cursor:
+            raise ValueError("The cursor cannot move backwards")
+
+        start = time.perf_counter()
+        self.cursor = cursor
+        self._admit()
+        result = HorizonStep(cursor=cursor, n_active=len(self._index))
+
+        passengers = self._index.passengers
+        groups = cluster_passengers(
+            affinity_matrix=self._index.matrix,
+            capacity=self.capacity,
+            backend=self.backend,
+            passenger_ids=[p.name for p in passengers],
+            ap_state=self._ap_state if self.backend == "ap" else None,
+        )
+        freeze_until = (cursor + self.freeze).timestamp()
+        for idxs in groups:
+            group = [passengers[i] for i in idxs]
+            last_call = min(p.get_dep_time_range_num()[1] for p in group)
+            group_result = process_group(
+                group_id=len(result.committed), passengers=group, map_=self.map_
+            )
+            if group_result.dep_time <= freeze_until or last_call <= freeze_until:
+                result.committed.append(group_result)
+
+        for group_result in result.committed:
+            for passenger in group_result.passengers:
+                self._index.remove(passenger_id=passenger.name)
+
+        result.n_waiting = len(self._waiting)
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def run(
+        self,
+        requests: Iterable[tuple[datetime, Passenger]],
+        start: datetime | None = None,
+        end: datetime | None = None,
+    ) -> Iterator[HorizonStep]:
+        """
+        Replays timestamped requests through the scheduler, advancing the
+        cursor by `horizon` per step. Every request is submitted at the first
+        step at or after its arrival.
+
+        Args:
+            requests (Iterable[tuple[datetime, Passenger]]): Arrivals sorted by
+                time, see `load_request_log`. It is consumed lazily.
+            start (datetime | None): The first cursor. Defaults to the first
+                arrival.
+            end (datetime | None): The cursor to stop at. Defaults to running
+                until every passenger has been committed.
+
+        Yields:
+            HorizonStep: The outcome of every step.
+        """
+        arrivals = iter(requests)
+        pending = next(arrivals, None)
+        cursor = start or (pending[0] if pending else self.cursor)
+        if cursor is None:
+            return
+
+        while end is None or cursor <= end:
+            while pending is not None and pending[0] <= cursor:
+                self.submit(passenger=pending[1])
+                pending = next(arrivals, None)
+
+            yield self.step(cursor=cursor)
+
+            if end is None and pending is None and not len(self):
+                return
+            cursor += self.horizon
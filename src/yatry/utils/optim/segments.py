@@ -0,0 +1,160 @@
+from dataclasses import dataclass, field
+
+from yatry.utils.data.locations import Location
+from yatry.utils.data.map import BHOPAL
+from yatry.utils.helpers.affinity import passenger_routes
+from yatry.utils.models import Passenger
+from yatry.utils.models.map import Map
+from yatry.utils.optim.assign import VehicleAssignmentModel
+
+
+@dataclass
+class AssignmentInput:
+    """
+    A vehicle assignment instance on one line of stops of the map.
+
+    Stop `k` of the instance (1-based) is `stops[k - 1]`, and segment `s` runs
+    from stop `s` to stop `s + 1` at the fare `segment_costs[s - 1]`.
+
+    Attributes:
+        stops (list[Location]): The stops in travel order.
+        groups (list[dict]): The groups with `id`, `pickup`, `drop` and
+            `count`, as expected by `VehicleAssignmentModel`.
+        segment_costs (list[float]): The fare of every segment.
+        members (dict[str, list[int]]): The indices of the passengers in every
+            group, into the passengers the input was built from.
+    """
+
+    stops: list[Location]
+    groups: list[dict] = field(default_factory=list)
+    segment_costs: list[float] = field(default_factory=list)
+    members: dict[str, list[int]] = field(default_factory=dict)
+
+    def to_model(
+        self,
+        capacity: int = 5,
+        model_cls: type[VehicleAssignmentModel] = VehicleAssignmentModel,
+    ) -> VehicleAssignmentModel:
+        """
+        Creates the assignment model of the instance.
+
+        Args:
+            capacity (int): The vehicle capacity.
+            model_cls (type[VehicleAssignmentModel]): The model class, e.g.
+                `SparseVehicleAssignmentModel`.
+
+        Returns:
+            VehicleAssignmentModel: The model, not built yet.
+        """
+        return model_cls(
+            groups=self.groups, segment_costs=self.segment_costs, capacity=capacity
+        )
+
+
+def _merge_paths(
+    line: list[Location], route: list[Location]
+) -> list[Location] | None:
+    """
+    Merges a route into a line if the route runs along it in the same
+    direction, possibly extending it at either end.
+
+    Returns:
+        list[Location] | None: The merged line, or `None` if the route leaves
+            the line or runs against it.
+    """
+    if route[0] in line:
+        i = line.index(route[0])
+        overlap = min(len(line) - i, len(route))
+        if line[i : i + overlap] == route[:overlap]:
+            return line + route[overlap:]
+    if line[0] in route:
+        j = route.index(line[0])
+        overlap = min(len(route) - j, len(line))
+        if route[j : j + overlap] == line[:overlap]:
+            return route + line[overlap:]
+    return None
+
+
+def route_lines(routes: list[list[Location]]) -> list[tuple[list[Location], list[int]]]:
+    """
+    Splits routes into lines, i.e. paths of the map tree that every one of
+    their routes travels along in the same direction.
+
+    Routes are taken longest first and put on the first line they run along,
+    or that they extend at one end; otherwise they start a new line. Routes
+    in opposite directions or on different branches thus end up on different
+    lines.
+
+    Args:
+        routes (list[list[Location]]): The routes.
+
+    Returns:
+        list[tuple[list[Location], list[int]]]: The stops of every line and
+            the indices of its routes.
+    """
+    lines: list[tuple[list[Location], list[int]]] = []
+    for i in sorted(range(len(routes)), key=lambda i: -len(routes[i])):
+        for k, (line, members) in enumerate(lines):
+            merged = _merge_paths(line=line, route=routes[i])
+            if merged is not None:
+                lines[k] = (merged, members + [i])
+                break
+        else:
+            lines.append((list(routes[i]), [i]))
+    return lines
+
+
+def assignment_inputs(
+    passengers: list[Passenger], map_: Map = BHOPAL
+) -> list[AssignmentInput]:
+    """
+    Projects a cluster of passengers onto the map as vehicle assignment
+    instances.
+
+    The routes of the passengers are split into lines with `route_lines`.
+    On every line only the stops where some passenger boards or alights are
+    kept, and the fare of the segment between two consecutive kept stops is
+    the fare of the roads between them. Passengers with the same pickup and
+    drop stops are aggregated into one counted group.
+
+    Args:
+        passengers (list[Passenger]): The passengers of the cluster.
+        map_ (Map): The map the passengers travel on.
+
+    Returns:
+        list[AssignmentInput]: One instance per line.
+    """
+    routes = passenger_routes(passengers=passengers, map_=map_)
+    inputs = []
+    for line, route_idxs in route_lines(routes=routes):
+        used = {loc for i in route_idxs for loc in (routes[i][0], routes[i][-1])}
+        positions = [k for k, loc in enumerate(line) if loc in used]
+        stops = [line[k] for k in positions]
+        stop_number = {loc: n for n, loc in enumerate(stops, start=1)}
+
+        assignment_input = AssignmentInput(
+            stops=stops,
+            segment_costs=[
+                map_.get_fare_on_route(route=line[a : b + 1])
+                for a, b in zip(positions[:-1], positions[1:])
+            ],
+        )
+        for i in sorted(route_idxs):
+            route = routes[i]
+            group_id = f"{route[0].name}-{route[-1].name}"
+            if group_id not in assignment_input.members:
+                assignment_input.members[group_id] = []
+                assignment_input.groups.append(
+                    {
+                        "id": group_id,
+                        "pickup": stop_number[route[0]],
+                        "drop": stop_number[route[-1]],
+                        "count": 0,
+                    }
+                )
+            assignment_input.members[group_id].append(i)
+
+        for group in assignment_input.groups:
+            group["count"] = len(assignment_input.members[group["id"]])
+        inputs.append(assignment_input)
+    return inputs
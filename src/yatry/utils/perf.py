@@ -0,0 +1,459 @@
+import json
+import os
+import platform
+import random
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from yatry.utils.data.io import create_random_passengers
+from yatry.utils.data.map import BHOPAL
+from yatry.utils.helpers.affinity import affinity_matrices
+from yatry.utils.helpers.time import time_affinity_score, time_affinity_scores
+from yatry.utils.models.fare import FareTable
+from yatry.utils.optim.assign import (
+    SolverConfig,
+    SparseVehicleAssignmentModel,
+    VehicleAssignmentModel,
+)
+from yatry.utils.optim.clustering import affinity_propagation_ride_sharing
+from yatry.utils.optim.fare import passenger_solo_fares, settle_fares
+
+console = Console()
+
+# Timings of the fast paths of the last accepted run on this machine
+PERF_BASELINE_PATH = ".perf_baseline.json"
+
+
+@dataclass
+class PerfCase:
+    """
+    An accelerated function paired with the implementation it replaces.
+
+    Attributes:
+        name (str): The name of the case in reports and the baseline.
+        setup (Callable[[int], tuple]): Builds the arguments of both
+            implementations from a seed.
+        reference (Callable): The reference implementation.
+        fast (Callable): The accelerated implementation.
+        compare (Callable[[object, object], bool] | None): Whether the outputs
+            of the reference and the fast implementation agree. Defaults to
+            `np.allclose` with `rtol` and `atol`.
+        rtol (float): Relative tolerance of the default comparison.
+        atol (float): Absolute tolerance of the default comparison.
+    """
+
+    name: str
+    setup: Callable[[int], tuple]
+    reference: Callable
+    fast: Callable
+    compare: Callable[[object, object], bool] | None = None
+    rtol: float = 1e-9
+    atol: float = 1e-12
+
+    def equivalent(self, expected, actual) -> bool:
+        if self.compare is not None:
+            return bool(self.compare(expected, actual))
+        return bool(np.allclose(expected, actual, rtol=self.rtol, atol=self.atol))
+
+
+@dataclass
+class PerfResult:
+    """
+    The outcome of one `PerfCase`.
+
+    Attributes:
+        name (str): The name of the case.
+        reference_time (float): Best wall time of the reference, in seconds.
+        fast_time (float): Best wall time of the fast path, in seconds.
+        equivalent (bool): Whether both produced the same result.
+        baseline_time (float | None): The fast time stored in the baseline.
+        regressed (bool): Whether the fast time exceeds the baseline by more
+            than the threshold.
+    """
+
+    name: str
+    reference_time: float
+    fast_time: float
+    equivalent: bool
+    baseline_time: float | None = None
+    regressed: bool = False
+
+    @property
+    def speedup(self) -> float:
+        return self.reference_time / max(self.fast_time, 1e-12)
+
+
+def _random_passengers(seed: int, n_passengers: int) -> list:
+    random.seed(seed)
+    start = datetime(2025, 4, 23, 8)
+    return create_random_passengers(
+        n_passengers=n_passengers, time_range=(start, start + timedelta(hours=1))
+    )
+
+
+def _time_affinity_args(seed: int) -> tuple:
+    windows = np.array(
+        [p.get_dep_time_range_num() for p in _random_passengers(seed, 60)]
+    )
+    return windows[:, 0], windows[:, 1]
+
+
+def _time_affinity_reference(t_min: np.ndarray, t_max: np.ndarray) -> np.ndarray:
+    return np.array(
+        [
+            [
+                time_affinity_score(
+                    t1_min=t_min[i], t2_min=t_min[j], t1_max=t_max[i], t2_max=t_max[j]
+                )
+                for j in range(len(t_min))
+            ]
+            for i in range(len(t_min))
+        ]
+    )
+
+
+def _time_affinity_fast(t_min: np.ndarray, t_max: np.ndarray) -> np.ndarray:
+    return time_affinity_scores(
+        t1_min=t_min[:, None], t2_min=t_min[None, :],
+        t1_max=t_max[:, None], t2_max=t_max[None, :],
+    )
+
+
+def _route_affinity_fast(passengers: list) -> np.ndarray:
+    _, rho, _ = affinity_matrices(passengers=passengers, map_=BHOPAL)
+    return rho
+
+
+def _route_fares_reference(passengers: list) -> np.ndarray:
+    return np.array(
+        [
+            BHOPAL.get_fare_on_route(
+                route=BHOPAL._find_route(loc_start=p.source, loc_end=p.destination)
+            )
+            for p in passengers
+        ]
+    )
+
+
+def _route_fares_fast(passengers: list) -> np.ndarray:
+    return FareTable(map_=BHOPAL).passenger_fares(passengers=passengers)
+
+
+def _ap_args(seed: int) -> tuple:
+    passengers = _random_passengers(seed, 40)
+    _, _, affinity_matrix = affinity_matrices(passengers=passengers, map_=BHOPAL)
+    return (affinity_matrix,)
+
+
+def _ap_reference(
+    affinity_matrix: np.ndarray,
+    max_iterations: int = 30,
+    damping_factor: float = 0.9,
+    convergence_threshold: float = 1e-6,
+) -> tuple:
+    # The element-wise message updates that affinity_propagation_ride_sharing
+    # replaced with whole-matrix ones
+    n = affinity_matrix.shape[0]
+    S = affinity_matrix
+    R = np.zeros((n, n))
+    A = np.zeros((n, n))
+    for _ in range(max_iterations):
+        old_R = R.copy()
+        old_A = A.copy()
+        for i in range(n):
+            for k in range(n):
+                AS = A[i, :] + S[i, :]
+                AS[k] = -np.inf
+                r_new = S[i, k] - np.max(AS)
+                R[i, k] = (1 - damping_factor) * r_new + damping_factor * R[i, k]
+        for i in range(n):
+            for k in range(n):
+                positive_r = np.maximum(0, R[:, k])
+                positive_r[k] = 0
+                if i != k:
+                    positive_r[i] = 0
+                    a_new = min(0, R[k, k] + np.sum(positive_r))
+                else:
+                    a_new = np.sum(positive_r)
+                A[i, k] = (1 - damping_factor) * a_new + damping_factor * A[i, k]
+        if (
+            np.sum(np.abs(R - old_R)) + np.sum(np.abs(A - old_A))
+        ) < convergence_threshold:
+            break
+
+    decision_matrix = A + R
+    representatives = [int(idx) for idx in np.where(np.diag(decision_matrix) > 0)[0]]
+    if not representatives:
+        representatives = [int(np.argmax(np.diag(decision_matrix)))]
+    groups: dict[int, list[int]] = {rep: [] for rep in representatives}
+    for passenger in range(n):
+        if passenger in representatives:
+            groups[passenger].append(passenger)
+        else:
+            best = max(representatives, key=lambda rep: decision_matrix[passenger, rep])
+            groups[best].append(passenger)
+    return groups, representatives
+
+
+def _ap_fast(affinity_matrix: np.ndarray) -> tuple:
+    return affinity_propagation_ride_sharing(
+        affinity_matrix=affinity_matrix, max_iterations=30
+    )
+
+
+def _assignment_args(seed: int, max_count: int = 3) -> tuple:
+    rng = np.random.default_rng(seed)
+    n_stops = 5
+    groups = []
+    for g in range(4):
+        pickup = int(rng.integers(1, n_stops))
+        drop = int(rng.integers(pickup + 1, n_stops + 1))
+        count = int(rng.integers(1, max_count + 1))
+        groups.append({"id": f"G{g}", "pickup": pickup, "drop": drop, "count": count})
+    segment_costs = [float(c) for c in rng.choice([50, 100, 150], size=n_stops - 1)]
+    return groups, segment_costs
+
+
+def _assignment_objective(model_cls: type, bound_shortcut: bool) -> Callable:
+    def solve(groups: list[dict], segment_costs: list[float]) -> float:
+        model = model_cls(groups=groups, segment_costs=segment_costs, capacity=5)
+        model.solve(config=SolverConfig(bound_shortcut=bound_shortcut))
+        return model.Z_val
+
+    return solve
+
+
+def _settlement_args(seed: int) -> tuple:
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, 200, size=1000)
+    return labels, rng.choice([50.0, 100.0, 150.0], size=1000)
+
+
+def _settlement_reference(labels: np.ndarray, solo_fares: np.ndarray) -> float:
+    saving = 0.0
+    for label in np.unique(labels):
+        fares = solo_fares[labels == label]
+        saving += float(fares.sum() - fares.max())
+    return saving
+
+
+def _settlement_fast(labels: np.ndarray, solo_fares: np.ndarray) -> float:
+    return settle_fares(labels=labels, solo_fares=solo_fares).total_saving
+
+
+PERF_CASES: list[PerfCase] = [
+    PerfCase(
+        name="helpers.time.time_affinity_scores",
+        setup=_time_affinity_args,
+        reference=_time_affinity_reference,
+        fast=_time_affinity_fast,
+    ),
+    PerfCase(
+        name="helpers.affinity.route_affinity",
+        setup=lambda seed: (_random_passengers(seed, 60),),
+        reference=lambda passengers: BHOPAL.get_passenger_route_affinity_matrix(
+            passengers=passengers
+        ),
+        fast=_route_affinity_fast,
+    ),
+    PerfCase(
+        name="models.fare.route_fares",
+        setup=lambda seed: (_random_passengers(seed, 500),),
+        reference=_route_fares_reference,
+        fast=_route_fares_fast,
+    ),
+    PerfCase(
+        name="optim.fare.passenger_solo_fares",
+        setup=lambda seed: (_random_passengers(seed, 500),),
+        reference=_route_fares_reference,
+        fast=lambda passengers: passenger_solo_fares(passengers=passengers, map_=BHOPAL),
+    ),
+    PerfCase(
+        name="optim.fare.settle_fares",
+        setup=_settlement_args,
+        reference=_settlement_reference,
+        fast=_settlement_fast,
+    ),
+    PerfCase(
+        name="optim.clustering.affinity_propagation_ride_sharing",
+        setup=_ap_args,
+        reference=_ap_reference,
+        fast=_ap_fast,
+        compare=lambda expected, actual: expected == actual,
+    ),
+    PerfCase(
+        name="optim.assign.SparseVehicleAssignmentModel",
+        setup=_assignment_args,
+        reference=_assignment_objective(VehicleAssignmentModel, bound_shortcut=False),
+        fast=_assignment_objective(SparseVehicleAssignmentModel, bound_shortcut=False),
+        rtol=1e-6,
+        atol=1e-6,
+    ),
+    PerfCase(
+        name="optim.assign.bound_shortcut",
+        # Single passengers never overload a segment, so the shortcut applies
+        setup=lambda seed: _assignment_args(seed, max_count=1),
+        reference=_assignment_objective(
+            SparseVehicleAssignmentModel, bound_shortcut=False
+        ),
+        fast=_assignment_objective(SparseVehicleAssignmentModel, bound_shortcut=True),
+        rtol=1e-6,
+        atol=1e-6,
+    ),
+]
+
+
+def _best_time(function: Callable, args: tuple, repeat: int) -> tuple[float, object]:
+    best, output = np.inf, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, output
+
+
+def run_perf(
+    cases: list[PerfCase] = PERF_CASES, seed: int = 42, repeat: int = 3
+) -> list[PerfResult]:
+    """
+    Runs every case on its seeded inputs and checks that the fast path agrees
+    with the reference.
+
+    Args:
+        cases (list[PerfCase]): The cases to run.
+        seed (int): Seed of the inputs.
+        repeat (int): Number of runs of each implementation, of which the
+            fastest is kept.
+
+    Returns:
+        list[PerfResult]: The timings and equivalence of every case.
+    """
+    results = []
+    for case in cases:
+        args = case.setup(seed)
+        reference_time, expected = _best_time(case.reference, args, repeat)
+        fast_time, actual = _best_time(case.fast, args, repeat)
+        results.append(
+            PerfResult(
+                name=case.name,
+                reference_time=reference_time,
+                fast_time=fast_time,
+                equivalent=case.equivalent(expected, actual),
+            )
+        )
+    return results
+
+
+def load_baseline(path: str = PERF_BASELINE_PATH) -> dict[str, float]:
+    """
+    Reads the fast-path timings of a baseline file, or none if it is missing.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)["timings"]
+
+
+def save_baseline(results: list[PerfResult], path: str = PERF_BASELINE_PATH) -> None:
+    """
+    Stores the fast-path timings of `results` as the baseline.
+    """
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "machine": platform.node(),
+                "python": platform.python_version(),
+                "recorded": datetime.now().isoformat(timespec="seconds"),
+                "timings": {result.name: result.fast_time for result in results},
+            },
+            f,
+            indent=2,
+        )
+
+
+def flag_regressions(
+    results: list[PerfResult], baseline: dict[str, float], threshold: float = 0.25
+) -> list[PerfResult]:
+    """
+    Marks the results whose fast path got slower than the baseline by more
+    than `threshold`.
+
+    Args:
+        results (list[PerfResult]): The results of `run_perf`.
+        baseline (dict[str, float]): The timings of `load_baseline`.
+        threshold (float): The tolerated relative slowdown.
+
+    Returns:
+        list[PerfResult]: The regressed results.
+    """
+    for result in results:
+        result.baseline_time = baseline.get(result.name)
+        result.regressed = result.baseline_time is not None and (
+            result.fast_time > result.baseline_time * (1 + threshold)
+        )
+    return [result for result in results if result.regressed]
+
+
+def print_perf(results: list[PerfResult]) -> None:
+    table = Table(title="Fast Paths vs References")
+    table.add_column("Case", style="cyan")
+    table.add_column("Reference (ms)", style="yellow")
+    table.add_column("Fast (ms)", style="yellow")
+    table.add_column("Speedup", style="green")
+    table.add_column("Baseline (ms)", style="magenta")
+    table.add_column("Status")
+    for result in results:
+        if not result.equivalent:
+            status = "[bold red]MISMATCH[/bold red]"
+        elif result.regressed:
+            status = "[bold red]REGRESSED[/bold red]"
+        else:
+            status = "[bold green]ok[/bold green]"
+        table.add_row(
+            result.name,
+            f"{1000 * result.reference_time:.2f}",
+            f"{1000 * result.fast_time:.2f}",
+            f"{result.speedup:.1f}x",
+            "-" if result.baseline_time is None else f"{1000 * result.baseline_time:.2f}",
+            status,
+        )
+    console.print(table)
+
+
+def main(
+    baseline_path: str = PERF_BASELINE_PATH,
+    update: bool = False,
+    threshold: float = 0.25,
+    seed: int = 42,
+    repeat: int = 3,
+) -> bool:
+    """
+    Runs the harness, flags regressions against the baseline and stores the
+    timings as the new baseline if asked to or if there is none yet.
+
+    Returns:
+        bool: Whether every case is equivalent and none regressed.
+    """
+    with console.status(f"Running {len(PERF_CASES)} cases..."):
+        results = run_perf(seed=seed, repeat=repeat)
+    baseline = load_baseline(path=baseline_path)
+    regressions = flag_regressions(
+        results=results, baseline=baseline, threshold=threshold
+    )
+    print_perf(results=results)
+
+    passed = all(result.equivalent for result in results) and not regressions
+    if update or (passed and not baseline):
+        save_baseline(results=results, path=baseline_path)
+        console.print(f"[bold green]✓[/bold green] Saved baseline to {baseline_path}")
+    return passed
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if main() else 1)
@@ -12,10 +12,9 @@ from yatry.utils.optim.clustering import affinity_propagation_ride_sharing
 from yatry.utils.optim.assign import VehicleAssignmentModel
 from yatry.utils.optim.time import optimize_passengers_dep_time
 from pprint import pprint
-from matplotlib import pyplot as plt
-import seaborn as sns
 from sklearn.cluster import AffinityPropagation
 from collections import defaultdict
+from yatry.utils.helpers.visualize import PLOT_AFFINITY, plot_affinity
 
 
 def main():
@@ -54,8 +53,6 @@ def main():
     affinity_matrix: npt.NDArray[np.float64] = rho * tau
     print(affinity_matrix)
     # Cluster the passengers according to affinty
-    sns.heatmap(affinity_matrix)
-    plt.savefig("fig.png")
     # cluster_passenger_inxs, _ = affinity_propagation_ride_sharing(
     #     affinity_matrix=1 - affinity_matrix, convergence_threshold=1e-12
     # )
@@ -73,6 +70,10 @@ def main():
     scaled_affinity = (affinity_matrix - min_val) / (max_val - min_val + 1e-10)
     cluster_passenger_inxs: np.ndarray = ap.fit_predict(X=scaled_affinity)
     print(cluster_passenger_inxs)
+    if PLOT_AFFINITY:
+        plot_affinity(
+            affinity=affinity_matrix, labels=cluster_passenger_inxs, path="fig.png"
+        )
 
     grouped_indices = defaultdict(list)
 
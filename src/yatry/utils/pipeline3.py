@@ -5,22 +5,31 @@ from yatry.utils.models import Passenger
 from yatry.utils.models.map import Map
 from yatry.utils.data.map import BHOPAL
 from yatry.utils.data.io import create_random_passengers
-from numpy import typing as npt
 from datetime import datetime, timedelta
-from yatry.utils.helpers.time import time_affinity_score
-from yatry.utils.optim.clustering import affinity_propagation_ride_sharing
+from yatry.utils.helpers.affinity import affinity_matrices
+from yatry.utils.helpers.visualize import PLOT_AFFINITY, plot_affinity
+from yatry.utils.optim.clustering import (
+    affinity_propagation_ride_sharing,
+    cluster_labels,
+)
 from yatry.utils.optim.assign import VehicleAssignmentModel
-from yatry.utils.optim.time import optimize_passengers_dep_time
+from yatry.utils.optim.dispatch import dispatch_groups
+from yatry.utils.optim.group import GroupExecutor
+from yatry.utils.optim.fare import passenger_solo_fares, settle_fares
+from yatry.utils.report import (
+    OutputMode,
+    assignments_frame,
+    auto_panel,
+    export_assignments,
+    fleet_table,
+)
 from matplotlib import pyplot as plt
-import seaborn as sns
-from sklearn.cluster import AffinityPropagation
 from collections import defaultdict
 
 # Rich library imports
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
-from rich.layout import Layout
 from rich.text import Text
 from rich.padding import Padding
 from rich.columns import Columns
@@ -29,6 +38,29 @@ from rich import box
 # Initialize Rich console
 console = Console()
 
+# Clustering backend: "ap" for Affinity Propagation or "louvain" for Louvain
+# community detection
+CLUSTERING_BACKEND: str = "ap"
+# Split and merge clusters into groups that fit in a single auto, e.g. 5;
+# `None` keeps the clusters of the backend as they are
+AUTO_CAPACITY: int | None = None
+
+# Number of autos available to serve the groups, which start and end their
+# trips at the root of the map; `None` skips the dispatch
+FLEET_SIZE: int | None = 50
+
+# Seconds to wait for the post-processing of each auto group
+GROUP_TIMEOUT: float = 30.0
+
+# How to report the autos, see `OutputMode`; large runs should use "summary"
+# or "export" to skip rendering a panel per auto
+OUTPUT_MODE: OutputMode = OutputMode.FULL
+EXPORT_PATH: str = "assignments.csv"
+
+# Directory to keep memory-mapped affinity matrices in for reuse by later runs
+# on the same passengers; `None` computes them in memory every time
+AFFINITY_CACHE_DIR: str | None = None
+
 
 def main():
     # Create a header panel
@@ -51,6 +83,10 @@ def main():
     setup_table.add_row("City Map", "BHOPAL")
     setup_table.add_row("Affinity Propagation Damping", "0.7")
     setup_table.add_row("Affinity Percentile", "50%")
+    setup_table.add_row("Clustering Backend", CLUSTERING_BACKEND)
+    setup_table.add_row("Auto Capacity", str(AUTO_CAPACITY))
+    setup_table.add_row("Fleet Size", str(FLEET_SIZE))
+    setup_table.add_row("Output Mode", OUTPUT_MODE.value)
     console.print(setup_table)
 
     # Set up the passenger range
@@ -98,61 +134,38 @@ def main():
 
         # Calculate affinity matrices with status indicators
         with console.status(
-            "[bold yellow]Calculating time affinity matrix...", spinner="point"
+            "[bold yellow]Calculating affinity matrices...", spinner="point"
         ):
-            tau: npt.NDArray[np.float64] = np.zeros(shape=(N_PASSENGERS, N_PASSENGERS))
-            for i, p_i in enumerate(passengers):
-                for j, p_j in enumerate(passengers):
-                    t1_min, t1_max = p_i.get_dep_time_range_num()
-                    t2_min, t2_max = p_j.get_dep_time_range_num()
-                    tau[i, j] = time_affinity_score(
-                        t1_min=t1_min, t1_max=t1_max, t2_min=t2_min, t2_max=t2_max
-                    )
-
-        with console.status(
-            "[bold yellow]Calculating route affinity matrix...", spinner="dots"
-        ):
-            rho: npt.NDArray[np.float64] = BHOPAL.get_passenger_route_affinity_matrix(
-                passengers=passengers
+            tau, rho, affinity_matrix = affinity_matrices(
+                passengers=passengers, map_=BHOPAL, cache_dir=AFFINITY_CACHE_DIR
             )
 
         console.print(
             "[bold green]✓[/bold green] Affinity matrices calculated successfully"
         )
 
-        # Create the affinity matrix
-        affinity_matrix: npt.NDArray[np.float64] = rho * tau
-
-        # Visualize affinity matrix
-        with console.status(
-            "[bold magenta]Generating affinity matrix visualization...",
-            spinner="earth",
-        ):
-            plt.figure(figsize=(10, 8))
-            sns.heatmap(affinity_matrix, cbar_kws={"label": "Affinity Score"})
-            plt.title("Combined Route-Time Affinity Matrix")
-            plt.xlabel("Passenger Index")
-            plt.ylabel("Passenger Index")
-            plt.tight_layout()
-            plt.savefig("fig.pdf")
-            plt.close()
-            console.print("[bold green]✓[/bold green] Heatmap saved to fig.pdf")
-
         # Run clustering algorithm with progress indication
         with console.status(
             "[bold cyan]Running clustering algorithm...", spinner="monkey"
         ):
-            preference_val = np.percentile(affinity_matrix, 50)
-            ap = AffinityPropagation(
-                affinity="precomputed",
-                damping=0.7,
-                max_iter=500,
-                preference=preference_val,
+            cluster_passenger_inxs: np.ndarray = cluster_labels(
+                affinity_matrix=affinity_matrix,
+                backend=CLUSTERING_BACKEND,
+                capacity=AUTO_CAPACITY,
             )
-            min_val = np.min(affinity_matrix)
-            max_val = np.max(affinity_matrix)
-            scaled_affinity = (affinity_matrix - min_val) / (max_val - min_val + 1e-10)
-            cluster_passenger_inxs: np.ndarray = ap.fit_predict(X=scaled_affinity)
+
+        # Visualize affinity matrix
+        if PLOT_AFFINITY:
+            with console.status(
+                "[bold magenta]Generating affinity matrix visualization...",
+                spinner="earth",
+            ):
+                plot_affinity(
+                    affinity=affinity_matrix,
+                    labels=cluster_passenger_inxs,
+                    path="fig.png",
+                )
+            console.print("[bold green]✓[/bold green] Heatmap saved to fig.png")
 
         grouped_indices = defaultdict(list)
         for idx, val in enumerate(cluster_passenger_inxs):
@@ -178,111 +191,79 @@ def main():
         )
         console.print(cluster_table)
 
+        # Settle the fares of all groups at once
+        settlement = settle_fares(
+            labels=cluster_passenger_inxs,
+            solo_fares=passenger_solo_fares(passengers=passengers, map_=BHOPAL),
+        )
+
         # Process each group with detailed stats
-        total_total_saving = 0
+        total_total_saving = settlement.total_saving
+        sorted_groups = sorted(groups.items())
 
         with console.status(
-            "[bold green]Processing auto groups...", spinner="arrow"
-        ) as status:
-            for auto_number, (val, idxs) in enumerate(sorted(groups.items()), start=1):
-                status.update(
-                    f"[bold green]Processing Auto #{auto_number}/{len(groups)}..."
-                )
-
-                group = [passengers[idx] for idx in idxs]
-                total_fare = 0
-                sum_fare = 0
-                total_saving = 0
-
-                # Calculate original fares
-                for passenger_ in group:
-                    original_fare = BHOPAL.get_fare_on_route(
-                        BHOPAL._find_route(passenger_.source, passenger_.destination)
-                    )
-                    if original_fare > total_fare:
-                        total_fare = original_fare
-                    sum_fare += original_fare
-
-                # Optimize departure time
-                try:
-                    status.update(
-                        f"[bold yellow]Optimizing departure time for Auto #{auto_number}/{len(groups)}..."
-                    )
-                    dep_time: float = optimize_passengers_dep_time(passengers=group)
-                except Exception as e:
-                    console.print(
-                        f"[bold red]Warning: Optimization failed for group #{auto_number}: {e}[/bold red]"
-                    )
-                    # Fallback: Use average of min departure times
-                    dep_time = float(
-                        np.mean([p.get_dep_time_range_num()[0] for p in group])
-                    )
-
-                # Create a table for the auto details
-                auto_table = Table(box=box.SIMPLE)
-                auto_table.add_column("Detail", style="cyan")
-                auto_table.add_column("Value", style="yellow")
-                auto_table.add_row(
-                    "Optimized Departure Time",
-                    f"[bold green]{datetime.fromtimestamp(dep_time).strftime('%H:%M %d %b %Y')}[/bold green]",
-                )
-                auto_table.add_row("Total Passengers", str(len(group)))
-                auto_table.add_row("Total Fare", f"₹{total_fare:.2f}")
-
-                # Create a passenger table for this auto
-                passenger_table = Table(box=box.SIMPLE)
-                passenger_table.add_column("Passenger", style="blue")
-                passenger_table.add_column("Route", style="cyan")
-                passenger_table.add_column("Original Fare", style="yellow")
-                passenger_table.add_column("New Fare", style="green")
-                passenger_table.add_column("Savings", style="dim magenta")
-                passenger_table.add_column("Savings (%)", style="magenta")
-
-                # Calculate new fare for each passenger
-                for passenger_ in group:
-                    original_fare = BHOPAL.get_fare_on_route(
-                        route=BHOPAL._find_route(
-                            passenger_.source, passenger_.destination
-                        )
-                    )
-
-                    new_fare = original_fare * total_fare / sum_fare
-                    saving_amount = original_fare - new_fare
-                    total_saving += saving_amount
-
-                    passenger_table.add_row(
-                        passenger_.name,
-                        f"{passenger_.source.value} → {passenger_.destination.value}",
-                        f"₹{original_fare:.2f}",
-                        f"₹{new_fare:.2f}",
-                        f"[bold]₹{saving_amount:.2f}[/bold]",
-                        f"[bold]{100 * saving_amount / original_fare:.2f}[/bold]",
-                    )
-
-                auto_table.add_row(
-                    "Total Savings",
-                    f"[bold magenta]₹{total_saving:.2f}[/bold magenta]",
-                )
-
-                # Create a layout for this auto details
-                auto_layout = Layout()
-                auto_layout.split(
-                    Layout(auto_table, name="details"),
-                    Layout(passenger_table, name="passengers"),
-                )
+            f"[bold yellow]Optimizing {len(sorted_groups)} auto groups in parallel...",
+            spinner="arrow",
+        ):
+            group_results = GroupExecutor(timeout=GROUP_TIMEOUT, settle=False).run(
+                groups=[[passengers[idx] for idx in idxs] for _, idxs in sorted_groups]
+            )
 
-                status.stop()
+        for auto_number, result in enumerate(group_results, start=1):
+            if result.status != "ok":
                 console.print(
-                    Panel(
-                        auto_layout,
-                        title=f"[bold blue]Auto #{auto_number}[/bold blue]",
-                        border_style="blue",
-                        subtitle=f"[italic]Group ID: {val}[/italic]",
-                    )
+                    f"[bold red]Warning: Optimization failed for group #{auto_number}: {result.error}[/bold red]"
                 )
-                status.start()
 
-                total_total_saving += total_saving
+        # Schedule the autos on the fleet
+        fleet_summary = ""
+        if FLEET_SIZE is not None:
+            with console.status(
+                f"[bold cyan]Dispatching autos on a fleet of {FLEET_SIZE}...",
+                spinner="dots",
+            ):
+                dispatch = dispatch_groups(groups=group_results, n_vehicles=FLEET_SIZE)
+            console.print(fleet_table(dispatch=dispatch))
+            utilization = 100 * dispatch.utilization
+            fleet_summary = (
+                f"\nFleet Utilization: [yellow]{utilization:.1f}%[/yellow]"
+                f"\nUnserved Auto Groups: [yellow]{len(dispatch.unserved)}[/yellow]"
+            )
+
+        # Report the autos
+        panels = (
+            auto_panel(
+                auto_number=auto_number,
+                group_id=val,
+                idxs=idxs,
+                passengers=passengers,
+                dep_time=result.dep_time,
+                settlement=settlement,
+            )
+            for auto_number, ((val, idxs), result) in enumerate(
+                zip(sorted_groups, group_results), start=1
+            )
+        )
+        if OUTPUT_MODE == OutputMode.FULL:
+            for panel in panels:
+                console.print(panel)
+        elif OUTPUT_MODE == OutputMode.PAGED:
+            with console.pager(styles=True):
+                for panel in panels:
+                    console.print(panel)
+        elif OUTPUT_MODE == OutputMode.EXPORT:
+            dep_times = np.empty(N_PASSENGERS, dtype=np.float64)
+            for (_, idxs), result in zip(sorted_groups, group_results):
+                dep_times[idxs] = result.dep_time
+            export_assignments(
+                frame=assignments_frame(
+                    passengers=passengers, settlement=settlement, dep_times=dep_times
+                ),
+                path=EXPORT_PATH,
+            )
+            console.print(
+                f"[bold green]✓[/bold green] Assignments exported to {EXPORT_PATH}"
+            )
 
         # Summary statistics
         summary_panel = Panel(
@@ -293,7 +274,7 @@ def main():
 Number of Passengers: [yellow]{N_PASSENGERS}[/yellow]
 Number of Auto Groups: [yellow]{len(groups)}[/yellow]
 Total Savings: [bold green]₹{total_total_saving:.2f}[/bold green]
-Average Saving per Passenger: [bold green]₹{total_total_saving / N_PASSENGERS:.2f}[/bold green]
+Average Saving per Passenger: [bold green]₹{total_total_saving / N_PASSENGERS:.2f}[/bold green]{fleet_summary}
                 """,
                     justify="center",
                 ),
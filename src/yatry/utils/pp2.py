@@ -11,11 +11,12 @@ from yatry.utils.helpers.time import time_affinity_score
 from yatry.utils.optim.clustering import affinity_propagation_ride_sharing
 from yatry.utils.optim.assign import VehicleAssignmentModel
 from yatry.utils.optim.time import optimize_passengers_dep_time
+from yatry.utils.optim.fare import passenger_solo_fares, settle_fares
 from pprint import pprint
 from matplotlib import pyplot as plt
-import seaborn as sns
 from sklearn.cluster import AffinityPropagation
 from collections import defaultdict
+from yatry.utils.helpers.visualize import PLOT_AFFINITY, plot_affinity
 
 
 def main():
@@ -58,15 +59,6 @@ def main():
         # Create the affinity matrix
         affinity_matrix: npt.NDArray[np.float64] = rho * tau
         # print(affinity_matrix)
-        plt.figure(figsize=(10, 8))
-        sns.heatmap(affinity_matrix, cbar_kws={"label": "Affinity Score"})
-        plt.title("Combined Route-Time Affinity Matrix")
-        plt.xlabel("Passenger Index")
-        plt.ylabel("Passenger Index")
-        plt.tight_layout()
-        plt.savefig("fig.pdf")
-        plt.close()
-
         preference_val = np.percentile(affinity_matrix, 50)
         ap = AffinityPropagation(
             affinity="precomputed",
@@ -79,6 +71,10 @@ def main():
         scaled_affinity = (affinity_matrix - min_val) / (max_val - min_val + 1e-10)
         cluster_passenger_inxs: np.ndarray = ap.fit_predict(X=scaled_affinity)
         # print(cluster_passenger_inxs)
+        if PLOT_AFFINITY:
+            plot_affinity(
+                affinity=affinity_matrix, labels=cluster_passenger_inxs, path="fig.png"
+            )
 
         grouped_indices = defaultdict(list)
 
@@ -87,19 +83,14 @@ def main():
 
         # Filter only those values that have more than one index (i.e., grouped)
         groups = {val: idxs for val, idxs in grouped_indices.items() if len(idxs) > 0}
-        total_total_saving = 0
+        settlement = settle_fares(
+            labels=cluster_passenger_inxs,
+            solo_fares=passenger_solo_fares(passengers=passengers, map_=BHOPAL),
+        )
+        total_total_saving = settlement.total_saving
         for auto_number, (val, idxs) in enumerate(sorted(groups.items()), start=1):
             group = [passengers[idx] for idx in idxs]
-            total_fare = 0
-            sum_fare = 0
-            total_saving = 0
-            for passenger_ in group:
-                original_fare = BHOPAL.get_fare_on_route(
-                    BHOPAL._find_route(passenger_.source, passenger_.destination)
-                )
-                if original_fare > total_fare:
-                    total_fare = original_fare
-                sum_fare += original_fare
+            total_fare = settlement.group_max_fares[settlement.group_index(val)]
 
             # dep_time: float = optimize_passengers_dep_time(passengers=group)
             try:
@@ -111,8 +102,6 @@ def main():
                     np.mean([p.get_dep_time_range_num()[0] for p in group])
                 )
 
-            # Calculate total fare for the group
-
             print(
                 f"\n============================================= Auto #{auto_number} =============================================="
             )
@@ -121,19 +110,15 @@ def main():
             )
             print(f"Total Passengers: {len(group)}; Total fare : {total_fare}")
 
-            # Calculate new fare for each passenger
-            for passenger_ in group:
-                original_fare = BHOPAL.get_fare_on_route(
-                    BHOPAL._find_route(passenger_.source, passenger_.destination)
-                )
-
-                new_fare = original_fare * total_fare / sum_fare
+            # Show the new fare of each passenger
+            for idx in idxs:
+                passenger_ = passengers[idx]
                 print(
-                    f"{passenger_.name} | From: {passenger_.source.value} → To: {passenger_.destination.value} | New Fare: ₹{new_fare:.2f} | Saved : ₹{(original_fare - new_fare):.2f}"
+                    f"{passenger_.name} | From: {passenger_.source.value} → To: {passenger_.destination.value} | New Fare: ₹{settlement.new_fares[idx]:.2f} | Saved : ₹{settlement.savings[idx]:.2f}"
                 )
-                total_saving += original_fare - new_fare
-            total_total_saving += total_saving
-            print(f"Total Saving for this group : ₹{total_saving}")
+            print(
+                f"Total Saving for this group : ₹{settlement.group_savings[auto_number - 1]}"
+            )
         print("=" * 150)
         print(f"Total Saving: ₹{total_total_saving}")
         saving_pp = total_total_saving / N_PASSENGERS
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from yatry.utils.data.io import (
+    create_random_passengers,
+    passenger_from_dict,
+    passenger_to_dict,
+    snap_request_locations,
+)
+from yatry.utils.models import Passenger
+from yatry.utils.service import BatchStats, MatchingService
+
+
+@dataclass
+class ReplayReport:
+    """
+    Latency and throughput of a replayed request log.
+
+    Attributes:
+        n_requests (int): Number of replayed requests.
+        n_failed (int): Number of requests that were not assigned.
+        speed (float): The replay speed relative to the recorded arrivals.
+        wall_time (float): Seconds from the first submission to the last answer.
+        latencies (np.ndarray): Decision latency of every request, in seconds.
+        batches (list[BatchStats]): Statistics of every matched batch.
+    """
+
+    n_requests: int
+    n_failed: int
+    speed: float
+    wall_time: float
+    latencies: np.ndarray
+    batches: list[BatchStats]
+
+    @property
+    def throughput(self) -> float:
+        return self.n_requests / self.wall_time if self.wall_time > 0 else 0.0
+
+    def latency_percentiles(
+        self, percentiles: tuple[float, ...] = (50, 90, 99)
+    ) -> dict[float, float]:
+        if not len(self.latencies):
+            return {p: float("nan") for p in percentiles}
+        return {
+            p: float(v) for p, v in zip(percentiles, np.percentile(self.latencies, percentiles))
+        }
+
+    def summary(self) -> dict:
+        """
+        Returns the report as a JSON-compatible dictionary.
+        """
+        sizes = [batch.size for batch in self.batches]
+        return {
+            "n_requests": self.n_requests,
+            "n_failed": self.n_failed,
+            "speed": self.speed,
+            "wall_time": self.wall_time,
+            "throughput": self.throughput,
+            "latency": {
+                f"p{p:g}": v for p, v in self.latency_percentiles().items()
+            }
+            | {"max": float(self.latencies.max()) if len(self.latencies) else None},
+            "n_batches": len(self.batches),
+            "mean_batch_size": float(np.mean(sizes)) if sizes else 0.0,
+            "max_batch_size": max(sizes, default=0),
+        }
+
+
+def load_request_log(
+    path: str,
+) -> tuple[list[tuple[datetime, Passenger]], list[tuple[dict, str]]]:
+    """
+    Reads a log of timestamped ride requests.
+
+    Every line is a ride request in the format of `passenger_to_dict` with an
+    extra ISO formatted `timestamp` of its arrival. Requests without a
+    `timestamp` are taken to arrive at the start of their departure window.
+    Requests may give raw coordinates instead of locations, which are snapped
+    in bulk with `snap_request_locations`.
+
+    Args:
+        path (str): Path of the JSON lines file.
+
+    Returns:
+        tuple[list[tuple[datetime, Passenger]], list[tuple[dict, str]]]: The
+            arrivals, sorted by time, and the requests rejected by
+            `snap_request_locations` with the reason.
+    """
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    records, rejected = snap_request_locations(records=records)
+    requests = []
+    for record in records:
+        passenger = passenger_from_dict(record)
+        arrival = (
+            datetime.fromisoformat(record["timestamp"])
+            if "timestamp" in record
+            else passenger.dep_time_range[0]
+        )
+        requests.append((arrival, passenger))
+    return sorted(requests, key=lambda request: request[0]), rejected
+
+
+def write_request_log(
+    path: str,
+    n_requests: int,
+    time_range: tuple[datetime, datetime],
+    max_lead: float = 3600.0,
+) -> None:
+    """
+    Writes a synthetic request log of random passengers, each arriving up to
+    `max_lead` seconds before their departure window opens.
+
+    Args:
+        path (str): Path of the JSON lines file to write.
+        n_requests (int): Number of requests.
+        time_range (tuple[datetime, datetime]): The range of departure times.
+        max_lead (float): Maximum seconds between arrival and departure.
+    """
+    passengers = create_random_passengers(n_passengers=n_requests, time_range=time_range)
+    with open(path, "w") as f:
+        for passenger in passengers:
+            lead = timedelta(seconds=random.uniform(0, max_lead))
+            record = passenger_to_dict(passenger) | {
+                "timestamp": (passenger.dep_time_range[0] - lead).isoformat()
+            }
+            f.write(json.dumps(record) + "\n")
+
+
+async def replay(
+    requests: list[tuple[datetime, Passenger]],
+    service: MatchingService,
+    speed: float = 1.0,
+) -> ReplayReport:
+    """
+    Feeds recorded requests to a matching service, preserving their relative
+    arrival times scaled down by `speed`, and measures the time until every
+    request is answered.
+
+    Args:
+        requests (list[tuple[datetime, Passenger]]): Arrivals sorted by time,
+            see `load_request_log`.
+        service (MatchingService): The service to replay against. It must not
+            be running yet.
+        speed (float): Replay speed relative to the recorded arrivals, e.g.
+            `100` replays an hour of requests in 36 seconds.
+
+    Returns:
+        ReplayReport: The latencies, batch statistics and throughput.
+    """
+    if speed <= 0:
+        raise ValueError("speed must be positive")
+
+    loop = asyncio.get_running_loop()
+    runner = asyncio.create_task(service.run())
+    latencies: list[float] = []
+    failed = 0
+
+    async def _timed_submit(passenger: Passenger) -> None:
+        nonlocal failed
+        submitted = time.perf_counter()
+        try:
+            await service.submit(passenger)
+        except Exception:
+            failed += 1
+        else:
+            latencies.append(time.perf_counter() - submitted)
+
+    tasks = []
+    wall_start = time.perf_counter()
+    if requests:
+        first_arrival = requests[0][0]
+        loop_start = loop.time()
+        for arrival, passenger in requests:
+            delay = (arrival - first_arrival).total_seconds() / speed
+            wait = loop_start + delay - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            tasks.append(asyncio.create_task(_timed_submit(passenger)))
+
+    await asyncio.gather(*tasks)
+    wall_time = time.perf_counter() - wall_start
+    await service.close()
+    await runner
+
+    return ReplayReport(
+        n_requests=len(requests),
+        n_failed=failed,
+        speed=speed,
+        wall_time=wall_time,
+        latencies=np.array(latencies, dtype=np.float64),
+        batches=list(service.batches),
+    )
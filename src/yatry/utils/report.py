@@ -0,0 +1,200 @@
+import os
+from datetime import datetime
+from enum import Enum
+
+import numpy as np
+import pandas as pd
+from numpy import typing as npt
+from rich import box
+from rich.layout import Layout
+from rich.panel import Panel
+from rich.table import Table
+
+from yatry.utils.models import Passenger
+from yatry.utils.optim.dispatch import DispatchResult
+from yatry.utils.optim.fare import FareSettlement
+
+
+class OutputMode(str, Enum):
+    """
+    How the pipeline reports the autos.
+
+    - `FULL`: A panel with the details and passengers of every auto.
+    - `SUMMARY`: Only the summary panel.
+    - `PAGED`: The panels of every auto in the console pager.
+    - `EXPORT`: Only the summary panel, plus a bulk export of the per-passenger
+      assignments.
+    """
+
+    FULL = "full"
+    SUMMARY = "summary"
+    PAGED = "paged"
+    EXPORT = "export"
+
+
+def auto_panel(
+    auto_number: int,
+    group_id: int,
+    idxs: list[int],
+    passengers: list[Passenger],
+    dep_time: float,
+    settlement: FareSettlement,
+) -> Panel:
+    """
+    Renders the details and the passengers of one auto.
+
+    Args:
+        auto_number (int): The 1-based number of the auto.
+        group_id (int): The cluster label of the auto.
+        idxs (list[int]): The indices of the passengers in the auto.
+        passengers (list[Passenger]): All passengers.
+        dep_time (float): The optimized departure time as a timestamp.
+        settlement (FareSettlement): The settled fares of all groups.
+
+    Returns:
+        Panel: The panel of the auto.
+    """
+    row = settlement.group_index(group_id)
+    total_fare = settlement.group_max_fares[row]
+    total_saving = settlement.group_savings[row]
+
+    # Create a table for the auto details
+    auto_table = Table(box=box.SIMPLE)
+    auto_table.add_column("Detail", style="cyan")
+    auto_table.add_column("Value", style="yellow")
+    auto_table.add_row(
+        "Optimized Departure Time",
+        f"[bold green]{datetime.fromtimestamp(dep_time).strftime('%H:%M %d %b %Y')}[/bold green]",
+    )
+    auto_table.add_row("Total Passengers", str(len(idxs)))
+    auto_table.add_row("Total Fare", f"₹{total_fare:.2f}")
+    auto_table.add_row(
+        "Total Savings",
+        f"[bold magenta]₹{total_saving:.2f}[/bold magenta]",
+    )
+
+    # Create a passenger table for this auto
+    passenger_table = Table(box=box.SIMPLE)
+    passenger_table.add_column("Passenger", style="blue")
+    passenger_table.add_column("Route", style="cyan")
+    passenger_table.add_column("Original Fare", style="yellow")
+    passenger_table.add_column("New Fare", style="green")
+    passenger_table.add_column("Savings", style="dim magenta")
+    passenger_table.add_column("Savings (%)", style="magenta")
+
+    for idx in idxs:
+        passenger_ = passengers[idx]
+        original_fare = settlement.solo_fares[idx]
+        saving_amount = settlement.savings[idx]
+        passenger_table.add_row(
+            passenger_.name,
+            f"{passenger_.source.value} → {passenger_.destination.value}",
+            f"₹{original_fare:.2f}",
+            f"₹{settlement.new_fares[idx]:.2f}",
+            f"[bold]₹{saving_amount:.2f}[/bold]",
+            f"[bold]{100 * saving_amount / original_fare:.2f}[/bold]",
+        )
+
+    # Create a layout for this auto details
+    auto_layout = Layout()
+    auto_layout.split(
+        Layout(auto_table, name="details"),
+        Layout(passenger_table, name="passengers"),
+    )
+    return Panel(
+        auto_layout,
+        title=f"[bold blue]Auto #{auto_number}[/bold blue]",
+        border_style="blue",
+        subtitle=f"[italic]Group ID: {group_id}[/italic]",
+    )
+
+
+def fleet_table(dispatch: DispatchResult) -> Table:
+    """
+    Renders how a fleet serves the autos, see `dispatch_groups`.
+
+    Args:
+        dispatch (DispatchResult): The schedule of the fleet.
+
+    Returns:
+        Table: The served and unserved autos and the utilization of the fleet.
+    """
+    busy_time = dispatch.busy_time
+    table = Table(title="Fleet Dispatch", box=box.ROUNDED)
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value", style="green")
+    table.add_row("Vehicles", str(dispatch.n_vehicles))
+    table.add_row("Autos Served", str(len(dispatch.dispatches)))
+    table.add_row(
+        "Autos Unserved",
+        f"[bold red]{len(dispatch.unserved)}[/bold red]"
+        if dispatch.unserved
+        else "0",
+    )
+    table.add_row("Utilization", f"{100 * dispatch.utilization:.1f}%")
+    table.add_row("Span", f"{dispatch.span / 60:.1f} minutes")
+    table.add_row(
+        "Busy Time per Vehicle",
+        f"{min(busy_time) / 60:.1f} - {max(busy_time) / 60:.1f} minutes",
+    )
+    if dispatch.unserved:
+        table.add_row(
+            "Unserved Autos",
+            ", ".join(f"#{group_id + 1}" for group_id in dispatch.unserved),
+        )
+    return table
+
+
+def assignments_frame(
+    passengers: list[Passenger],
+    settlement: FareSettlement,
+    dep_times: npt.NDArray[np.float64],
+) -> pd.DataFrame:
+    """
+    Collects the assignment of every passenger into one table.
+
+    Args:
+        passengers (list[Passenger]): All passengers.
+        settlement (FareSettlement): The settled fares of all groups.
+        dep_times (npt.NDArray[np.float64]): The departure time of every
+            passenger's auto as a timestamp.
+
+    Returns:
+        pd.DataFrame: One row per passenger with the route, group, departure
+            time and fares.
+    """
+    return pd.DataFrame(
+        {
+            "name": [p.name for p in passengers],
+            "source": [p.source.name for p in passengers],
+            "destination": [p.destination.name for p in passengers],
+            "group": settlement.labels,
+            "dep_time": pd.to_datetime(dep_times, unit="s", utc=True),
+            "original_fare": settlement.solo_fares,
+            "new_fare": settlement.new_fares,
+            "saving": settlement.savings,
+        }
+    )
+
+
+def export_assignments(frame: pd.DataFrame, path: str) -> None:
+    """
+    Writes the assignments in bulk, in the format given by the extension of
+    `path`: `.csv`, `.jsonl` or `.parquet` (which needs `pyarrow` or
+    `fastparquet`).
+
+    Args:
+        frame (pd.DataFrame): The output of `assignments_frame`.
+        path (str): The file to write.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        frame.to_csv(path, index=False)
+    elif extension == ".jsonl":
+        frame.to_json(path, orient="records", lines=True, date_format="iso")
+    elif extension == ".parquet":
+        frame.to_parquet(path, index=False)
+    else:
+        raise ValueError(
+            f"Cannot export to {path!r}, expected a .csv, .jsonl or .parquet file"
+        )
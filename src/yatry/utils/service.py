@@ -0,0 +1,357 @@
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Callable
+
+from yatry.utils.data.io import passenger_from_dict
+from yatry.utils.matching import match_passengers
+from yatry.utils.models import Passenger
+from yatry.utils.optim.group import GroupResult
+
+
+type Matcher = Callable[[list[Passenger]], list[GroupResult]]
+
+
+@dataclass
+class ServiceConfig:
+    """
+    Configuration of the `MatchingService`.
+
+    Attributes:
+        batch_interval (float): Maximum seconds to wait for more requests after
+            the first request of a batch arrives. Lower values reduce latency,
+            higher values give larger batches and better groups.
+        max_batch_size (int): A batch is dispatched as soon as it has this many
+            requests.
+        max_pending_batches (int): Maximum number of batches being matched at
+            the same time.
+    """
+
+    batch_interval: float = 1.0
+    max_batch_size: int = 64
+    max_pending_batches: int = 1
+
+
+@dataclass
+class BatchStats:
+    """
+    Statistics of one dispatched batch.
+    """
+
+    batch_id: int
+    size: int
+    n_groups: int
+    match_time: float
+
+
+@dataclass
+class _Request:
+    passenger: Passenger
+    future: asyncio.Future
+
+
+def assignment_to_dict(
+    batch_id: int,
+    result: GroupResult,
+    passenger: Passenger,
+    names: dict[str, str] | None = None,
+) -> dict:
+    """
+    Serializes the assignment of a passenger into a JSON-compatible response.
+
+    Args:
+        batch_id (int): The batch the passenger was matched in.
+        result (GroupResult): The group the passenger was assigned to.
+        passenger (Passenger): The passenger.
+        names (dict[str, str] | None): The name to report for every passenger
+            name in `result`, when the passengers were matched under keys
+            other than their names.
+
+    Returns:
+        dict: The response with the auto, departure time, fares and the names
+            of the co-passengers.
+    """
+    names = names or {}
+    fare = next(f for f in result.fares if f.passenger.name == passenger.name)
+    return {
+        "name": names.get(passenger.name, passenger.name),
+        "auto": f"{batch_id}-{result.group_id}",
+        "dep_time": datetime.fromtimestamp(result.dep_time).isoformat(),
+        "original_fare": fare.original_fare,
+        "new_fare": fare.new_fare,
+        "co_passengers": [
+            names.get(p.name, p.name)
+            for p in result.passengers
+            if p.name != passenger.name
+        ],
+        "status": result.status,
+    }
+
+
+class MatchingService:
+    """
+    Accumulates ride requests into micro-batches and matches every batch in an
+    executor, so that the event loop stays responsive while matching.
+
+    A batch is dispatched when it reaches `max_batch_size` requests or when
+    `batch_interval` seconds have passed since its first request.
+
+    Attributes:
+        config (ServiceConfig): The batching configuration.
+        batches (list[BatchStats]): Statistics of every dispatched batch.
+    """
+
+    config: ServiceConfig
+    batches: list[BatchStats]
+    _matcher: Matcher
+    _executor: Executor | None
+    _queue: asyncio.Queue
+    _slots: asyncio.Semaphore
+    _tasks: set[asyncio.Task]
+
+    def __init__(
+        self,
+        config: ServiceConfig | None = None,
+        matcher: Matcher = match_passengers,
+        executor: Executor | None = None,
+    ) -> None:
+        """
+        Initializes the service.
+
+        Args:
+            config (ServiceConfig | None): The batching configuration.
+            matcher (Matcher): The function matching a batch of passengers. It
+                must be picklable when a process pool is used.
+            executor (Executor | None): The executor to match batches in. A
+                process pool with `max_pending_batches` workers is created
+                when `run` starts if not given.
+        """
+        self.config = config or ServiceConfig()
+        self.batches = []
+        self._matcher = matcher
+        self._executor = executor
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.config.max_pending_batches)
+        self._tasks = set()
+
+    async def submit(self, passenger: Passenger) -> dict:
+        """
+        Submits a ride request and waits for its assignment.
+
+        Args:
+            passenger (Passenger): The passenger making the request.
+
+        Returns:
+            dict: The assignment, see `assignment_to_dict`.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_Request(passenger=passenger, future=future))
+        return await future
+
+    async def close(self) -> None:
+        """
+        Stops accepting requests. Requests already submitted are still matched.
+        """
+        await self._queue.put(None)
+
+    async def _collect_batch(self, first: _Request) -> tuple[list[_Request], bool]:
+        loop = asyncio.get_running_loop()
+        batch = [first]
+        deadline = loop.time() + self.config.batch_interval
+        while len(batch) < self.config.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                request = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+            except TimeoutError:
+                break
+            if request is None:
+                return batch, True
+            batch.append(request)
+        return batch, False
+
+    async def _match_batch(self, batch_id: int, batch: list[_Request]) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            # Passengers are matched under the index of their request, as
+            # different requests may carry the same name
+            keyed = [
+                replace(request.passenger, name=str(k))
+                for k, request in enumerate(batch)
+            ]
+            names = {p.name: r.passenger.name for p, r in zip(keyed, batch)}
+            start = time.perf_counter()
+            results = await loop.run_in_executor(self._executor, self._matcher, keyed)
+            self.batches.append(
+                BatchStats(
+                    batch_id=batch_id,
+                    size=len(batch),
+                    n_groups=len(results),
+                    match_time=time.perf_counter() - start,
+                )
+            )
+            assigned = {
+                p.name: (result, p) for result in results for p in result.passengers
+            }
+            for passenger, request in zip(keyed, batch):
+                if passenger.name not in assigned:
+                    request.future.set_exception(
+                        LookupError(f"{request.passenger.name!r} was not assigned")
+                    )
+                    continue
+                result, passenger = assigned[passenger.name]
+                request.future.set_result(
+                    assignment_to_dict(
+                        batch_id=batch_id,
+                        result=result,
+                        passenger=passenger,
+                        names=names,
+                    )
+                )
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    async def run(self) -> None:
+        """
+        Runs the batching loop until `close` is called and every submitted
+        request has been matched.
+        """
+        owns_executor = self._executor is None
+        if owns_executor:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.config.max_pending_batches
+            )
+
+        try:
+            batch_id, closed = 0, False
+            while not closed:
+                first = await self._queue.get()
+                if first is None:
+                    break
+                batch, closed = await self._collect_batch(first=first)
+                await self._slots.acquire()
+                task = asyncio.create_task(self._match_batch(batch_id, batch))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                batch_id += 1
+            await asyncio.gather(*self._tasks)
+        finally:
+            if owns_executor:
+                self._executor.shutdown()  # type: ignore
+                self._executor = None
+
+
+async def serve_stdio(service: MatchingService) -> None:
+    """
+    Serves line-delimited JSON ride requests from stdin and writes every
+    assignment to stdout as a JSON line as soon as its batch is matched.
+    Malformed requests are answered with an `error` line. The service is
+    closed at the end of the input.
+    """
+    loop = asyncio.get_running_loop()
+    runner = asyncio.create_task(service.run())
+    pending: set[asyncio.Task] = set()
+
+    async def _answer(record: dict) -> None:
+        try:
+            response = await service.submit(passenger_from_dict(record))
+        except Exception as e:
+            response = {"name": record.get("name"), "error": str(e)}
+        print(json.dumps(response), flush=True)
+
+    while line := await loop.run_in_executor(None, sys.stdin.readline):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            print(json.dumps({"error": str(e)}), flush=True)
+            continue
+        task = asyncio.create_task(_answer(record))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    await service.close()
+    await asyncio.gather(*pending)
+    await runner
+
+
+async def _route_http(
+    service: MatchingService, reader: asyncio.StreamReader
+) -> tuple[str, dict]:
+    try:
+        request_line = (await reader.readline()).decode().split()
+        headers = {}
+        while (line := (await reader.readline()).decode().strip()) != "":
+            key, _, value = line.partition(":")
+            headers[key.strip().lower()] = value.strip()
+        payload = await reader.readexactly(int(headers.get("content-length", 0)))
+
+        method, path = request_line[0], request_line[1]
+        passenger = None
+        if method == "POST" and path == "/requests":
+            record = json.loads(payload)
+            if not isinstance(record, dict):
+                raise ValueError("The ride request must be a JSON object")
+            passenger = passenger_from_dict(record)
+    except (KeyError, ValueError, IndexError, TypeError) as e:
+        return "400 Bad Request", {"error": str(e)}
+
+    if method == "GET" and path == "/health":
+        return "200 OK", {"batches": len(service.batches)}
+    if passenger is not None:
+        return "200 OK", await service.submit(passenger)
+    return "404 Not Found", {"error": f"No route {method} {path}"}
+
+
+async def _handle_http(
+    service: MatchingService,
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+) -> None:
+    try:
+        try:
+            status, body = await _route_http(service=service, reader=reader)
+        except Exception as e:
+            status, body = "500 Internal Server Error", {"error": str(e)}
+
+        data = json.dumps(body).encode()
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode()
+            + data
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve_http(
+    service: MatchingService, host: str = "127.0.0.1", port: int = 8000
+) -> None:
+    """
+    Serves ride requests over a minimal local HTTP/1.1 front end.
+
+    `POST /requests` takes a JSON ride request and responds with its
+    assignment once its batch is matched; `GET /health` reports the number of
+    matched batches.
+    """
+    runner = asyncio.create_task(service.run())
+    server = await asyncio.start_server(
+        lambda r, w: _handle_http(service, r, w), host=host, port=port
+    )
+    async with server:
+        try:
+            await server.serve_forever()
+        finally:
+            await service.close()
+            await runner
@@ -0,0 +1,223 @@
+import itertools
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from matplotlib import pyplot as plt
+from rich.console import Console
+from rich.table import Table
+
+from yatry.utils.data.io import create_random_passengers
+from yatry.utils.data.map import BHOPAL
+from yatry.utils.helpers.affinity import DEFAULT_CACHE_DIR, affinity_matrices
+from yatry.utils.models.map import Map
+from yatry.utils.optim.clustering import (
+    affinity_propagation_labels,
+    capacity_aware_clustering,
+)
+from yatry.utils.optim.fare import passenger_solo_fares, settle_fares
+
+console = Console()
+
+# Columns of `run_sweep` that are not part of the configuration
+_RESULT_COLUMNS = (
+    "n_passengers",
+    "n_groups",
+    "max_group_size",
+    "total_saving",
+    "saving_per_passenger",
+    "runtime",
+)
+
+
+def sweep_grid(**axes: list) -> list[dict]:
+    """
+    Expands lists of hyperparameter values into every combination.
+
+    Example:
+    >>> sweep_grid(damping=[0.5, 0.7], capacity=[5])
+    [{'damping': 0.5, 'capacity': 5}, {'damping': 0.7, 'capacity': 5}]
+
+    Args:
+        **axes (list): The values of every hyperparameter of
+            `capacity_aware_clustering`, i.e. `damping`,
+            `preference_percentile`, `capacity` (`None` to keep the AP
+            clusters as they are) and `max_iter`.
+
+    Returns:
+        list[dict]: One configuration per combination.
+    """
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+
+def _run_configuration(
+    affinity_path: str, solo_fares: np.ndarray, config: dict
+) -> dict:
+    """
+    Clusters one passenger batch with one configuration. The affinity matrix is
+    opened read-only from its memory-mapped file, so all workers share the
+    pages of a single copy.
+    """
+    affinity_matrix = np.load(affinity_path, mmap_mode="r")
+    config = dict(config)
+    capacity = config.pop("capacity", None)
+
+    start = time.perf_counter()
+    if capacity is None:
+        labels = affinity_propagation_labels(affinity_matrix=affinity_matrix, **config)
+    else:
+        labels = capacity_aware_clustering(
+            affinity_matrix=affinity_matrix, capacity=capacity, **config
+        )
+    runtime = time.perf_counter() - start
+
+    settlement = settle_fares(labels=labels, solo_fares=solo_fares)
+    return {
+        "n_groups": len(settlement.group_labels),
+        "max_group_size": int(settlement.group_sizes.max()),
+        "total_saving": settlement.total_saving,
+        "saving_per_passenger": settlement.total_saving / len(solo_fares),
+        "runtime": runtime,
+    }
+
+
+def run_sweep(
+    passenger_counts: list[int],
+    grid: list[dict],
+    map_: Map = BHOPAL,
+    seed: int = 42,
+    start: datetime = datetime(2025, 4, 23, 8),
+    window: timedelta = timedelta(hours=1),
+    cache_dir: str | None = None,
+    max_workers: int | None = None,
+) -> pd.DataFrame:
+    """
+    Clusters passenger batches of every size with every configuration.
+
+    The random passengers of every size are drawn once with the same `seed`
+    and their affinity matrix is built once with `affinity_matrices`. The
+    configurations then run in a process pool that maps the matrices
+    read-only instead of receiving a pickled copy each.
+
+    Args:
+        passenger_counts (list[int]): The batch sizes.
+        grid (list[dict]): The configurations, see `sweep_grid`.
+        map_ (Map): The map to plan the trips on.
+        seed (int): Seed of the random passengers.
+        start (datetime): The start of the departure times.
+        window (timedelta): The range of the departure times.
+        cache_dir (str | None): Directory of the affinity matrices, which
+            lets later sweeps reuse them. A temporary directory is used if
+            not given.
+        max_workers (int | None): Number of worker processes.
+
+    Returns:
+        pd.DataFrame: One row per batch size and configuration, with the
+            configuration, the number of groups, the savings and the
+            clustering runtime.
+    """
+    with tempfile.TemporaryDirectory() as scratch:
+        cache_dir = cache_dir or scratch
+
+        batches = []
+        for n_passengers in passenger_counts:
+            random.seed(seed)
+            passengers = create_random_passengers(
+                n_passengers=n_passengers, time_range=(start, start + window)
+            )
+            _, _, affinity_matrix = affinity_matrices(
+                passengers=passengers, map_=map_, cache_dir=cache_dir
+            )
+            solo_fares = passenger_solo_fares(passengers=passengers, map_=map_)
+            batches.append((n_passengers, affinity_matrix.filename, solo_fares))
+
+        points = [
+            (n_passengers, path, solo_fares, config)
+            for n_passengers, path, solo_fares in batches
+            for config in grid
+        ]
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+            futures = [
+                pool.submit(_run_configuration, path, solo_fares, config)
+                for _, path, solo_fares, config in points
+            ]
+            rows = [
+                {"n_passengers": n_passengers, **config, **future.result()}
+                for (n_passengers, _, _, config), future in zip(points, futures)
+            ]
+
+    return pd.DataFrame(rows)
+
+
+def plot_sweep(frame: pd.DataFrame, path: str = "savings_vs_passengers.png") -> None:
+    """
+    Plots the average saving per passenger against the batch size, with one
+    line per configuration.
+
+    Args:
+        frame (pd.DataFrame): The output of `run_sweep`.
+        path (str): The image file to write.
+    """
+    config_columns = [
+        column for column in frame.columns if column not in _RESULT_COLUMNS
+    ]
+
+    plt.figure(figsize=(10, 6))
+    for config, points in frame.groupby(config_columns, dropna=False, sort=False):
+        config = config if isinstance(config, tuple) else (config,)
+        points = points.sort_values("n_passengers")
+        plt.plot(
+            points["n_passengers"],
+            points["saving_per_passenger"],
+            marker="o",
+            label=", ".join(f"{k}={v}" for k, v in zip(config_columns, config)),
+        )
+    plt.xlabel("Number of Passengers")
+    plt.ylabel("Average Saving per passenger (₹)")
+    plt.title("Average Saving per Passenger vs Number of Passengers")
+    plt.grid(True, linestyle="--", alpha=0.7)
+    plt.legend(fontsize="small")
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def main():
+    PASSENGER_COUNTS: list[int] = [100, 200, 300, 400, 500]
+    GRID: list[dict] = sweep_grid(
+        damping=[0.5, 0.7, 0.9],
+        preference_percentile=[10, 50, 90],
+        capacity=[5],
+    )
+    AFFINITY_CACHE_DIR: str | None = DEFAULT_CACHE_DIR
+
+    with console.status(
+        f"Running {len(PASSENGER_COUNTS) * len(GRID)} configurations..."
+    ):
+        frame = run_sweep(
+            passenger_counts=PASSENGER_COUNTS,
+            grid=GRID,
+            cache_dir=AFFINITY_CACHE_DIR,
+        )
+
+    table = Table(title="Clustering Sweep")
+    for column in frame.columns:
+        table.add_column(column, style="cyan")
+    for row in frame.itertuples(index=False):
+        table.add_row(
+            *(f"{value:.2f}" if isinstance(value, float) else str(value) for value in row)
+        )
+    console.print(table)
+
+    plot_sweep(frame=frame)
+    console.print("[bold green]✓[/bold green] Saved to savings_vs_passengers.png")
+
+
+if __name__ == "__main__":
+    main()